@@ -0,0 +1,128 @@
+"""Benchmark client operations against fake CloudFront accounts
+
+Run as `python -m benchmarks.bench_client` from repository root. Reports
+API calls, wall time and peak traced memory of each operation for accounts
+of 10, 1k and 10k distributions.
+"""
+import argparse
+import gc
+import os
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from boto_aws_cloudfront.cloudfront import CloudFront
+from boto_aws_cloudfront.config import get_aws_config
+from boto_aws_cloudfront.fake import FakeCloudFrontClient, get_site_config
+from boto_aws_cloudfront.scheduler import Scheduler
+from boto_aws_cloudfront.statecache import StateCache
+
+SIZES = (10, 1000, 10000)
+
+def get_account(size, latency=0, max_rate=None):
+    """Get fake client holding `size` distributions"""
+    client = FakeCloudFrontClient(latency=latency, max_rate=max_rate)
+    for index in range(size):
+        config = get_aws_config(get_site_config(index))
+        config['CallerReference'] = 'site-%s' % index
+        client.add_distro(config)
+    return client
+
+def get_cloudfront(client):
+    """Get CloudFront wrapper using fake client without rate limiting"""
+    cloudfront = CloudFront(scheduler=Scheduler(rate=100000))
+    cloudfront.client = client
+    return cloudfront
+
+def measure(operation):
+    """Run operation, get its wall time and peak traced memory"""
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+    started_at = time.time()
+    operation()
+    elapsed = time.time() - started_at
+    peak = None
+    if tracemalloc:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+def get_operations(size):
+    """Get benchmarked operations by name, optionally with their preparation"""
+    configs = [get_site_config(index) for index in range(size)]
+    last = configs[-1]
+    return [
+        ('find_distro first', lambda cloudfront: cloudfront.find_distro('site-0')),
+        ('find_distro last', lambda cloudfront: cloudfront.find_distro(last['name'])),
+        ('find_distro missing', lambda cloudfront: cloudfront.find_distro('missing')),
+        (
+            'ensure_distro_existence',
+            lambda cloudfront: cloudfront.ensure_distro_existence(last),
+        ),
+        ('ensure_distros', lambda cloudfront: cloudfront.ensure_distros(configs)),
+        ('get_aws_config', lambda cloudfront: [get_aws_config(c) for c in configs]),
+        ('export_configs', export_configs),
+        ('drift_report', lambda cloudfront: cloudfront.drift_report(configs)),
+        (
+            'drift_report cached',
+            lambda cloudfront: cloudfront.drift_report(configs),
+            lambda cloudfront: cloudfront.drift_report(configs),
+        ),
+    ]
+
+def export_configs(cloudfront):
+    """Export all configs, discarding the output"""
+    with open(os.devnull, 'w') as devnull:
+        cloudfront.export_configs(devnull)
+
+def run(sizes, latency=0, max_rate=None):
+    """Benchmark all operations for all account sizes, yield result rows"""
+    for size in sizes:
+        for item in get_operations(size):
+            name, operation = item[:2]
+            client = get_account(size, latency, max_rate)
+            cloudfront = get_cloudfront(client)
+            if name.startswith('drift_report'):
+                cloudfront.state_cache = StateCache()
+            if len(item) > 2:
+                item[2](cloudfront)
+                cloudfront.index.clear()
+                client.calls.clear()
+            elapsed, peak = measure(lambda: operation(cloudfront))
+            yield {
+                'operation': name,
+                'size': size,
+                'calls': sum(client.calls.values()),
+                'throttled': client.calls['Throttled'],
+                'seconds': elapsed,
+                'peak_bytes': peak,
+            }
+
+def main():
+    """Print benchmark table"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--latency', type=float, default=0, help='seconds per call')
+    parser.add_argument('--max-rate', type=int, default=None, help='calls per second')
+    args = parser.parse_args()
+
+    print('%-24s %6s %7s %9s %10s %10s' % (
+        'operation', 'size', 'calls', 'throttled', 'wall ms', 'peak KiB',
+    ))
+    for row in run(args.sizes, args.latency, args.max_rate):
+        peak = '%.0f' % (row['peak_bytes'] / 1024.0) if row['peak_bytes'] else '-'
+        print('%-24s %6s %7s %9s %10.1f %10s' % (
+            row['operation'],
+            row['size'],
+            row['calls'],
+            row['throttled'],
+            row['seconds'] * 1000,
+            peak,
+        ))
+
+if __name__ == '__main__':
+    main()
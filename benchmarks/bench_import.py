@@ -0,0 +1,48 @@
+"""Benchmark import time of package modules
+
+Run as `python -m benchmarks.bench_import` from repository root. Each
+module is imported in a fresh interpreter, best of several runs is
+reported. With `--max-ms` the run fails when a module imports slower.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+MODULES = (
+    'boto_aws_cloudfront.config',
+    'boto_aws_cloudfront.cloudfront',
+    'boto3',
+)
+
+def measure(module, repeat):
+    """Get best wall time of importing module in fresh interpreter"""
+    baseline = []
+    timings = []
+    for _ in range(repeat):
+        started_at = time.time()
+        subprocess.check_call([sys.executable, '-c', 'pass'])
+        baseline.append(time.time() - started_at)
+        started_at = time.time()
+        subprocess.check_call([sys.executable, '-c', 'import %s' % module])
+        timings.append(time.time() - started_at)
+    return max(min(timings) - min(baseline), 0)
+
+def main():
+    """Print import times"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        elapsed = measure(module, args.repeat) * 1000
+        slow = args.max_ms is not None and elapsed > args.max_ms
+        failed = failed or slow
+        print('%-32s %8.1f ms%s' % (module, elapsed, ' SLOW' if slow else ''))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark memory of normalized config dicts and slotted specs
+
+Run as `python -m benchmarks.bench_specs` from repository root. Reports
+traced memory of 10k normalized configs held as dicts and as specs, and
+time of rendering AWS configs from both.
+"""
+import argparse
+import gc
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from boto_aws_cloudfront.config import get_aws_config, normalize_config
+from boto_aws_cloudfront.fake import get_site_config
+from boto_aws_cloudfront.spec import DistroSpec
+
+def measure_memory(build):
+    """Get traced memory held by result of build"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+def measure_time(configs):
+    """Get seconds of rendering AWS configs of all configs"""
+    started_at = time.time()
+    for config in configs:
+        get_aws_config(config)
+    return time.time() - started_at
+
+def main():
+    """Print memory and rendering time of dicts and specs"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=10000)
+    args = parser.parse_args()
+    if tracemalloc is None:
+        parser.error('tracemalloc is not available')
+
+    configs = [get_site_config(index) for index in range(args.count)]
+    print('%-8s %10s %12s %10s' % ('form', 'KiB', 'bytes/site', 'render ms'))
+    sizes = {}
+    for form, convert in (('dict', normalize_config), ('spec', DistroSpec.from_dict)):
+        sizes[form] = measure_memory(lambda: [convert(config) for config in configs])
+        seconds = measure_time([convert(config) for config in configs])
+        print('%-8s %10.0f %12.0f %10.1f' % (
+            form,
+            sizes[form] / 1024.0,
+            float(sizes[form]) / args.count,
+            seconds * 1000,
+        ))
+    print('spec memory %.0f%% of dict' % (100.0 * sizes['spec'] / sizes['dict']))
+
+if __name__ == '__main__':
+    main()
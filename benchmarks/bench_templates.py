@@ -0,0 +1,46 @@
+"""Benchmark rendering AWS configs with and without precompiled template
+
+Run as `python -m benchmarks.bench_templates` from repository root.
+"""
+import timeit
+
+from boto_aws_cloudfront.config import get_aws_config
+from boto_aws_cloudfront.templates import ConfigTemplate
+
+def get_configs(count):
+    """Get site configs sharing a handful of buckets"""
+    return [
+        {
+            'domains': ['site-%s.example.com' % index],
+            'name': 'site-%s' % index,
+            's3_buckets': ['bucket-%s' % (index % 10)],
+            'region': 'eu-west-1',
+            'root_object': 'index.html',
+        }
+        for index in range(count)
+    ]
+
+def measure(render, configs, repeat=5):
+    """Get best time of rendering all configs"""
+    return min(timeit.repeat(
+        lambda: [render(config) for config in configs],
+        number=1,
+        repeat=repeat,
+    ))
+
+def main(count=10000):
+    """Print rendering times"""
+    configs = get_configs(count)
+    template = ConfigTemplate()
+    baseline = measure(get_aws_config, configs)
+    templated = measure(template.render, configs)
+    for name, seconds in (('get_aws_config', baseline), ('ConfigTemplate', templated)):
+        print('%-16s %8.1f ms %8.2f us/config' % (
+            name,
+            seconds * 1000,
+            seconds * 1000000 / count,
+        ))
+    print('speedup %.1fx' % (baseline / templated))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Asyncio variant of simplified CloudFront client, requires Python 3.6+"""
+import asyncio
+
+from .cloudfront import (
+    DISTRO_CREATED,
+    DISTRO_UNCHANGED,
+    DISTRO_UPDATED,
+    STATUS_NAMES,
+    CloudFront,
+    get_aws_config,
+)
+
+class AsyncCloudFront(object):
+    """Simplified CloudFront client for asyncio services
+
+    `client` is any object with coroutine methods named after CloudFront API
+    operations, for example an aiobotocore client or a local stub. At most
+    `max_concurrency` API calls are in flight at once.
+    """
+    def __init__(self, client, max_concurrency=10):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+        self.semaphore_loop = None
+
+    def get_semaphore(self):
+        """Get semaphore of the running event loop
+
+        Before Python 3.10 semaphores bind to the loop current when they are
+        created, so it is created lazily, once per loop the client runs in.
+        """
+        loop = asyncio.get_event_loop()
+        if self.semaphore is None or self.semaphore_loop is not loop:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.semaphore_loop = loop
+        return self.semaphore
+
+    async def call(self, operation, **kwargs):
+        """Call client operation within concurrency limit"""
+        async with self.get_semaphore():
+            return await getattr(self.client, operation)(**kwargs)
+
+    async def iter_distros(self):
+        """Iterate over all distributions
+
+        Next page is requested while the current one is being consumed.
+        """
+        page = asyncio.ensure_future(self.call('list_distributions'))
+        try:
+            while page:
+                distro_list = (await page)['DistributionList']
+                page = None
+                if distro_list.get('IsTruncated'):
+                    page = asyncio.ensure_future(self.call(
+                        'list_distributions',
+                        Marker=distro_list['NextMarker'],
+                    ))
+                for item in distro_list.get('Items', []):
+                    yield item
+        finally:
+            if page:
+                page.cancel()
+
+    async def get_all_distros(self):
+        """Get list of all distributions"""
+        return [item async for item in self.iter_distros()]
+
+    async def get_distro_config(self, distro_id):
+        """Load distribution config"""
+        return await self.call('get_distribution_config', Id=distro_id)
+
+    async def get_listed_distro(self, distro):
+        """Fetch config of distribution from listing"""
+        config = await self.get_distro_config(distro['Id'])
+        config['Id'] = distro['Id']
+        config['DomainName'] = distro['DomainName']
+        return config
+
+    async def find_distro(self, name):
+        """Find distribution and fetch its config"""
+        distros = self.iter_distros()
+        distro = None
+        try:
+            async for item in distros:
+                if item.get('Comment', None) == name:
+                    distro = item
+                    break
+        finally:
+            await distros.aclose()
+
+        if distro:
+            return await self.get_listed_distro(distro)
+        return distro
+
+    async def create_distro(self, distro_config):
+        """Create distribution"""
+        next_config = get_aws_config(distro_config)
+        next_config['CallerReference'] = distro_config['name']
+        return await self.call('create_distribution', DistributionConfig=next_config)
+
+    async def update_distro(self, distro, distro_config):
+        """Update distribution config"""
+        next_config = get_aws_config(distro_config)
+        next_config['CallerReference'] = distro['DistributionConfig']['CallerReference']
+        return await self.call(
+            'update_distribution',
+            DistributionConfig=next_config,
+            Id=distro['Id'],
+            IfMatch=distro['ETag'],
+        )
+
+    async def reconcile_distro(self, distro, distro_config):
+        """Create or update distribution that was already looked up"""
+        if not distro:
+            await self.create_distro(distro_config)
+            return DISTRO_CREATED
+        if CloudFront.did_distro_change(distro['DistributionConfig'], distro_config):
+            await self.update_distro(distro, distro_config)
+            return DISTRO_UPDATED
+        return DISTRO_UNCHANGED
+
+    async def ensure_distro_existence(self, distro_config):
+        """Create distro if it does not exist, update its config otherwise"""
+        distro = await self.find_distro(distro_config.get('name'))
+        return await self.reconcile_distro(distro, distro_config)
+
+    async def ensure_distros(self, distro_configs):
+        """Ensure existence of many distributions concurrently
+
+        Distributions are listed once for the whole batch, the result maps
+        names to their status and errors do not stop the batch.
+        """
+        listed = {}
+        async for item in self.iter_distros():
+            listed.setdefault(item.get('Comment', None), item)
+
+        async def ensure(distro_config):
+            distro = listed.get(distro_config.get('name'))
+            if distro:
+                distro = await self.get_listed_distro(distro)
+            return await self.reconcile_distro(distro, distro_config)
+
+        statuses = await asyncio.gather(
+            *[ensure(config) for config in distro_configs],
+            return_exceptions=True
+        )
+        results = {}
+        for config, status in zip(distro_configs, statuses):
+            if isinstance(status, Exception):
+                results[config.get('name')] = {'status': 'error', 'error': status}
+            else:
+                results[config.get('name')] = {'status': STATUS_NAMES[status]}
+        return results
@@ -1,268 +1,878 @@
 """Simplify CloudFront managing for static websites"""
-import boto3
-
-DEFAULT_CONFIG = {
-    'cache_forward_cookies_mode': 'none',
-    'cache_forward_querystring': False,
-    'cache_trusted_signers': [],
-    'certificate_arn': None,
-    'certificate_iam': None,
-    'certificate_source': '',
-    'enabled': True,
-    'http_version': 'http2',
-    'https_behavior': 'redirect-to-https',
-    'ipv6': True,
-    'price_class': 'PriceClass_100',
-    'root_object': '',
+import json
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from functools import partial
+
+from .config import (
+    DEFAULT_CONFIG,
+    clear_dict,
+    get_aws_config,
+    get_list_config,
+    map_bucket_to_s3_target,
+    map_origin_to_bucket_name,
+    map_s3_target_to_origin,
+    normalize_config,
+    read_aws_config,
+    set_function_version,
+)
+from .diff import canonical_hash, diff_distro_config
+from .index import DistroIndex
+from .invalidation import Invalidator
+from .metrics import get_response_size
+from .plan import Plan, new_snapshot
+from .policies import (
+    POLICY_KINDS,
+    PolicyCache,
+    get_config_policy_kinds,
+    get_policy_config,
+    get_snapshot_policy_id,
+    resolve_config_policies,
+)
+from .pool import DEFAULT_POOL
+from .scheduler import Scheduler, get_error_code
+from .templates import render_aws_config
+from .validation import (
+    ConfigError,
+    get_config_label,
+    validate_configs,
+    validate_names,
+)
+
+DISTRO_CREATED = 1
+DISTRO_UPDATED = 2
+DISTRO_UNCHANGED = 3
+
+# Distribution Ids are uppercase alphanumeric strings starting with E
+DISTRO_ID = re.compile(r'^E[0-9A-Z]+$')
+
+STATUS_NAMES = {
+    DISTRO_CREATED: 'created',
+    DISTRO_UPDATED: 'updated',
+    DISTRO_UNCHANGED: 'unchanged',
 }
 
-def clear_dict(config):
-    """Clear dictionary of null values"""
-    return dict((k, v) for k, v in config.iteritems() if v != None)
-
-def get_list_config(data):
-    """Get typical AWS compatible list structure"""
-    return {
-        'Quantity': len(data),
-        'Items': data,
-    }
-
-def map_bucket_to_s3_target(bucket_name, region):
-    """Translate S3 bucket name into origin config base"""
-    s3_source = '%s.s3-website-%s.amazonaws.com' % (bucket_name, region)
-    return {
-        'DomainName': s3_source,
-        'Id': s3_source,
-    }
-
-def map_s3_target_to_origin(s3_target):
-    """Translate target into AWS compatible origin config"""
-    return {
-        'DomainName': s3_target['DomainName'],
-        'Id': s3_target['Id'],
-        'CustomOriginConfig': {
-            'HTTPPort': 80,
-            'HTTPSPort': 443,
-            'OriginProtocolPolicy': 'http-only',
-            'OriginSslProtocols': {
-                'Quantity': 3,
-                'Items': ['TLSv1', 'TLSv1.1', 'TLSv1.2'],
-            },
-            'OriginReadTimeout': 30,
-            'OriginKeepaliveTimeout': 5,
-        },
-        'OriginPath': '',
-        'CustomHeaders': {
-            'Quantity': 0,
-        },
-    }
-
-def map_origin_to_bucket_name(origin):
-    """Translate origin into S3 bucket name"""
-    if '.s3-website-' in origin['Id']:
-        index = origin['Id'].find('.s3-website-')
-        return origin['Id'][:index]
-    return origin['Id']
-
-def normalize_config(desired_config):
-    """Fill undefined config values with default config"""
-    normalized_config = DEFAULT_CONFIG.copy()
-    normalized_config.update(desired_config)
-    return normalized_config
-
-def get_aws_config(desired_config):
-    """Get AWS config from module config"""
-    distro_config = normalize_config(desired_config)
-    buckets = [
-        map_bucket_to_s3_target(bucket, distro_config.get('region'))
-        for bucket in distro_config.get('s3_buckets')
-    ]
-    bucket_source = buckets[0]
-
-    signers = distro_config.get('cache_trusted_signers')
-    certificate_source = distro_config.get('certificate_source')
-    use_default_certificate = False
-
-    if certificate_source == 'acm':
-        certificate = distro_config.get('certificate_arn')
-    elif certificate_source == 'iam':
-        certificate = distro_config.get('certificate_iam')
-    else:
-        certificate = None
-        certificate_source = ''
-        use_default_certificate = True
-
-    config = {
-        'CacheBehaviors': {'Quantity': 0},
-        'Comment': distro_config.get('name'),
-        'CustomErrorResponses': {'Quantity': 0},
-        'DefaultCacheBehavior': {
-            'AllowedMethods': {
-                'Quantity': 2,
-                'Items': ['GET', 'HEAD'],
-                'CachedMethods': {
-                    'Quantity': 2,
-                    'Items': ['GET', 'HEAD'],
-                },
-            },
-            'Compress': False,
-            'DefaultTTL': 60,
-            'ForwardedValues': {
-                'Cookies': {'Forward': distro_config.get('cache_forward_cookies_mode')},
-                'Headers': {'Quantity': 0},
-                'QueryString': distro_config.get('cache_forward_querystring'),
-                'QueryStringCacheKeys': {'Quantity': 0},
-            },
-            'LambdaFunctionAssociations': {
-                'Quantity': 0
-            },
-            'MaxTTL': 3600,
-            'MinTTL': 0,
-            'SmoothStreaming': False,
-            'ViewerProtocolPolicy': distro_config.get('https_behavior'),
-            'TargetOriginId': bucket_source['Id'],
-            'TrustedSigners': {
-                'Enabled': len(signers) > 0,
-                'Quantity': len(signers),
-                'Items': signers,
-            },
-        },
-        'DefaultRootObject': distro_config.get('root_object'),
-        'Enabled': distro_config.get('enabled'),
-        'HttpVersion': distro_config.get('http_version'),
-        'IsIPV6Enabled': distro_config.get('ipv6'),
-        'Logging': {
-            'Enabled': False,
-            'IncludeCookies': False,
-            'Bucket': '',
-            'Prefix': '',
-        },
-        'PriceClass': distro_config.get('price_class', 'PriceClass_100'),
-        'Restrictions': {
-            'GeoRestriction': {
-                'RestrictionType': 'none',
-                'Quantity': 0
-            }
-        },
-        'ViewerCertificate': clear_dict({
-            'CloudFrontDefaultCertificate': use_default_certificate,
-            'Certificate': certificate,
-            'IAMCertificateId': distro_config.get('certificate_iam'),
-            'ACMCertificateArn': distro_config.get('certificate_arn'),
-            'MinimumProtocolVersion': 'TLSv1',
-            'SSLSupportMethod': 'sni-only',
-            'CertificateSource': certificate_source,
-        }),
-        'WebACLId': '',
-    }
-
-    config['Aliases'] = get_list_config(distro_config.get('domains'))
-    config['Origins'] = get_list_config(map(map_s3_target_to_origin, buckets))
-
-    return clear_dict(config)
-
-def read_aws_config(aws_config):
-    """Get module config from AWS config"""
-    config = DEFAULT_CONFIG.copy()
-    domains = aws_config.get('Aliases')
-    origins = aws_config.get('Origins')
-    default_cache_behavior = aws_config.get('DefaultCacheBehavior')
-    viewer_certificate = aws_config.get('ViewerCertificate')
-
-    config['name'] = aws_config.get('Comment')
-    config['enabled'] = aws_config.get('Enabled')
-    config['http_version'] = aws_config.get('HttpVersion', '').lower()
-    config['ipv6'] = aws_config.get('IsIPV6Enabled')
-    config['price_class'] = aws_config.get('PriceClass')
-    config['root_object'] = aws_config.get('DefaultRootObject')
-
-    if default_cache_behavior:
-        config['https_behavior'] = default_cache_behavior.get('ViewerProtocolPolicy')
-
-        forwarded_values = default_cache_behavior.get('ForwardedValues')
-        trusted_signers = default_cache_behavior.get('TrustedSigners')
-
-        if forwarded_values:
-            config['cache_forward_cookies_mode'] = (
-                forwarded_values.get('Cookies').get('Forward')
-            )
-            config['cache_forward_querystring'] = (
-                forwarded_values.get('QueryString')
+def make_plan(distro_configs, snapshot):
+    """Plan changes of distributions against snapshot, without API calls
+
+    Policies are looked up in the snapshot, see `get_snapshot_policy_id`.
+    The plan keeps configs with policy definitions, they are resolved, and
+    missing policies created, by `apply`.
+    """
+    plan = Plan(snapshot=snapshot)
+    get_policy_id = partial(get_snapshot_policy_id, snapshot)
+    for distro_config in distro_configs:
+        distro = snapshot['distros'].get(distro_config['name'])
+        if not distro:
+            plan.creates.append(distro_config)
+            continue
+        if 'DistributionConfig' not in distro:
+            raise ValueError(
+                'Snapshot is missing config of distribution %s' % distro_config['name']
             )
-        if trusted_signers and trusted_signers.get('Items', None):
-            config['cache_trusted_signers'] = forwarded_values.get('Items')
-    if viewer_certificate:
-        config['certificate_arn'] = viewer_certificate.get('ACMCertificateArn')
-        config['certificate_iam'] = viewer_certificate.get('IAMCertificateId')
-        config['certificate_source'] = viewer_certificate.get('CertificateSource')
-    if origins:
-        config['s3_buckets'] = map(map_origin_to_bucket_name, origins['Items'])
-    if domains:
-        config['domains'] = domains['Items']
-
-    return config
+        changes = diff_distro_config(
+            render_aws_config(resolve_config_policies(distro_config, get_policy_id)),
+            distro['DistributionConfig'],
+        )
+        if changes:
+            plan.updates.append({'config': distro_config, 'changes': changes})
+        else:
+            plan.unchanged.append(distro_config['name'])
+    return plan
+
+def run_tasks(tasks, max_workers):
+    """Run named tasks in bounded thread pool, map names to their status
+
+    Each task returns one of the distribution status constants, errors are
+    reported in place of the status and do not stop the other tasks.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = dict(
+            (executor.submit(task), name) for name, task in tasks.items()
+        )
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = {'status': STATUS_NAMES[future.result()]}
+            except Exception as error:
+                results[name] = {'status': 'error', 'error': error}
+    return results
+
+class WaitTimeout(Exception):
+    """Distributions did not reach deployed status in time"""
+    def __init__(self, pending):
+        super(WaitTimeout, self).__init__(
+            'Distributions not deployed in time: %s' % ', '.join(sorted(pending))
+        )
+        self.pending = pending
 
 class CloudFront(object):
-    """Simplified CloudFront client"""
-    def __init__(self):
-        self.client = boto3.client('cloudfront')
+    """Simplified CloudFront client
+
+    The boto3 client is taken from client pool by `account`, a dict with
+    optional `profile`, `role_arn` and `region`, so that wrappers of the
+    same account share one client. It is created on first API call.
+
+    With a `state_cache`, distributions whose listing and desired config
+    did not change since they were last reconciled are not fetched again.
+    With a `policy_cache`, see `PolicyCache`, policies listed by previous
+    runs are not listed again.
+    """
+    def __init__(
+            self,
+            index_ttl=300,
+            scheduler=None,
+            hooks=None,
+            account=None,
+            pool=None,
+            state_cache=None,
+            policy_cache=None,
+    ):
+        self.account = account or {}
+        self.pool = pool or DEFAULT_POOL
+        self._client = None
+        self.hooks = list(hooks or [])
+        self.index = DistroIndex(
+            lambda: self.iter_distros(),
+            ttl=index_ttl,
+            on_lookup=lambda hit: self.emit('cache', cache='index', hit=hit),
+        )
+        self.scheduler = scheduler or Scheduler()
+        self.invalidator = Invalidator(self)
+        self.policies = policy_cache or PolicyCache()
+        self.state_cache = state_cache
+
+    @property
+    def client(self):
+        """Get boto3 client, create it on first use"""
+        if self._client is None:
+            self._client = self.pool.get_client('cloudfront', **self.account)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def emit(self, event, **data):
+        """Pass instrumentation event to hooks"""
+        for hook in self.hooks:
+            hook(event, **data)
+
+    @contextmanager
+    def measure(self, operation):
+        """Measure duration of local operation for hooks"""
+        if not self.hooks:
+            yield
+            return
+        started_at = time.time()
+        yield
+        self.emit('local', operation=operation, duration=time.time() - started_at)
+
+    def call(self, operation, **kwargs):
+        """Call client operation through rate limiting scheduler"""
+        method = getattr(self.client, operation)
+        if not self.hooks:
+            return self.scheduler.call(method, **kwargs)
+
+        attempts = []
+        def attempt(**params):
+            attempts.append(operation)
+            return method(**params)
+
+        started_at = time.time()
+        response = None
+        error = None
+        try:
+            response = self.scheduler.call(attempt, **kwargs)
+            return response
+        except Exception as call_error:
+            error = get_error_code(call_error) or type(call_error).__name__
+            raise
+        finally:
+            self.emit(
+                'call',
+                operation=operation,
+                duration=time.time() - started_at,
+                retries=max(len(attempts) - 1, 0),
+                error=error,
+                bytes=get_response_size(response),
+            )
 
     def find_distro(self, name):
         """Find distribution and fetch its config"""
-        distro_list = self.get_all_distros()
-        distro = None
-        for item in distro_list:
-            if item.get('Comment', None) == name:
-                distro = item
-                break
+        distro = self.index.lookup(name)
 
         if distro:
             config = self.get_distro_config(distro.get('Id'))
             config['Id'] = distro['Id']
             config['DomainName'] = distro['DomainName']
+            self.index.set_etag(name, config.get('ETag'))
             return config
         return distro
 
+    def get_distro_id(self, name_or_id):
+        """Get distribution Id from its name, pass Ids through
+
+        Strings shaped like Ids are passed through without listing, unless
+        the index already knows them as names.
+        """
+        if DISTRO_ID.match(name_or_id) and name_or_id not in self.index.entries:
+            return name_or_id
+        distro = self.index.lookup(name_or_id)
+        return distro['Id'] if distro else name_or_id
+
+    def invalidate(self, name_or_id, paths):
+        """Invalidate cached paths of distribution
+
+        Paths are deduplicated and compacted into wildcards. Paths requested
+        while an invalidation of the distribution is in progress are merged
+        into the next one, sent in background once possible. Returns handle
+        with invalidation ids, `queued` until they are sent, and `wait`.
+        """
+        return self.invalidator.invalidate(self.get_distro_id(name_or_id), paths)
+
     def get_distro_config(self, distro_id):
         """Load distribution config"""
-        return self.client.get_distribution_config(Id=distro_id)
+        return self.call('get_distribution_config', Id=distro_id)
+
+    def iter_distros(self):
+        """Iterate over all distributions, fetching pages on demand"""
+        params = {}
+        while True:
+            distro_list = self.call('list_distributions', **params)['DistributionList']
+            for item in distro_list.get('Items', []):
+                yield item
+            if not distro_list.get('IsTruncated'):
+                return
+            params['Marker'] = distro_list['NextMarker']
 
     def get_all_distros(self):
         """Get list of all distributions"""
-        distro_list = self.client.list_distributions()
-        return distro_list['DistributionList']['Items']
+        return list(self.iter_distros())
+
+    def iter_policies(self, kind):
+        """Iterate over custom policies of kind, fetching pages on demand"""
+        shape = POLICY_KINDS[kind]
+        params = {'Type': 'custom'}
+        while True:
+            policy_list = self.call(shape['list'], **params)[shape['list_key']]
+            for item in policy_list.get('Items', []):
+                yield item[shape['policy_key']]
+            if not policy_list.get('NextMarker'):
+                return
+            params['Marker'] = policy_list['NextMarker']
+
+    def load_policies(self, kind):
+        """List policies of kind into policy cache"""
+        config_key = POLICY_KINDS[kind]['config_key']
+        self.policies.load(kind, [
+            (policy[config_key]['Name'], policy['Id'])
+            for policy in self.iter_policies(kind)
+        ])
+
+    def ensure_policy(self, kind, policy):
+        """Get Id of policy, create it unless the account has identical one
+
+        Policies are listed once per kind, so resolving policies of many
+        distributions costs one listing plus one call per new policy.
+        """
+        shape = POLICY_KINDS[kind]
+        policy_config = get_policy_config(kind, policy)
+        name = policy_config['Name']
+        policy_id = self.policies.get(kind, name)
+        self.emit('cache', cache='policies', hit=policy_id is not None)
+        if policy_id:
+            return policy_id
+        with self.policies.lock:
+            if not self.policies.is_loaded(kind):
+                self.load_policies(kind)
+            policy_id = self.policies.get(kind, name)
+            if policy_id:
+                return policy_id
+            try:
+                response = self.call(
+                    shape['create'],
+                    **{shape['config_key']: policy_config}
+                )
+            except Exception as error:
+                if get_error_code(error) != shape['exists_error']:
+                    raise
+                self.load_policies(kind)
+                policy_id = self.policies.get(kind, name)
+                if not policy_id:
+                    raise
+                return policy_id
+            policy_id = response[shape['policy_key']]['Id']
+            self.policies.add(kind, name, policy_id)
+            return policy_id
+
+    def resolve_policies(self, distro_config):
+        """Get config with Ids of its cache and origin request policies
+
+        Policies are looked up or created for the distribution and each of
+        its cache behaviors. Configs without policies are returned as is.
+        """
+        return resolve_config_policies(distro_config, self.ensure_policy)
+
+    def get_listed_policies(self, distro_configs):
+        """Get names of policies mapped to their Ids, for kinds used by configs
+
+        Policies are only listed, nothing is created.
+        """
+        policies = {}
+        kinds = set()
+        for distro_config in distro_configs:
+            kinds.update(get_config_policy_kinds(distro_config))
+        for kind in sorted(kinds):
+            with self.policies.lock:
+                if not self.policies.is_loaded(kind):
+                    self.load_policies(kind)
+            policies[kind] = self.policies.get_ids(kind)
+        return policies
+
+    def sweep_deployed(self, distro_ids):
+        """Get deployed ones of distributions from one sweep of the listing
+
+        The sweep stops as soon as all of the distributions were seen.
+        """
+        pending = set(distro_ids)
+        seen = set()
+        settled = []
+        for distro in self.iter_distros():
+            if distro['Id'] in pending:
+                seen.add(distro['Id'])
+                if distro.get('Status') == 'Deployed':
+                    settled.append(distro)
+                if seen == pending:
+                    break
+        return settled
+
+    def iter_deployed(self, distro_ids, timeout=None, interval=10, max_interval=60):
+        """Yield distributions as soon as they reach deployed status
+
+        Status of all distributions is read from one sweep of the paginated
+        listing per interval. The interval grows while nothing settles and
+        resets when something does.
+        """
+        pending = set(distro_ids)
+        started_at = time.time()
+        delay = interval
+        while pending:
+            settled = self.sweep_deployed(pending)
+            for distro in settled:
+                pending.discard(distro['Id'])
+                yield distro
+            if not pending:
+                return
+            if timeout is not None and time.time() - started_at >= timeout:
+                raise WaitTimeout(pending)
+            delay = interval if settled else min(max_interval, delay * 1.5)
+            time.sleep(delay)
+
+    def wait_deployed(self, distro_ids, timeout=None, callback=None, **kwargs):
+        """Wait until all distributions are deployed, return them
+
+        Optional callback is called with each distribution once it settles.
+        """
+        deployed = []
+        for distro in self.iter_deployed(distro_ids, timeout, **kwargs):
+            if callback:
+                callback(distro)
+            deployed.append(distro)
+        return deployed
 
     def create_distro(self, distro_config):
         """Create distribution"""
-        next_config = get_aws_config(distro_config)
+        distro_config = self.resolve_policies(distro_config)
+        with self.measure('get_aws_config'):
+            next_config = render_aws_config(distro_config)
         next_config['CallerReference'] = distro_config['name']
-        self.client.create_distribution(DistributionConfig=next_config)
+        response = self.call('create_distribution', DistributionConfig=next_config)
+        self.index.update(
+            distro_config['name'],
+            response['Distribution'],
+            response.get('ETag'),
+        )
+        return response
 
     def update_distro(self, distro, distro_config):
-        """Update distribution config"""
-        next_config = get_aws_config(distro_config)
+        """Update distribution config
+
+        When the ETag turns out to be stale, current config is fetched again
+        and the update is retried with its ETag.
+        """
+        distro_config = self.resolve_policies(distro_config)
+        with self.measure('get_aws_config'):
+            next_config = render_aws_config(distro_config)
         next_config['CallerReference'] = distro['DistributionConfig']['CallerReference']
-        self.client.update_distribution(
-            DistributionConfig=next_config,
-            Id=distro['Id'],
-            IfMatch=distro['ETag'],
+        etag = distro['ETag']
+        attempt = 0
+        while True:
+            try:
+                response = self.call(
+                    'update_distribution',
+                    DistributionConfig=next_config,
+                    Id=distro['Id'],
+                    IfMatch=etag,
+                )
+                break
+            except Exception as error:
+                if get_error_code(error) != 'PreconditionFailed':
+                    raise
+                self.index.set_etag(distro_config['name'], None)
+                if attempt >= self.scheduler.max_etag_retries:
+                    raise
+            current = self.get_distro_config(distro['Id'])
+            next_config['CallerReference'] = (
+                current['DistributionConfig']['CallerReference']
+            )
+            etag = current['ETag']
+            attempt += 1
+            self.scheduler.record('etag_retries')
+        self.index.update(
+            distro_config['name'],
+            response['Distribution'],
+            response.get('ETag'),
         )
+        return response
+
+    @staticmethod
+    def get_distro_changes(distribution_config, user_config):
+        """Get field level changes between live and desired config"""
+        return diff_distro_config(render_aws_config(user_config), distribution_config)
 
     @staticmethod
     def did_distro_change(distribution_config, user_config):
         """Compare distribution config"""
-        return (
-            dict(read_aws_config(distribution_config)) !=
-            dict(normalize_config(user_config))
+        return bool(CloudFront.get_distro_changes(distribution_config, user_config))
+
+    def record_state(self, name, config_hash):
+        """Remember indexed distribution as matching config of given hash"""
+        distro = self.index.lookup(name)
+        if distro:
+            self.state_cache.record(
+                name,
+                distro['Id'],
+                distro['ETag'],
+                distro['LastModifiedTime'],
+                config_hash,
+            )
+
+    def ensure_distro_existence(self, distro_config, fresh_index=False):
+        """Create distro if it does not exist, update its config otherwise
+
+        With state cache, the distribution is listed again before its state
+        is trusted, unless `fresh_index` tells the index was just loaded.
+        """
+        distro_config = self.resolve_policies(distro_config)
+        name = distro_config.get('name')
+        config_hash = None
+        if self.state_cache is not None:
+            with self.measure('get_aws_config'):
+                config_hash = canonical_hash(render_aws_config(distro_config))
+            if not fresh_index:
+                self.index.invalidate(name)
+            listed = self.index.lookup(name)
+            if listed and self.state_cache.is_unchanged(name, listed, config_hash):
+                return DISTRO_UNCHANGED
+
+        distro = self.find_distro(name)
+        if not distro:
+            self.create_distro(distro_config)
+            status = DISTRO_CREATED
+        else:
+            with self.measure('did_distro_change'):
+                changed = self.did_distro_change(
+                    distro['DistributionConfig'],
+                    distro_config,
+                )
+            status = DISTRO_UNCHANGED
+            if changed:
+                self.update_distro(distro, distro_config)
+                status = DISTRO_UPDATED
+        if config_hash is not None:
+            self.record_state(name, config_hash)
+        return status
+
+    def load_fresh_index(self):
+        """Load the whole listing, fetched again when state cache trusts it
+
+        Distributions changed elsewhere within the index TTL are then not
+        mistaken for unchanged ones.
+        """
+        if self.state_cache is not None:
+            self.index.clear()
+        return self.index.load()
+
+    def ensure_distros(self, distro_configs, max_workers=8, validate=False):
+        """Ensure existence of many distributions concurrently
+
+        Distributions are listed once for the whole batch. Each config is
+        reconciled in a bounded thread pool sharing this client and the
+        result maps names to their status, errors do not stop the batch.
+        State cache is saved once the batch is done. With `validate`, the
+        configs are validated first and invalid ones are reported with
+        ConfigError without any API call. Configs sharing a name are always
+        reported that way, none of them is reconciled.
+        """
+        problems = {}
+        if validate:
+            found = validate_configs(distro_configs)
+        else:
+            found = validate_names(distro_configs)
+        for problem in found:
+            problems.setdefault(problem.config, []).append(problem)
+        tasks = {}
+        for index, config in enumerate(distro_configs):
+            if get_config_label(config, index) not in problems:
+                tasks[config.get('name')] = partial(
+                    self.ensure_distro_existence,
+                    config,
+                    fresh_index=True,
+                )
+
+        results = dict(
+            (label, {'status': 'error', 'error': ConfigError(config_problems)})
+            for label, config_problems in problems.items()
+        )
+        if tasks:
+            self.load_fresh_index()
+            results.update(run_tasks(tasks, max_workers))
+        if self.state_cache is not None:
+            self.state_cache.save()
+        return results
+
+    def roll_out(
+            self,
+            tasks,
+            max_in_flight=5,
+            timeout=None,
+            interval=10,
+            max_interval=60,
+            callback=None,
+            on_deployed=None,
+    ):
+        """Run named tasks keeping at most `max_in_flight` deployments going
+
+        Each task returns its status name and Id of distribution it started
+        to deploy, or None when there is nothing to wait for. New tasks start
+        as soon as deployments of earlier ones finish, status of all of them
+        is read from shared listing sweeps. Results map names to status and,
+        for deploying tasks, whether they got `deployed`. Optional
+        `on_deployed` is called with name and Id of each deployed
+        distribution and its return value becomes the final status. After
+        `timeout` seconds the remaining tasks are `skipped`. Optional
+        callback is called with name and result of each finished task.
+        """
+        queue = list(tasks.items()) if isinstance(tasks, dict) else list(tasks)
+        results = {}
+        in_flight = {}
+        started_at = time.time()
+        delay = interval
+
+        def finish(name, result):
+            results[name] = result
+            if callback:
+                callback(name, result)
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            while queue or in_flight:
+                free = max_in_flight - len(in_flight)
+                futures = dict(
+                    (executor.submit(task), name) for name, task in queue[:free]
+                )
+                queue = queue[free:]
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        status, distro_id = future.result()
+                    except Exception as error:
+                        finish(name, {'status': 'error', 'error': error})
+                        continue
+                    if distro_id is None:
+                        finish(name, {'status': status})
+                    else:
+                        in_flight[distro_id] = (name, status)
+                if not in_flight:
+                    continue
+                settled = self.sweep_deployed(in_flight)
+                for distro in settled:
+                    name, status = in_flight.pop(distro['Id'])
+                    if not on_deployed:
+                        finish(name, {'status': status, 'deployed': True})
+                        continue
+                    try:
+                        finish(name, {'status': on_deployed(name, distro['Id'])})
+                    except Exception as error:
+                        finish(name, {'status': 'error', 'error': error})
+                if settled:
+                    delay = interval
+                    continue
+                if timeout is not None and time.time() - started_at >= timeout:
+                    for name, status in in_flight.values():
+                        finish(name, {'status': status, 'deployed': False})
+                    for name, _ in queue:
+                        finish(name, {'status': 'skipped'})
+                    break
+                time.sleep(delay)
+                delay = min(max_interval, delay * 1.5)
+        return results
+
+    def roll_out_distros(self, distro_configs, max_in_flight=5, **kwargs):
+        """Ensure distributions with at most `max_in_flight` of them deploying
+
+        Used to roll out changes such as a new Lambda@Edge version gradually,
+        see `roll_out` for arguments and results.
+        """
+        def deploy(distro_config):
+            status = self.ensure_distro_existence(distro_config, fresh_index=True)
+            if status == DISTRO_UNCHANGED:
+                return STATUS_NAMES[status], None
+            return STATUS_NAMES[status], self.get_distro_id(distro_config['name'])
+
+        self.load_fresh_index()
+        return self.roll_out(
+            [
+                (distro_config['name'], partial(deploy, distro_config))
+                for distro_config in distro_configs
+            ],
+            max_in_flight,
+            **kwargs
+        )
+
+    def disable_distro(self, distro, name):
+        """Disable found distribution, keeping the rest of its live config"""
+        response = self.call(
+            'update_distribution',
+            DistributionConfig=dict(distro['DistributionConfig'], Enabled=False),
+            Id=distro['Id'],
+            IfMatch=distro['ETag'],
         )
+        self.index.update(name, response['Distribution'], response.get('ETag'))
+        return response
 
-    def ensure_distro_existence(self, distro_config):
-        """Create distro if it does not exist, update its config otherwise"""
-        distro = self.find_distro(distro_config.get('name'))
+    def delete_distro(self, name):
+        """Delete disabled and deployed distribution with its current ETag"""
+        distro = self.find_distro(name)
         if not distro:
+            return None
+        response = self.call('delete_distribution', Id=distro['Id'], IfMatch=distro['ETag'])
+        self.index.invalidate(name)
+        if self.state_cache is not None:
+            self.state_cache.discard(name)
+        return response
+
+    def retire_distros(self, names, max_in_flight=10, **kwargs):
+        """Disable distributions, then delete each one once it is deployed
+
+        Up to `max_in_flight` distributions are disabled at once and their
+        deployment is followed in shared listing sweeps, see `roll_out` for
+        other arguments. Results map names to `deleted`, `missing` for ones
+        that do not exist, or `disabled` for ones still deploying after
+        timeout. Running it again resumes from the current state, because
+        disabled distributions are not updated again and deleted ones are
+        missing.
+        """
+        def disable(name):
+            distro = self.find_distro(name)
+            if not distro:
+                return 'missing', None
+            if distro['DistributionConfig'].get('Enabled'):
+                self.disable_distro(distro, name)
+            return 'disabled', distro['Id']
+
+        def delete(name, distro_id):
+            self.delete_distro(name)
+            return 'deleted'
+
+        self.index.load()
+        return self.roll_out(
+            [(name, partial(disable, name)) for name in names],
+            max_in_flight,
+            on_deployed=delete,
+            **kwargs
+        )
+
+    def drift_report(self, distro_configs, max_workers=8):
+        """Get field level changes of distributions drifted from their configs
+
+        Report maps names of drifted distributions to their changes, see
+        `diff_distro_config`, or to None when they do not exist. Only
+        distributions whose listing or desired config changed since they
+        were last found in sync, according to the state cache, are fetched,
+        by `max_workers` threads. Without state cache all are fetched.
+        The listing is always fetched fresh. Policies are only listed, ones
+        missing in the account show up as changes, see
+        `get_snapshot_policy_id`.
+        """
+        self.index.clear()
+        listing = self.index.load()
+        get_policy_id = partial(
+            get_snapshot_policy_id,
+            {'policies': self.get_listed_policies(distro_configs)},
+        )
+        report = {}
+        pending = []
+        for distro_config in distro_configs:
+            distro_config = resolve_config_policies(distro_config, get_policy_id)
+            name = distro_config['name']
+            listed = listing.get(name)
+            if not listed:
+                report[name] = None
+                continue
+            with self.measure('get_aws_config'):
+                desired_config = render_aws_config(distro_config)
+                config_hash = canonical_hash(desired_config)
+            if self.state_cache is not None and self.state_cache.is_unchanged(
+                    name,
+                    listed,
+                    config_hash,
+            ):
+                continue
+            pending.append((name, listed, desired_config, config_hash))
+
+        def check(name, listed, desired_config, config_hash):
+            live = self.get_distro_config(listed['Id'])
+            live_hash = canonical_hash(live['DistributionConfig'])
+            entry = None
+            if self.state_cache is not None:
+                entry = self.state_cache.get(name)
+            if (
+                    entry and
+                    entry.get('LiveHash') == live_hash and
+                    entry['ConfigHash'] == config_hash
+            ):
+                changes = []
+            else:
+                with self.measure('diff_distro_config'):
+                    changes = diff_distro_config(
+                        desired_config,
+                        live['DistributionConfig'],
+                    )
+            if not changes and self.state_cache is not None:
+                self.state_cache.record(
+                    name,
+                    listed['Id'],
+                    live['ETag'],
+                    listed['LastModifiedTime'],
+                    config_hash,
+                    live_hash,
+                )
+            return name, changes
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(check, *args) for args in pending]
+            for future in as_completed(futures):
+                name, changes = future.result()
+                if changes:
+                    report[name] = changes
+        if self.state_cache is not None:
+            self.state_cache.save()
+        return report
+
+    def take_snapshot(self, names, max_workers=8):
+        """Snapshot distribution listing with configs of named distributions"""
+        snapshot = new_snapshot()
+        for name, distro in list(self.index.load().items()):
+            snapshot['distros'][name] = {
+                'Id': distro['Id'],
+                'DomainName': distro['DomainName'],
+            }
+        wanted = [
+            snapshot['distros'][name] for name in names if name in snapshot['distros']
+        ]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            configs = executor.map(
+                lambda distro: self.get_distro_config(distro['Id']),
+                wanted,
+            )
+            for distro, config in zip(wanted, configs):
+                distro['ETag'] = config['ETag']
+                distro['DistributionConfig'] = config['DistributionConfig']
+        return snapshot
+
+    def export_configs(self, fp, workers=8):
+        """Write module config of every distribution to file as JSON lines
+
+        Listing pages are fetched on demand and configs by `workers` threads
+        with at most twice as many requests in flight, so memory use does not
+        grow with the account. Each line holds `Id`, `ETag` and `config` and
+        is written as soon as its config arrives. Distributions deleted
+        during export are skipped. Returns number of written lines.
+        """
+        def fetch(distro_id):
+            try:
+                return distro_id, self.get_distro_config(distro_id)
+            except Exception as error:
+                if get_error_code(error) != 'NoSuchDistribution':
+                    raise
+                return distro_id, None
+
+        def write(futures):
+            written = 0
+            for future in futures:
+                distro_id, response = future.result()
+                if response is None:
+                    continue
+                fp.write(json.dumps({
+                    'Id': distro_id,
+                    'ETag': response.get('ETag'),
+                    'config': read_aws_config(response['DistributionConfig']),
+                }, sort_keys=True, default=str) + '\n')
+                written += 1
+            return written
+
+        written = 0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for distro in self.iter_distros():
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    written += write(done)
+                pending.add(executor.submit(fetch, distro['Id']))
+            written += write(as_completed(pending))
+        return written
+
+    def plan(self, distro_configs, snapshot=None, max_workers=8):
+        """Plan creates and updates of distributions
+
+        With a snapshot given, planning makes no API calls. Otherwise a
+        fresh snapshot, with policies used by configs, is taken and kept in
+        the plan for `apply`. Policies are never created by planning.
+        """
+        if snapshot is None:
+            snapshot = self.take_snapshot(
+                [distro_config['name'] for distro_config in distro_configs],
+                max_workers,
+            )
+            snapshot['policies'] = self.get_listed_policies(distro_configs)
+        return make_plan(distro_configs, snapshot)
+
+    def apply(self, plan, max_workers=8):
+        """Apply planned creates and updates concurrently
+
+        Updates use ETags from the plan snapshot, a distribution is fetched
+        again only when its ETag turns out to be stale.
+        """
+        def create(distro_config):
             self.create_distro(distro_config)
-            return 1
-        if self.did_distro_change(distro['DistributionConfig'], distro_config):
+            return DISTRO_CREATED
+
+        def update(distro, distro_config):
             self.update_distro(distro, distro_config)
-            return 2
-        return 3
+            return DISTRO_UPDATED
+
+        tasks = {}
+        for distro_config in plan.creates:
+            tasks[distro_config['name']] = partial(create, distro_config)
+        for planned in plan.updates:
+            distro_config = planned['config']
+            tasks[distro_config['name']] = partial(
+                update,
+                plan.snapshot['distros'][distro_config['name']],
+                distro_config,
+            )
+        return run_tasks(tasks, max_workers)
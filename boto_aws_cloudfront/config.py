@@ -0,0 +1,535 @@
+"""Flat distribution config and its translation to AWS config"""
+
+DEFAULT_CONFIG = {
+    'cache_behaviors': [],
+    'cache_compress': False,
+    'cache_default_ttl': 60,
+    'cache_forward_cookies_mode': 'none',
+    'cache_forward_querystring': False,
+    'cache_max_ttl': 3600,
+    'cache_min_ttl': 0,
+    'cache_policy': None,
+    'cache_policy_id': None,
+    'cache_trusted_signers': [],
+    'certificate_arn': None,
+    'certificate_iam': None,
+    'certificate_source': '',
+    'enabled': True,
+    'function_associations': [],
+    'http_version': 'http2',
+    'https_behavior': 'redirect-to-https',
+    'ipv6': True,
+    'lambda_function_associations': [],
+    'logging_bucket': None,
+    'logging_include_cookies': False,
+    'logging_prefix': '',
+    'origin_custom_headers': {},
+    'origin_failover_status_codes': [],
+    'origin_keepalive_timeout': 5,
+    'origin_protocol_policy': 'http-only',
+    'origin_read_timeout': 30,
+    'origin_request_policy': None,
+    'origin_request_policy_id': None,
+    'origin_settings': {},
+    'origin_shield_region': None,
+    'price_class': 'PriceClass_100',
+    'realtime_log_config_arn': None,
+    'root_object': '',
+}
+
+# Config keys of a cache behavior, path behaviors inherit them from distribution
+CACHE_BEHAVIOR_KEYS = (
+    'cache_compress',
+    'cache_default_ttl',
+    'cache_forward_cookies_mode',
+    'cache_forward_querystring',
+    'cache_max_ttl',
+    'cache_min_ttl',
+    'cache_policy_id',
+    'cache_trusted_signers',
+    'function_associations',
+    'https_behavior',
+    'lambda_function_associations',
+    'origin_request_policy_id',
+    'realtime_log_config_arn',
+)
+
+# Domain suffix of S3 buckets receiving standard logs
+LOGGING_BUCKET_SUFFIX = '.s3.amazonaws.com'
+
+# Config keys of an S3 origin, `origin_settings` override them per bucket
+ORIGIN_KEYS = (
+    'origin_custom_headers',
+    'origin_keepalive_timeout',
+    'origin_protocol_policy',
+    'origin_read_timeout',
+    'origin_shield_region',
+)
+
+def clear_dict(config):
+    """Clear dictionary of null values"""
+    return dict((k, v) for k, v in config.items() if v != None)
+
+def get_list_config(data):
+    """Get typical AWS compatible list structure"""
+    return {
+        'Quantity': len(data),
+        'Items': data,
+    }
+
+def map_bucket_to_s3_target(bucket_name, region):
+    """Translate S3 bucket name into origin config base"""
+    s3_source = '%s.s3-website-%s.amazonaws.com' % (bucket_name, region)
+    return {
+        'DomainName': s3_source,
+        'Id': s3_source,
+    }
+
+def get_origin_settings(distro_config, bucket_name):
+    """Get origin config keys of bucket from normalized module config"""
+    settings = dict((key, distro_config.get(key)) for key in ORIGIN_KEYS)
+    settings.update((distro_config.get('origin_settings') or {}).get(bucket_name, {}))
+    return settings
+
+def map_s3_target_to_origin(s3_target, settings=None):
+    """Translate target into AWS compatible origin config"""
+    settings = settings or DEFAULT_CONFIG
+    headers = settings.get('origin_custom_headers') or {}
+    origin = {
+        'DomainName': s3_target['DomainName'],
+        'Id': s3_target['Id'],
+        'CustomOriginConfig': {
+            'HTTPPort': 80,
+            'HTTPSPort': 443,
+            'OriginProtocolPolicy': settings.get('origin_protocol_policy'),
+            'OriginSslProtocols': {
+                'Quantity': 3,
+                'Items': ['TLSv1', 'TLSv1.1', 'TLSv1.2'],
+            },
+            'OriginReadTimeout': settings.get('origin_read_timeout'),
+            'OriginKeepaliveTimeout': settings.get('origin_keepalive_timeout'),
+        },
+        'OriginPath': '',
+        'CustomHeaders': {
+            'Quantity': 0,
+        },
+        'OriginShield': {
+            'Enabled': False,
+        },
+    }
+    if headers:
+        origin['CustomHeaders'] = get_list_config([
+            {'HeaderName': name, 'HeaderValue': value}
+            for name, value in sorted(headers.items())
+        ])
+    if settings.get('origin_shield_region'):
+        origin['OriginShield'] = {
+            'Enabled': True,
+            'OriginShieldRegion': settings.get('origin_shield_region'),
+        }
+    return origin
+
+def read_origin_settings(origin):
+    """Get origin config keys from AWS origin config"""
+    custom_origin_config = origin.get('CustomOriginConfig') or {}
+    custom_headers = origin.get('CustomHeaders') or {}
+    origin_shield = origin.get('OriginShield') or {}
+    settings = dict((key, DEFAULT_CONFIG[key]) for key in ORIGIN_KEYS)
+    for key, field in (
+            ('origin_keepalive_timeout', 'OriginKeepaliveTimeout'),
+            ('origin_protocol_policy', 'OriginProtocolPolicy'),
+            ('origin_read_timeout', 'OriginReadTimeout'),
+    ):
+        if field in custom_origin_config:
+            settings[key] = custom_origin_config[field]
+    settings['origin_custom_headers'] = dict(
+        (header['HeaderName'], header['HeaderValue'])
+        for header in custom_headers.get('Items') or []
+    )
+    if origin_shield.get('Enabled'):
+        settings['origin_shield_region'] = origin_shield.get('OriginShieldRegion')
+    return settings
+
+def get_origin_group_id(origin):
+    """Get ID of failover origin group led by origin"""
+    return '%s-failover' % origin['Id']
+
+def get_origin_groups(distro_config, origins):
+    """Get AWS origin groups failing over from first origin to the second one
+
+    Returns None unless failover status codes are configured and there are
+    at least two origins.
+    """
+    status_codes = distro_config.get('origin_failover_status_codes')
+    if not status_codes or len(origins) < 2:
+        return None
+    return get_list_config([{
+        'Id': get_origin_group_id(origins[0]),
+        'FailoverCriteria': {
+            'StatusCodes': get_list_config(sorted(status_codes)),
+        },
+        'Members': get_list_config([
+            {'OriginId': origin['Id']} for origin in origins[:2]
+        ]),
+    }])
+
+def map_origin_to_bucket_name(origin):
+    """Translate origin into S3 bucket name"""
+    if '.s3-website-' in origin['Id']:
+        index = origin['Id'].find('.s3-website-')
+        return origin['Id'][:index]
+    return origin['Id']
+
+def normalize_config(desired_config):
+    """Fill undefined config values with default config
+
+    Specs, see `spec.DistroSpec`, are already normalized and are returned
+    as they are.
+    """
+    if getattr(desired_config, 'normalized', False):
+        return desired_config
+    normalized_config = DEFAULT_CONFIG.copy()
+    normalized_config.update(desired_config)
+    return normalized_config
+
+def get_viewer_certificate(distro_config):
+    """Get AWS viewer certificate config from normalized module config"""
+    certificate_source = distro_config.get('certificate_source')
+    use_default_certificate = False
+
+    if certificate_source == 'acm':
+        certificate = distro_config.get('certificate_arn')
+    elif certificate_source == 'iam':
+        certificate = distro_config.get('certificate_iam')
+    else:
+        certificate = None
+        certificate_source = ''
+        use_default_certificate = True
+
+    return clear_dict({
+        'CloudFrontDefaultCertificate': use_default_certificate,
+        'Certificate': certificate,
+        'IAMCertificateId': distro_config.get('certificate_iam'),
+        'ACMCertificateArn': distro_config.get('certificate_arn'),
+        'MinimumProtocolVersion': 'TLSv1',
+        'SSLSupportMethod': 'sni-only',
+        'CertificateSource': certificate_source,
+    })
+
+def get_function_associations(behavior_config):
+    """Get AWS Lambda@Edge and CloudFront Function associations of behavior"""
+    lambda_functions = [
+        {
+            'EventType': association['event_type'],
+            'LambdaFunctionARN': association['arn'],
+            'IncludeBody': association.get('include_body', False),
+        }
+        for association in behavior_config.get('lambda_function_associations') or []
+    ]
+    functions = [
+        {
+            'EventType': association['event_type'],
+            'FunctionARN': association['arn'],
+        }
+        for association in behavior_config.get('function_associations') or []
+    ]
+    return (
+        get_list_config(lambda_functions) if lambda_functions else {'Quantity': 0},
+        get_list_config(functions) if functions else {'Quantity': 0},
+    )
+
+def read_function_associations(cache_behavior):
+    """Get module config of function associations from AWS cache behavior"""
+    lambda_associations = cache_behavior.get('LambdaFunctionAssociations') or {}
+    associations = cache_behavior.get('FunctionAssociations') or {}
+    return {
+        'lambda_function_associations': [
+            {
+                'event_type': association['EventType'],
+                'arn': association['LambdaFunctionARN'],
+                'include_body': association.get('IncludeBody', False),
+            }
+            for association in lambda_associations.get('Items') or []
+        ],
+        'function_associations': [
+            {
+                'event_type': association['EventType'],
+                'arn': association['FunctionARN'],
+            }
+            for association in associations.get('Items') or []
+        ],
+    }
+
+def set_function_version(distro_config, function_arn):
+    """Get config with Lambda@Edge associations of function moved to version
+
+    Associations of the same function with any version, in the distribution
+    and its cache behaviors, are pointed to versioned `function_arn`.
+    """
+    function = function_arn.rsplit(':', 1)[0]
+
+    def set_version(config):
+        associations = config.get('lambda_function_associations')
+        if not associations:
+            return config
+        return dict(config, lambda_function_associations=[
+            dict(association, arn=function_arn)
+            if association['arn'].rsplit(':', 1)[0] == function else association
+            for association in associations
+        ])
+
+    next_config = set_version(distro_config)
+    if next_config.get('cache_behaviors'):
+        next_config = dict(next_config, cache_behaviors=[
+            set_version(behavior) for behavior in next_config['cache_behaviors']
+        ])
+    return next_config
+
+def get_cache_behavior(behavior_config, target_origin_id):
+    """Get AWS cache behavior config from module config of behavior
+
+    Cache policy replaces legacy forwarded values and TTLs of behavior.
+    """
+    signers = behavior_config.get('cache_trusted_signers')
+    lambda_functions, functions = get_function_associations(behavior_config)
+    cache_behavior = {
+        'AllowedMethods': {
+            'Quantity': 2,
+            'Items': ['GET', 'HEAD'],
+            'CachedMethods': {
+                'Quantity': 2,
+                'Items': ['GET', 'HEAD'],
+            },
+        },
+        'Compress': behavior_config.get('cache_compress'),
+        'DefaultTTL': behavior_config.get('cache_default_ttl'),
+        'ForwardedValues': {
+            'Cookies': {'Forward': behavior_config.get('cache_forward_cookies_mode')},
+            'Headers': {'Quantity': 0},
+            'QueryString': behavior_config.get('cache_forward_querystring'),
+            'QueryStringCacheKeys': {'Quantity': 0},
+        },
+        'FunctionAssociations': functions,
+        'LambdaFunctionAssociations': lambda_functions,
+        'MaxTTL': behavior_config.get('cache_max_ttl'),
+        'MinTTL': behavior_config.get('cache_min_ttl'),
+        'SmoothStreaming': False,
+        'ViewerProtocolPolicy': behavior_config.get('https_behavior'),
+        'TargetOriginId': target_origin_id,
+        'TrustedSigners': {
+            'Enabled': len(signers) > 0,
+            'Quantity': len(signers),
+            'Items': signers,
+        },
+    }
+    if behavior_config.get('realtime_log_config_arn'):
+        cache_behavior['RealtimeLogConfigArn'] = behavior_config['realtime_log_config_arn']
+    if behavior_config.get('cache_policy_id'):
+        for field in ('DefaultTTL', 'ForwardedValues', 'MaxTTL', 'MinTTL'):
+            del cache_behavior[field]
+        cache_behavior['CachePolicyId'] = behavior_config['cache_policy_id']
+    if behavior_config.get('origin_request_policy_id'):
+        cache_behavior['OriginRequestPolicyId'] = (
+            behavior_config['origin_request_policy_id']
+        )
+    return cache_behavior
+
+def get_cache_behaviors(distro_config, default_origin_id):
+    """Get AWS path pattern cache behaviors from normalized module config
+
+    Behaviors route to their `s3_bucket`, or the default origin, and inherit
+    unset cache settings from the distribution.
+    """
+    region = distro_config.get('region')
+    items = []
+    for behavior in distro_config.get('cache_behaviors'):
+        behavior_config = dict((key, distro_config.get(key)) for key in CACHE_BEHAVIOR_KEYS)
+        behavior_config.update(behavior)
+        target_origin_id = default_origin_id
+        if behavior_config.get('s3_bucket'):
+            target_origin_id = map_bucket_to_s3_target(
+                behavior_config['s3_bucket'],
+                region,
+            )['Id']
+        cache_behavior = get_cache_behavior(behavior_config, target_origin_id)
+        cache_behavior['PathPattern'] = behavior_config['path_pattern']
+        items.append(cache_behavior)
+    if not items:
+        return {'Quantity': 0}
+    return get_list_config(items)
+
+def get_logging(distro_config):
+    """Get AWS standard logging config from normalized module config"""
+    bucket = distro_config.get('logging_bucket')
+    if not bucket:
+        return {
+            'Enabled': False,
+            'IncludeCookies': False,
+            'Bucket': '',
+            'Prefix': '',
+        }
+    if not bucket.endswith('.amazonaws.com'):
+        bucket += LOGGING_BUCKET_SUFFIX
+    return {
+        'Enabled': True,
+        'IncludeCookies': distro_config.get('logging_include_cookies'),
+        'Bucket': bucket,
+        'Prefix': distro_config.get('logging_prefix') or '',
+    }
+
+def read_logging(logging):
+    """Get module config of standard logging from AWS logging config"""
+    if not logging.get('Enabled'):
+        return {}
+    bucket = logging.get('Bucket')
+    if bucket.endswith(LOGGING_BUCKET_SUFFIX):
+        bucket = bucket[:-len(LOGGING_BUCKET_SUFFIX)]
+    return {
+        'logging_bucket': bucket,
+        'logging_include_cookies': logging.get('IncludeCookies'),
+        'logging_prefix': logging.get('Prefix'),
+    }
+
+def get_aws_config(desired_config):
+    """Get AWS config from module config or spec"""
+    distro_config = normalize_config(desired_config)
+    origins = [
+        map_s3_target_to_origin(
+            map_bucket_to_s3_target(bucket, distro_config.get('region')),
+            get_origin_settings(distro_config, bucket),
+        )
+        for bucket in distro_config.get('s3_buckets')
+    ]
+    origin_groups = get_origin_groups(distro_config, origins)
+    default_origin_id = origins[0]['Id']
+    if origin_groups:
+        default_origin_id = origin_groups['Items'][0]['Id']
+
+    config = {
+        'CacheBehaviors': get_cache_behaviors(distro_config, default_origin_id),
+        'Comment': distro_config.get('name'),
+        'CustomErrorResponses': {'Quantity': 0},
+        'DefaultCacheBehavior': get_cache_behavior(distro_config, default_origin_id),
+        'DefaultRootObject': distro_config.get('root_object'),
+        'Enabled': distro_config.get('enabled'),
+        'HttpVersion': distro_config.get('http_version'),
+        'IsIPV6Enabled': distro_config.get('ipv6'),
+        'Logging': get_logging(distro_config),
+        'PriceClass': distro_config.get('price_class', 'PriceClass_100'),
+        'Restrictions': {
+            'GeoRestriction': {
+                'RestrictionType': 'none',
+                'Quantity': 0
+            }
+        },
+        'ViewerCertificate': get_viewer_certificate(distro_config),
+        'WebACLId': '',
+    }
+
+    config['Aliases'] = get_list_config(distro_config.get('domains'))
+    config['Origins'] = get_list_config(origins)
+    if origin_groups:
+        config['OriginGroups'] = origin_groups
+
+    return clear_dict(config)
+
+def read_cache_behavior(cache_behavior):
+    """Get module config of behavior from AWS cache behavior config"""
+    config = {'https_behavior': cache_behavior.get('ViewerProtocolPolicy')}
+    for key, field in (
+            ('cache_compress', 'Compress'),
+            ('cache_default_ttl', 'DefaultTTL'),
+            ('cache_max_ttl', 'MaxTTL'),
+            ('cache_min_ttl', 'MinTTL'),
+            ('cache_policy_id', 'CachePolicyId'),
+            ('origin_request_policy_id', 'OriginRequestPolicyId'),
+            ('realtime_log_config_arn', 'RealtimeLogConfigArn'),
+    ):
+        if field in cache_behavior:
+            config[key] = cache_behavior[field]
+
+    forwarded_values = cache_behavior.get('ForwardedValues')
+    trusted_signers = cache_behavior.get('TrustedSigners')
+
+    if forwarded_values:
+        config['cache_forward_cookies_mode'] = (
+            forwarded_values.get('Cookies').get('Forward')
+        )
+        config['cache_forward_querystring'] = (
+            forwarded_values.get('QueryString')
+        )
+    if trusted_signers and trusted_signers.get('Items', None):
+        config['cache_trusted_signers'] = trusted_signers.get('Items')
+    config.update(read_function_associations(cache_behavior))
+    return config
+
+def read_aws_config(aws_config, factory=None):
+    """Get module config from AWS config
+
+    Config is passed to `factory`, for example `DistroSpec.from_dict`, if
+    given.
+    """
+    config = DEFAULT_CONFIG.copy()
+    domains = aws_config.get('Aliases')
+    origins = aws_config.get('Origins')
+    default_cache_behavior = aws_config.get('DefaultCacheBehavior')
+    cache_behaviors = aws_config.get('CacheBehaviors')
+    origin_groups = aws_config.get('OriginGroups')
+    origin_group_ids = set()
+    logging = aws_config.get('Logging')
+    viewer_certificate = aws_config.get('ViewerCertificate')
+
+    config['name'] = aws_config.get('Comment')
+    config['enabled'] = aws_config.get('Enabled')
+    config['http_version'] = aws_config.get('HttpVersion', '').lower()
+    config['ipv6'] = aws_config.get('IsIPV6Enabled')
+    config['price_class'] = aws_config.get('PriceClass')
+    config['root_object'] = aws_config.get('DefaultRootObject')
+
+    if logging:
+        config.update(read_logging(logging))
+    if origin_groups and origin_groups.get('Items'):
+        origin_group = origin_groups['Items'][0]
+        origin_group_ids = set(group['Id'] for group in origin_groups['Items'])
+        config['origin_failover_status_codes'] = (
+            origin_group['FailoverCriteria']['StatusCodes']['Items']
+        )
+    if default_cache_behavior:
+        config.update(read_cache_behavior(default_cache_behavior))
+    if cache_behaviors and cache_behaviors.get('Items'):
+        config['cache_behaviors'] = []
+        for cache_behavior in cache_behaviors['Items']:
+            behavior = dict(DEFAULT_CONFIG, **read_cache_behavior(cache_behavior))
+            behavior = dict((key, behavior[key]) for key in CACHE_BEHAVIOR_KEYS)
+            behavior['path_pattern'] = cache_behavior['PathPattern']
+            behavior['s3_bucket'] = None
+            if cache_behavior['TargetOriginId'] not in origin_group_ids:
+                behavior['s3_bucket'] = map_origin_to_bucket_name({
+                    'Id': cache_behavior['TargetOriginId'],
+                })
+            config['cache_behaviors'].append(behavior)
+    if viewer_certificate:
+        config['certificate_arn'] = viewer_certificate.get('ACMCertificateArn')
+        config['certificate_iam'] = viewer_certificate.get('IAMCertificateId')
+        config['certificate_source'] = viewer_certificate.get('CertificateSource')
+    if origins:
+        config['s3_buckets'] = [
+            map_origin_to_bucket_name(origin) for origin in origins['Items']
+        ]
+        settings = [read_origin_settings(origin) for origin in origins['Items']]
+        if settings:
+            config.update(settings[0])
+            config['origin_settings'] = {}
+        for bucket, bucket_settings in zip(config['s3_buckets'], settings):
+            overrides = dict(
+                (key, value) for key, value in bucket_settings.items()
+                if value != config[key]
+            )
+            if overrides:
+                config['origin_settings'][bucket] = overrides
+    if domains:
+        config['domains'] = domains['Items']
+
+    if factory:
+        return factory(config)
+    return config
@@ -0,0 +1,143 @@
+"""Field level comparison of AWS distribution configs"""
+import hashlib
+import json
+from collections import namedtuple
+
+Change = namedtuple('Change', ['path', 'desired', 'live'])
+
+# Lists whose order is significant, all others are compared as sets
+ORDERED_LISTS = frozenset(['CacheBehaviors', 'Members'])
+
+# Fields identifying items of lists of structures, first present one is used
+ITEM_KEYS = ('Id', 'PathPattern', 'EventType', 'HeaderName', 'ErrorCode', 'OriginId')
+
+# Fields AWS returns in different letter case than it accepts
+CASE_INSENSITIVE = frozenset(['HttpVersion'])
+
+# Optional fields set only by module config, missing in desired config they
+# must be missing, empty or disabled in live config too
+MANAGED_FIELDS = frozenset([
+    'CachePolicyId',
+    'FunctionAssociations',
+    'OriginGroups',
+    'OriginRequestPolicyId',
+    'OriginShield',
+    'RealtimeLogConfigArn',
+])
+
+class KeyedItems(dict):
+    """Items of AWS list mapped by their identifying field"""
+
+def is_empty(value):
+    """Check if value is equivalent to a missing field"""
+    if isinstance(value, dict):
+        return all(is_empty(item) for item in value.values())
+    return value is None or value == '' or value == []
+
+def is_disabled(value):
+    """Check if value is equivalent to a missing field or disables a feature"""
+    if isinstance(value, dict) and value.get('Enabled') is False:
+        return True
+    return is_empty(value)
+
+def normalize_list(items, ordered=False):
+    """Normalize list items, make unordered lists comparable"""
+    items = [normalize_value(item) for item in items]
+    if ordered or not items:
+        return items
+    if all(isinstance(item, dict) for item in items):
+        for key in ITEM_KEYS:
+            if all(key in item for item in items):
+                return KeyedItems((item[key], item) for item in items)
+        return items
+    try:
+        return sorted(items)
+    except TypeError:
+        return sorted(items, key=repr)
+
+def normalize_value(value, name=None):
+    """Normalize AWS config value so that equal configs compare equal"""
+    if isinstance(value, dict):
+        normalized = dict(
+            (key, normalize_value(item, key))
+            for key, item in value.items()
+            if key not in ('Quantity', 'Items')
+        )
+        if 'Quantity' in value or 'Items' in value:
+            normalized['Items'] = normalize_list(
+                value.get('Items') or [],
+                name in ORDERED_LISTS,
+            )
+        return normalized
+    if isinstance(value, list):
+        return normalize_list(value, name in ORDERED_LISTS)
+    if name in CASE_INSENSITIVE and hasattr(value, 'lower'):
+        return value.lower()
+    return value
+
+def normalize_viewer_certificate(viewer_certificate):
+    """Drop certificate fields AWS derives from the others"""
+    if viewer_certificate.get('CloudFrontDefaultCertificate'):
+        return {'CloudFrontDefaultCertificate': True}
+    return dict(
+        (key, value) for key, value in viewer_certificate.items()
+        if key not in ('Certificate', 'CertificateSource')
+    )
+
+def normalize_distro_config(config):
+    """Normalize whole AWS distribution config"""
+    config = dict(config)
+    if config.get('ViewerCertificate'):
+        config['ViewerCertificate'] = normalize_viewer_certificate(
+            config['ViewerCertificate']
+        )
+    return normalize_value(config)
+
+def canonical_hash(value):
+    """Get hash of JSON value that does not depend on order of dict keys"""
+    serialized = json.dumps(value, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+def is_missing(key, value):
+    """Check if field is equivalent to its absence"""
+    return is_disabled(value) if key in MANAGED_FIELDS else is_empty(value)
+
+def diff_values(desired, live, path, changes):
+    """Collect differences between normalized values"""
+    if isinstance(desired, dict) and isinstance(live, dict):
+        for key in sorted(desired):
+            if key in live:
+                diff_values(desired[key], live[key], path + (key,), changes)
+            elif not is_missing(key, desired[key]):
+                changes.append(Change(path + (key,), desired[key], None))
+        for key in sorted(set(live) - set(desired)):
+            if isinstance(desired, KeyedItems) or (
+                    key in MANAGED_FIELDS and not is_disabled(live[key])
+            ):
+                changes.append(Change(path + (key,), None, live[key]))
+    elif (
+            isinstance(desired, list) and
+            isinstance(live, list) and
+            len(desired) == len(live) and
+            all(isinstance(item, dict) for item in desired)
+    ):
+        for index, (desired_item, live_item) in enumerate(zip(desired, live)):
+            diff_values(desired_item, live_item, path + (index,), changes)
+    elif desired != live:
+        changes.append(Change(path, desired, live))
+    return changes
+
+def diff_distro_config(desired_config, live_config):
+    """Get changes needed to turn live AWS config into desired one
+
+    Only fields present in desired config and managed fields, see
+    `MANAGED_FIELDS`, are compared, other fields AWS adds on its own are
+    ignored. Items of unordered lists are matched by their identifying
+    field, for example origins by `Id`.
+    """
+    return diff_values(
+        normalize_distro_config(desired_config),
+        normalize_distro_config(live_config),
+        (),
+        [],
+    )
@@ -0,0 +1,299 @@
+"""In-process fake of CloudFront API for tests and benchmarks"""
+import bisect
+import copy
+import datetime
+import itertools
+import threading
+import time
+from collections import Counter, OrderedDict
+
+class UTCZone(datetime.tzinfo):
+    """UTC timezone, `datetime.timezone.utc` is missing on Python 2"""
+    def utcoffset(self, dt):
+        return datetime.timedelta(0)
+
+    def tzname(self, dt):
+        return 'UTC'
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+UTC = UTCZone()
+
+def get_site_config(index, **kwargs):
+    """Get flat config of synthetic site"""
+    return dict(
+        domains=['site-%s.example.com' % index],
+        name='site-%s' % index,
+        s3_buckets=['bucket-%s' % index],
+        region='eu-west-1',
+        **kwargs
+    )
+
+class FakeClientError(Exception):
+    """Error shaped like botocore ClientError"""
+    def __init__(self, code, operation_name):
+        super(FakeClientError, self).__init__(
+            'An error occurred (%s) when calling the %s operation' % (code, operation_name)
+        )
+        self.response = {'Error': {'Code': code, 'Message': code}}
+        self.operation_name = operation_name
+
+class FakeCloudFrontClient(object):
+    """Fake CloudFront client keeping distributions in memory
+
+    Supports paginated listing, ETags, deployment delay, injected latency
+    and throttling of calls above `max_rate` per second. Every call is
+    counted in `calls` by operation name.
+    """
+    def __init__(
+            self,
+            page_size=100,
+            latency=0,
+            max_rate=None,
+            deploy_time=0,
+            clock=time.time,
+            sleep=time.sleep,
+    ):
+        self.page_size = page_size
+        self.latency = latency
+        self.max_rate = max_rate
+        self.deploy_time = deploy_time
+        self.clock = clock
+        self.sleep = sleep
+        self.distros = OrderedDict()
+        self.caller_references = set()
+        self.invalidations = {}
+        self.policies = {'CachePolicy': OrderedDict(), 'OriginRequestPolicy': OrderedDict()}
+        self.calls = Counter()
+        self.call_times = []
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def request(self, operation_name):
+        """Count call, apply latency and throttling"""
+        with self.lock:
+            now = self.clock()
+            self.calls[operation_name] += 1
+            if self.max_rate:
+                self.call_times = [
+                    called_at for called_at in self.call_times if now - called_at < 1
+                ]
+                if len(self.call_times) >= self.max_rate:
+                    self.calls['Throttled'] += 1
+                    raise FakeClientError('Throttling', operation_name)
+                self.call_times.append(now)
+        if self.latency:
+            self.sleep(self.latency)
+
+    def get_distro(self, distro_id, operation_name):
+        """Get stored distribution or fail like CloudFront"""
+        distro = self.distros.get(distro_id)
+        if distro is None:
+            raise FakeClientError('NoSuchDistribution', operation_name)
+        return distro
+
+    def check_etag(self, distro, etag, operation_name):
+        """Fail unless ETag is current"""
+        if distro['ETag'] != etag:
+            raise FakeClientError('PreconditionFailed', operation_name)
+
+    def get_status(self, distro):
+        """Get deployment status of distribution"""
+        if self.clock() - distro['DeployedAt'] >= 0:
+            return 'Deployed'
+        return 'InProgress'
+
+    def change(self, distro, distribution_config):
+        """Store new config, start its deployment"""
+        with self.lock:
+            distro['ETag'] = 'ETAG%s' % next(self.ids)
+        distro['DistributionConfig'] = copy.deepcopy(distribution_config)
+        distro['LastModifiedTime'] = datetime.datetime.fromtimestamp(self.clock(), UTC)
+        distro['DeployedAt'] = self.clock() + self.deploy_time
+
+    def get_summary(self, distro):
+        """Get distribution as listed"""
+        config = distro['DistributionConfig']
+        return {
+            'Id': distro['Id'],
+            'ARN': 'arn:aws:cloudfront::000000000000:distribution/%s' % distro['Id'],
+            'Status': self.get_status(distro),
+            'LastModifiedTime': distro['LastModifiedTime'],
+            'DomainName': distro['DomainName'],
+            'Aliases': config.get('Aliases', {'Quantity': 0}),
+            'Comment': config.get('Comment', ''),
+            'Enabled': config.get('Enabled'),
+            'PriceClass': config.get('PriceClass'),
+        }
+
+    def get_distribution(self, distro):
+        """Get full distribution response body"""
+        return {
+            'Id': distro['Id'],
+            'Status': self.get_status(distro),
+            'LastModifiedTime': distro['LastModifiedTime'],
+            'DomainName': distro['DomainName'],
+            'DistributionConfig': copy.deepcopy(distro['DistributionConfig']),
+        }
+
+    def add_distro(self, distribution_config):
+        """Store distribution without counting an API call"""
+        with self.lock:
+            if distribution_config['CallerReference'] in self.caller_references:
+                raise FakeClientError('DistributionAlreadyExists', 'CreateDistribution')
+            self.caller_references.add(distribution_config['CallerReference'])
+            distro_id = 'E%012d' % next(self.ids)
+        distro = {
+            'Id': distro_id,
+            'DomainName': '%s.cloudfront.net' % distro_id.lower(),
+        }
+        self.change(distro, distribution_config)
+        with self.lock:
+            self.distros[distro_id] = distro
+        return distro
+
+    def list_distributions(self, Marker='', MaxItems=None):
+        """List distributions page by page"""
+        self.request('ListDistributions')
+        page_size = int(MaxItems or self.page_size)
+        with self.lock:
+            ids = sorted(self.distros)
+        start = bisect.bisect_left(ids, Marker) if Marker else 0
+        page = ids[start:start + page_size]
+        is_truncated = start + page_size < len(ids)
+        distro_list = {
+            'Marker': Marker,
+            'MaxItems': page_size,
+            'IsTruncated': is_truncated,
+            'Quantity': len(page),
+        }
+        if page:
+            distro_list['Items'] = [
+                self.get_summary(self.distros[distro_id]) for distro_id in page
+            ]
+        if is_truncated:
+            distro_list['NextMarker'] = ids[start + page_size]
+        return {'DistributionList': distro_list}
+
+    def get_distribution_config(self, Id):
+        """Get distribution config with its ETag"""
+        self.request('GetDistributionConfig')
+        distro = self.get_distro(Id, 'GetDistributionConfig')
+        return {
+            'ETag': distro['ETag'],
+            'DistributionConfig': copy.deepcopy(distro['DistributionConfig']),
+        }
+
+    def create_distribution(self, DistributionConfig):
+        """Create distribution"""
+        self.request('CreateDistribution')
+        distro = self.add_distro(DistributionConfig)
+        return {'ETag': distro['ETag'], 'Distribution': self.get_distribution(distro)}
+
+    def update_distribution(self, DistributionConfig, Id, IfMatch):
+        """Update distribution config"""
+        self.request('UpdateDistribution')
+        distro = self.get_distro(Id, 'UpdateDistribution')
+        self.check_etag(distro, IfMatch, 'UpdateDistribution')
+        self.change(distro, DistributionConfig)
+        return {'ETag': distro['ETag'], 'Distribution': self.get_distribution(distro)}
+
+    def delete_distribution(self, Id, IfMatch):
+        """Delete disabled and deployed distribution"""
+        self.request('DeleteDistribution')
+        distro = self.get_distro(Id, 'DeleteDistribution')
+        self.check_etag(distro, IfMatch, 'DeleteDistribution')
+        if distro['DistributionConfig'].get('Enabled') or (
+                self.get_status(distro) != 'Deployed'
+        ):
+            raise FakeClientError('DistributionNotDisabled', 'DeleteDistribution')
+        del self.distros[Id]
+        self.caller_references.discard(distro['DistributionConfig']['CallerReference'])
+        return {}
+
+    def create_invalidation(self, DistributionId, InvalidationBatch):
+        """Create invalidation, it completes after deployment time"""
+        self.request('CreateInvalidation')
+        self.get_distro(DistributionId, 'CreateInvalidation')
+        with self.lock:
+            invalidation_id = 'I%012d' % next(self.ids)
+        self.invalidations[invalidation_id] = {
+            'Id': invalidation_id,
+            'InvalidationBatch': copy.deepcopy(InvalidationBatch),
+            'CompletedAt': self.clock() + self.deploy_time,
+        }
+        return {'Invalidation': self.get_invalidation_body(invalidation_id)}
+
+    def get_invalidation_body(self, invalidation_id):
+        """Get invalidation response body"""
+        invalidation = self.invalidations[invalidation_id]
+        completed = self.clock() >= invalidation['CompletedAt']
+        return {
+            'Id': invalidation_id,
+            'Status': 'Completed' if completed else 'InProgress',
+            'InvalidationBatch': invalidation['InvalidationBatch'],
+        }
+
+    def get_invalidation(self, DistributionId, Id):
+        """Get invalidation status"""
+        self.request('GetInvalidation')
+        self.get_distro(DistributionId, 'GetInvalidation')
+        return {'Invalidation': self.get_invalidation_body(Id)}
+
+    def list_policies(self, policy_key, operation_name, Marker='', MaxItems=None):
+        """List custom policies of kind page by page"""
+        self.request(operation_name)
+        page_size = int(MaxItems or self.page_size)
+        policies = list(self.policies[policy_key].values())
+        start = int(Marker or 0)
+        page = policies[start:start + page_size]
+        policy_list = {
+            'MaxItems': page_size,
+            'Quantity': len(page),
+            'Items': [{'Type': 'custom', policy_key: policy} for policy in page],
+        }
+        if start + page_size < len(policies):
+            policy_list['NextMarker'] = str(start + page_size)
+        return {policy_key + 'List': policy_list}
+
+    def create_policy(self, policy_key, policy_config, operation_name):
+        """Create policy with unique name"""
+        self.request(operation_name)
+        config_key = policy_key + 'Config'
+        name = policy_config['Name']
+        with self.lock:
+            for policy in self.policies[policy_key].values():
+                if policy[config_key]['Name'] == name:
+                    raise FakeClientError(policy_key + 'AlreadyExists', operation_name)
+            policy_id = 'P%012d' % next(self.ids)
+            self.policies[policy_key][policy_id] = {
+                'Id': policy_id,
+                config_key: copy.deepcopy(policy_config),
+            }
+        return {policy_key: self.policies[policy_key][policy_id], 'ETag': 'ETAG'}
+
+    def list_cache_policies(self, Type='all', Marker='', MaxItems=None):
+        """List custom cache policies"""
+        return self.list_policies('CachePolicy', 'ListCachePolicies', Marker, MaxItems)
+
+    def create_cache_policy(self, CachePolicyConfig):
+        """Create cache policy"""
+        return self.create_policy('CachePolicy', CachePolicyConfig, 'CreateCachePolicy')
+
+    def list_origin_request_policies(self, Type='all', Marker='', MaxItems=None):
+        """List custom origin request policies"""
+        return self.list_policies(
+            'OriginRequestPolicy',
+            'ListOriginRequestPolicies',
+            Marker,
+            MaxItems,
+        )
+
+    def create_origin_request_policy(self, OriginRequestPolicyConfig):
+        """Create origin request policy"""
+        return self.create_policy(
+            'OriginRequestPolicy',
+            OriginRequestPolicyConfig,
+            'CreateOriginRequestPolicy',
+        )
@@ -0,0 +1,112 @@
+"""In-process index of distributions keyed by name"""
+import threading
+import time
+
+def get_index_entry(distro, etag=None):
+    """Get index entry from distribution summary"""
+    return {
+        'Id': distro['Id'],
+        'DomainName': distro.get('DomainName'),
+        'ETag': etag,
+        'LastModifiedTime': distro.get('LastModifiedTime'),
+    }
+
+class DistroIndex(object):
+    """Map distribution names to Id, DomainName, ETag and LastModifiedTime
+
+    The index is filled from a paginated listing. Pages are requested only
+    until the looked up name is found, so the listing resumes where the
+    previous lookup stopped. All entries expire together after `ttl`
+    seconds, `None` keeps them forever. The index is safe to share between
+    threads, concurrent lookups wait for a single listing. Optional
+    `on_lookup` is called with True for lookups answered without listing.
+    """
+    def __init__(self, list_distros, ttl=300, clock=time.time, on_lookup=None):
+        self.list_distros = list_distros
+        self.ttl = ttl
+        self.clock = clock
+        self.on_lookup = on_lookup
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """Forget all entries"""
+        with self.lock:
+            self.entries = {}
+            self.pages = None
+            self.complete = False
+            self.loaded_at = None
+
+    def is_expired(self):
+        """Check if index is older than its TTL"""
+        return (
+            self.ttl is not None and
+            self.loaded_at is not None and
+            self.clock() - self.loaded_at >= self.ttl
+        )
+
+    def add(self, distro):
+        """Index distribution summary unless its name is already known"""
+        name = distro.get('Comment', None)
+        if name not in self.entries:
+            self.entries[name] = get_index_entry(distro)
+        return name
+
+    def fetch_next(self):
+        """Index next distribution from listing, return its name"""
+        if self.complete:
+            raise StopIteration
+        if self.pages is None:
+            self.pages = iter(self.list_distros())
+            self.loaded_at = self.clock()
+        try:
+            distro = next(self.pages)
+        except StopIteration:
+            self.pages = None
+            self.complete = True
+            raise
+        return self.add(distro)
+
+    def lookup(self, name):
+        """Find index entry by distribution name"""
+        with self.lock:
+            if self.is_expired():
+                self.clear()
+            if self.on_lookup:
+                self.on_lookup(name in self.entries or self.complete)
+            while name not in self.entries:
+                try:
+                    self.fetch_next()
+                except StopIteration:
+                    return None
+            return self.entries[name]
+
+    def load(self):
+        """Fetch the whole listing so that all lookups are answered locally"""
+        with self.lock:
+            if self.is_expired():
+                self.clear()
+            while True:
+                try:
+                    self.fetch_next()
+                except StopIteration:
+                    return self.entries
+
+    def update(self, name, distro, etag=None):
+        """Store fresh distribution data, for example after create or update"""
+        with self.lock:
+            if self.loaded_at is None:
+                self.loaded_at = self.clock()
+            self.entries[name] = get_index_entry(distro, etag)
+
+    def set_etag(self, name, etag):
+        """Remember current ETag of a distribution"""
+        with self.lock:
+            if name in self.entries:
+                self.entries[name]['ETag'] = etag
+
+    def invalidate(self, name):
+        """Drop distribution from index, next lookup fetches it again"""
+        with self.lock:
+            self.entries.pop(name, None)
+            self.complete = False
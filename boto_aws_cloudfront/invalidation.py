@@ -0,0 +1,203 @@
+"""Batched and coalescing cache invalidations"""
+import posixpath
+import threading
+import time
+import uuid
+
+from .scheduler import get_error_code
+
+# CloudFront accepts at most this many paths in invalidations in progress
+MAX_PATHS = 3000
+MAX_WILDCARD_PATHS = 15
+
+def normalize_path(path):
+    """Make path absolute as CloudFront expects"""
+    return path if path.startswith('/') else '/' + path
+
+def is_covered(path, wildcards):
+    """Check if path is matched by any of wildcard paths"""
+    return any(
+        path != wildcard and path.startswith(wildcard[:-1])
+        for wildcard in wildcards
+    )
+
+def compact_paths(paths, wildcard_threshold=5):
+    """Deduplicate paths, collapse crowded directories into wildcards
+
+    Each path is billed and limited the same as a wildcard, so when at least
+    `wildcard_threshold` files of one directory are invalidated, they are
+    replaced by a single `dir/*` path.
+    """
+    paths = set(normalize_path(path) for path in paths)
+    if wildcard_threshold:
+        directories = {}
+        for path in paths:
+            if not path.endswith('*'):
+                directories.setdefault(posixpath.dirname(path), []).append(path)
+        for directory, files in directories.items():
+            if len(files) >= wildcard_threshold:
+                paths.difference_update(files)
+                paths.add(posixpath.join(directory, '*'))
+    wildcards = [path for path in paths if path.endswith('*')]
+    return sorted(path for path in paths if not is_covered(path, wildcards))
+
+def chunk_paths(paths, max_paths=MAX_PATHS, max_wildcards=MAX_WILDCARD_PATHS):
+    """Split paths into batches within CloudFront invalidation limits"""
+    batches = []
+    batch = []
+    wildcards = 0
+    for path in paths:
+        is_wildcard = path.endswith('*')
+        if len(batch) >= max_paths or (is_wildcard and wildcards >= max_wildcards):
+            batches.append(batch)
+            batch = []
+            wildcards = 0
+        batch.append(path)
+        wildcards += is_wildcard
+    if batch:
+        batches.append(batch)
+    return batches
+
+class InvalidationTimeout(Exception):
+    """Invalidation did not complete in time"""
+    def __init__(self, handle):
+        super(InvalidationTimeout, self).__init__(
+            'Invalidation of distribution %s did not complete in time' % handle.distro_id
+        )
+        self.handle = handle
+
+class Invalidation(object):
+    """Handle of requested invalidation
+
+    The handle stays queued while its paths wait for invalidations that are
+    already in progress, `ids` are filled once they are sent. Check
+    `queued` before relying on `ids`.
+    """
+    def __init__(self, invalidator, distro_id):
+        self.invalidator = invalidator
+        self.distro_id = distro_id
+        self.ids = []
+        self.queued = True
+
+    def wait(self, timeout=None, interval=20):
+        """Block until invalidation completes, send queued paths meanwhile"""
+        return self.invalidator.wait(self, timeout, interval)
+
+class Invalidator(object):
+    """Send invalidations, merge requests arriving while one is in progress
+
+    Queued paths are sent by a background timer polling the distribution
+    every `flush_interval` seconds, so they are not lost when nobody waits
+    for them. The timer keeps the process running until they are sent or
+    sending fails, failed paths stay queued for the next `invalidate` or
+    `wait`. With `flush_interval` None queued paths are only sent by those.
+    """
+    def __init__(
+            self,
+            cloudfront,
+            wildcard_threshold=5,
+            clock=time.time,
+            sleep=time.sleep,
+            flush_interval=20,
+            timer=threading.Timer,
+    ):
+        self.cloudfront = cloudfront
+        self.wildcard_threshold = wildcard_threshold
+        self.clock = clock
+        self.sleep = sleep
+        self.flush_interval = flush_interval
+        self.timer = timer
+        self.lock = threading.RLock()
+        self.pending = {}
+        self.waiting = {}
+        self.in_progress = {}
+        self.timers = {}
+
+    def invalidate(self, distro_id, paths):
+        """Invalidate paths now or queue them for the next invalidation"""
+        handle = Invalidation(self, distro_id)
+        with self.lock:
+            self.pending.setdefault(distro_id, set()).update(paths)
+            self.waiting.setdefault(distro_id, []).append(handle)
+            self.poll(distro_id)
+        return handle
+
+    def poll(self, distro_id):
+        """Forget completed invalidations, send queued paths when possible"""
+        with self.lock:
+            in_progress = [
+                invalidation_id
+                for invalidation_id in self.in_progress.get(distro_id, [])
+                if not self.is_completed(distro_id, invalidation_id)
+            ]
+            self.in_progress[distro_id] = in_progress
+            if not in_progress and self.pending.get(distro_id):
+                self.flush(distro_id)
+            if self.pending.get(distro_id):
+                self.schedule_flush(distro_id)
+
+    def schedule_flush(self, distro_id):
+        """Start background timer sending queued paths of distribution"""
+        if self.flush_interval is None or distro_id in self.timers:
+            return
+        timer = self.timer(self.flush_interval, self.flush_queued, [distro_id])
+        self.timers[distro_id] = timer
+        timer.start()
+
+    def flush_queued(self, distro_id):
+        """Send queued paths from background timer once possible"""
+        with self.lock:
+            self.timers.pop(distro_id, None)
+            self.poll(distro_id)
+
+    def is_completed(self, distro_id, invalidation_id):
+        """Check invalidation status"""
+        response = self.cloudfront.call(
+            'get_invalidation',
+            DistributionId=distro_id,
+            Id=invalidation_id,
+        )
+        return response['Invalidation']['Status'] == 'Completed'
+
+    def flush(self, distro_id):
+        """Send all queued paths of distribution"""
+        batches = chunk_paths(
+            compact_paths(self.pending.pop(distro_id), self.wildcard_threshold)
+        )
+        handles = self.waiting.get(distro_id, [])
+        for index, batch in enumerate(batches):
+            try:
+                response = self.cloudfront.call(
+                    'create_invalidation',
+                    DistributionId=distro_id,
+                    InvalidationBatch={
+                        'Paths': {'Quantity': len(batch), 'Items': batch},
+                        'CallerReference': uuid.uuid4().hex,
+                    },
+                )
+            except Exception as error:
+                pending = self.pending.setdefault(distro_id, set())
+                for unsent_batch in batches[index:]:
+                    pending.update(unsent_batch)
+                if get_error_code(error) == 'TooManyInvalidationsInProgress':
+                    return
+                raise
+            invalidation_id = response['Invalidation']['Id']
+            self.in_progress.setdefault(distro_id, []).append(invalidation_id)
+            for handle in handles:
+                handle.ids.append(invalidation_id)
+        for handle in self.waiting.pop(distro_id, []):
+            handle.queued = False
+
+    def wait(self, handle, timeout=None, interval=20):
+        """Wait until invalidations of handle are completed"""
+        started_at = self.clock()
+        while True:
+            with self.lock:
+                self.poll(handle.distro_id)
+                in_progress = self.in_progress.get(handle.distro_id, [])
+                if not handle.queued and not set(handle.ids) & set(in_progress):
+                    return handle.ids
+            if timeout is not None and self.clock() - started_at >= timeout:
+                raise InvalidationTimeout(handle)
+            self.sleep(interval)
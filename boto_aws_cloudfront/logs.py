@@ -0,0 +1,176 @@
+"""Single pass analysis of CloudFront standard access logs
+
+Gzipped log files are read line by line from a local directory, for
+example one synced from the logging bucket. Requests are aggregated per
+path into hit and miss counts, bytes and a fixed histogram of time taken,
+so memory depends on the number of distinct paths only, which is capped.
+"""
+import argparse
+import bisect
+import glob
+import gzip
+import os
+
+# Fields of log files without #Fields header
+DEFAULT_FIELDS = (
+    'date', 'time', 'x-edge-location', 'sc-bytes', 'c-ip', 'cs-method',
+    'cs(Host)', 'cs-uri-stem', 'sc-status', 'cs(Referer)', 'cs(User-Agent)',
+    'cs-uri-query', 'cs(Cookie)', 'x-edge-result-type', 'x-edge-request-id',
+    'x-host-header', 'cs-protocol', 'cs-bytes', 'time-taken',
+)
+
+HIT_RESULTS = frozenset(['Hit', 'RefreshHit'])
+MISS_RESULTS = frozenset(['Miss'])
+
+# Upper bounds of time taken histogram in seconds, growing by a fifth
+TIME_TAKEN_BUCKETS = tuple(0.001 * 1.2 ** power for power in range(61))
+
+OTHER_PATH = '(other)'
+
+def iter_log_lines(directory, pattern='*.gz'):
+    """Iterate over lines of gzipped log files in directory, by file name"""
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        with gzip.open(path, 'rb') as log_file:
+            for line in log_file:
+                yield line.decode('utf-8', 'replace')
+
+def iter_log_records(lines):
+    """Parse log lines into dicts of fields named by #Fields header"""
+    fields = DEFAULT_FIELDS
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith('#Fields:'):
+            fields = tuple(line[len('#Fields:'):].split())
+        elif line and not line.startswith('#'):
+            yield dict(zip(fields, line.split('\t')))
+
+def get_path_key(path, depth=None):
+    """Get aggregation key of path, its first `depth` segments if given"""
+    if depth is None:
+        return path
+    segments = path.split('/')[1:depth + 1]
+    return '/' + '/'.join(segments)
+
+def get_percentile(histogram, count, percentile):
+    """Get upper bound of histogram bucket holding percentile"""
+    if not count:
+        return None
+    rank = count * percentile / 100.0
+    cumulative = 0
+    for bound, bucket_count in zip(TIME_TAKEN_BUCKETS, histogram):
+        cumulative += bucket_count
+        if cumulative >= rank:
+            return bound
+    return float('inf')
+
+class LogStats(object):
+    """Per path request counts, cache results, bytes and time taken
+
+    Paths are aggregated by their first `path_depth` segments when given.
+    Paths first seen after `max_paths` distinct ones are counted together
+    under OTHER_PATH.
+    """
+    def __init__(self, path_depth=None, max_paths=10000):
+        self.path_depth = path_depth
+        self.max_paths = max_paths
+        self.paths = {}
+
+    def get_path(self, path):
+        """Get statistics of path, create them on first use"""
+        key = get_path_key(path, self.path_depth)
+        stats = self.paths.get(key)
+        if stats is None:
+            if len(self.paths) >= self.max_paths:
+                key = OTHER_PATH
+                stats = self.paths.get(key)
+            if stats is None:
+                stats = self.paths[key] = {
+                    'requests': 0,
+                    'hits': 0,
+                    'misses': 0,
+                    'bytes': 0,
+                    'histogram': [0] * (len(TIME_TAKEN_BUCKETS) + 1),
+                }
+        return stats
+
+    def add(self, record):
+        """Count one parsed log record"""
+        stats = self.get_path(record.get('cs-uri-stem', ''))
+        stats['requests'] += 1
+        result = record.get('x-edge-result-type')
+        stats['hits'] += result in HIT_RESULTS
+        stats['misses'] += result in MISS_RESULTS
+        try:
+            stats['bytes'] += int(record.get('sc-bytes', 0))
+        except ValueError:
+            pass
+        try:
+            time_taken = float(record['time-taken'])
+        except (KeyError, ValueError):
+            return
+        stats['histogram'][bisect.bisect_left(TIME_TAKEN_BUCKETS, time_taken)] += 1
+
+    def add_records(self, records):
+        """Count all parsed log records"""
+        for record in records:
+            self.add(record)
+        return self
+
+    def to_dict(self, percentiles=(50, 90, 99)):
+        """Export statistics by path with hit ratio and time percentiles"""
+        paths = {}
+        for path, stats in self.paths.items():
+            cached = stats['hits'] + stats['misses']
+            timed = sum(stats['histogram'])
+            paths[path] = {
+                'requests': stats['requests'],
+                'hits': stats['hits'],
+                'misses': stats['misses'],
+                'hit_ratio': float(stats['hits']) / cached if cached else None,
+                'bytes': stats['bytes'],
+                'time_taken': dict(
+                    ('p%s' % percentile, get_percentile(
+                        stats['histogram'],
+                        timed,
+                        percentile,
+                    ))
+                    for percentile in percentiles
+                ),
+            }
+        return paths
+
+def analyze_logs(directory, pattern='*.gz', path_depth=None, max_paths=10000):
+    """Get statistics of all gzipped log files in directory"""
+    stats = LogStats(path_depth, max_paths)
+    return stats.add_records(iter_log_records(iter_log_lines(directory, pattern)))
+
+def main():
+    """Print paths with most cache misses"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory')
+    parser.add_argument('--pattern', default='*.gz')
+    parser.add_argument('--depth', type=int, default=None, help='path segments')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    paths = analyze_logs(args.directory, args.pattern, args.depth).to_dict()
+    print('%-48s %9s %7s %9s %12s %8s %8s' % (
+        'path', 'requests', 'misses', 'hit ratio', 'bytes', 'p50 s', 'p99 s',
+    ))
+    for path, stats in sorted(
+            paths.items(),
+            key=lambda item: item[1]['misses'],
+            reverse=True,
+    )[:args.top]:
+        print('%-48s %9s %7s %9s %12s %8s %8s' % (
+            path[:48],
+            stats['requests'],
+            stats['misses'],
+            '-' if stats['hit_ratio'] is None else '%.2f' % stats['hit_ratio'],
+            stats['bytes'],
+            '%.3f' % stats['time_taken']['p50'] if stats['time_taken']['p50'] else '-',
+            '%.3f' % stats['time_taken']['p99'] if stats['time_taken']['p99'] else '-',
+        ))
+
+if __name__ == '__main__':
+    main()
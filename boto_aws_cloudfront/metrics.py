@@ -0,0 +1,137 @@
+"""Metrics collected from CloudFront client instrumentation hooks
+
+Hooks are callables receiving event name and its data. The client emits:
+
+* `call` after each API call with `operation`, `duration`, `retries`,
+  `error` code or None and response `bytes`
+* `local` after local work such as config rendering or diffing with
+  `operation` and `duration`
+* `cache` on each index lookup with `cache` name and `hit`
+"""
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def get_response_size(response):
+    """Get body size of API response from its HTTP headers"""
+    try:
+        headers = response['ResponseMetadata']['HTTPHeaders']
+        return int(headers['content-length'])
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+def format_labels(labels):
+    """Format Prometheus labels"""
+    return '{%s}' % ','.join('%s="%s"' % pair for pair in labels)
+
+class MetricsCollector(object):
+    """Hook aggregating call counts, latency histograms and cache hit rates"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.caches = {}
+
+    def get_operation(self, operation):
+        """Get statistics of operation, create them on first use"""
+        if operation not in self.operations:
+            self.operations[operation] = {
+                'count': 0,
+                'errors': 0,
+                'retries': 0,
+                'bytes': 0,
+                'duration': 0.0,
+                'histogram': [0] * len(self.buckets),
+            }
+        return self.operations[operation]
+
+    def __call__(self, event, **data):
+        with self.lock:
+            if event in ('call', 'local'):
+                stats = self.get_operation(data['operation'])
+                stats['count'] += 1
+                stats['errors'] += bool(data.get('error'))
+                stats['retries'] += data.get('retries', 0)
+                stats['bytes'] += data.get('bytes', 0)
+                stats['duration'] += data['duration']
+                for index, bound in enumerate(self.buckets):
+                    if data['duration'] <= bound:
+                        stats['histogram'][index] += 1
+                        break
+            elif event == 'cache':
+                stats = self.caches.setdefault(data['cache'], {'hits': 0, 'misses': 0})
+                stats['hits' if data['hit'] else 'misses'] += 1
+
+    def to_dict(self):
+        """Export metrics as plain dict"""
+        with self.lock:
+            operations = {}
+            for operation, stats in self.operations.items():
+                operations[operation] = {
+                    'count': stats['count'],
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'bytes': stats['bytes'],
+                    'duration': stats['duration'],
+                    'latency': dict(zip(self.buckets, stats['histogram'])),
+                }
+            caches = {}
+            for cache, stats in self.caches.items():
+                lookups = stats['hits'] + stats['misses']
+                caches[cache] = {
+                    'hits': stats['hits'],
+                    'misses': stats['misses'],
+                    'hit_rate': float(stats['hits']) / lookups if lookups else None,
+                }
+            pages = self.operations.get('list_distributions', {}).get('count', 0)
+        return {'operations': operations, 'caches': caches, 'pages': pages}
+
+    def to_prometheus(self, prefix='cloudfront'):
+        """Export metrics in Prometheus text format"""
+        lines = []
+        with self.lock:
+            name = '%s_operation_duration_seconds' % prefix
+            lines.append('# HELP %s Duration of client operations' % name)
+            lines.append('# TYPE %s histogram' % name)
+            for operation, stats in sorted(self.operations.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, stats['histogram']):
+                    cumulative += count
+                    lines.append('%s_bucket%s %s' % (
+                        name,
+                        format_labels([('operation', operation), ('le', bound)]),
+                        cumulative,
+                    ))
+                labels = format_labels([('operation', operation)])
+                lines.append('%s_bucket%s %s' % (
+                    name,
+                    format_labels([('operation', operation), ('le', '+Inf')]),
+                    stats['count'],
+                ))
+                lines.append('%s_sum%s %s' % (name, labels, stats['duration']))
+                lines.append('%s_count%s %s' % (name, labels, stats['count']))
+            for counter, help_text in (
+                    ('errors', 'Failed client operations'),
+                    ('retries', 'Retried API calls'),
+                    ('bytes', 'Bytes received from API'),
+            ):
+                name = '%s_operation_%s_total' % (prefix, counter)
+                lines.append('# HELP %s %s' % (name, help_text))
+                lines.append('# TYPE %s counter' % name)
+                for operation, stats in sorted(self.operations.items()):
+                    lines.append('%s%s %s' % (
+                        name,
+                        format_labels([('operation', operation)]),
+                        stats[counter],
+                    ))
+            for counter in ('hits', 'misses'):
+                name = '%s_cache_%s_total' % (prefix, counter)
+                lines.append('# HELP %s Cache %s' % (name, counter))
+                lines.append('# TYPE %s counter' % name)
+                for cache, stats in sorted(self.caches.items()):
+                    lines.append('%s%s %s' % (
+                        name,
+                        format_labels([('cache', cache)]),
+                        stats[counter],
+                    ))
+        return '\n'.join(lines) + '\n'
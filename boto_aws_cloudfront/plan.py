@@ -0,0 +1,83 @@
+"""Planned distribution changes and snapshots they are planned from"""
+import json
+
+from .diff import Change
+
+def new_snapshot():
+    """Get empty snapshot of distributions and policies"""
+    return {'distros': {}, 'policies': {}}
+
+def load_snapshot(fp):
+    """Read snapshot from JSON file"""
+    return json.load(fp)
+
+def save_snapshot(snapshot, fp):
+    """Write snapshot to JSON file"""
+    json.dump(snapshot, fp, indent=2, sort_keys=True)
+
+class Plan(object):
+    """Distributions to create and update, computed from a snapshot
+
+    `creates` holds desired configs, `updates` holds desired configs with
+    their change sets and `unchanged` holds names only. The snapshot keeps
+    listed distributions with configs and ETags needed to apply the plan.
+    """
+    def __init__(self, creates=None, updates=None, unchanged=None, snapshot=None):
+        self.creates = creates or []
+        self.updates = updates or []
+        self.unchanged = unchanged or []
+        self.snapshot = snapshot or new_snapshot()
+
+    def is_empty(self):
+        """Check if applying plan would not change anything"""
+        return not self.creates and not self.updates
+
+    def __str__(self):
+        return '%s to create, %s to update, %s unchanged' % (
+            len(self.creates),
+            len(self.updates),
+            len(self.unchanged),
+        )
+
+    def to_dict(self):
+        """Get JSON compatible representation of plan"""
+        return {
+            'creates': self.creates,
+            'updates': [
+                {
+                    'config': update['config'],
+                    'changes': [list(change) for change in update['changes']],
+                }
+                for update in self.updates
+            ],
+            'unchanged': self.unchanged,
+            'snapshot': self.snapshot,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restore plan from its JSON compatible representation"""
+        return cls(
+            creates=data['creates'],
+            updates=[
+                {
+                    'config': update['config'],
+                    'changes': [
+                        Change(tuple(path), desired, live)
+                        for path, desired, live in update['changes']
+                    ],
+                }
+                for update in data['updates']
+            ],
+            unchanged=data['unchanged'],
+            snapshot=data['snapshot'],
+        )
+
+    def dump(self, fp):
+        """Write plan to JSON file"""
+        json.dump(self.to_dict(), fp, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, fp):
+        """Read plan from JSON file"""
+        return cls.from_dict(json.load(fp))
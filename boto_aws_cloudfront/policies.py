@@ -0,0 +1,238 @@
+"""Cache and origin request policies shared by distributions
+
+Policies are named by hash of their content, so identical definitions
+map to one policy per account no matter how many distributions use them.
+"""
+import json
+import os
+import threading
+
+from .config import get_list_config
+from .diff import canonical_hash
+from .statecache import save_json
+
+POLICY_NAME_PREFIX = 'boto-aws-cloudfront-'
+
+POLICY_CACHE_VERSION = 1
+
+CACHE_POLICY_DEFAULTS = {
+    'brotli': True,
+    'cookies': 'none',
+    'default_ttl': 86400,
+    'gzip': True,
+    'headers': 'none',
+    'max_ttl': 31536000,
+    'min_ttl': 0,
+    'query_strings': 'none',
+}
+
+ORIGIN_REQUEST_POLICY_DEFAULTS = {
+    'cookies': 'none',
+    'headers': 'none',
+    'query_strings': 'none',
+}
+
+# API shapes of policy kinds by module config key of the policy
+POLICY_KINDS = {
+    'cache_policy': {
+        'list': 'list_cache_policies',
+        'create': 'create_cache_policy',
+        'list_key': 'CachePolicyList',
+        'policy_key': 'CachePolicy',
+        'config_key': 'CachePolicyConfig',
+        'exists_error': 'CachePolicyAlreadyExists',
+    },
+    'origin_request_policy': {
+        'list': 'list_origin_request_policies',
+        'create': 'create_origin_request_policy',
+        'list_key': 'OriginRequestPolicyList',
+        'policy_key': 'OriginRequestPolicy',
+        'config_key': 'OriginRequestPolicyConfig',
+        'exists_error': 'OriginRequestPolicyAlreadyExists',
+    },
+}
+
+def get_parameters_config(value, name):
+    """Get AWS config of forwarded headers, cookies or query strings
+
+    Value is either behavior, like 'none' or 'all', or list of whitelisted
+    names.
+    """
+    if isinstance(value, (list, tuple)):
+        return {
+            '%sBehavior' % name: 'whitelist',
+            '%ss' % name: get_list_config(sorted(set(value))),
+        }
+    return {
+        '%sBehavior' % name: value,
+        '%ss' % name: {'Quantity': 0},
+    }
+
+def get_policy_name(policy_config):
+    """Get policy name derived from its content"""
+    return POLICY_NAME_PREFIX + canonical_hash(policy_config)
+
+def get_cache_policy_config(policy):
+    """Get AWS cache policy config from module config of policy"""
+    policy = dict(CACHE_POLICY_DEFAULTS, **policy)
+    policy_config = {
+        'Comment': '',
+        'DefaultTTL': policy['default_ttl'],
+        'MaxTTL': policy['max_ttl'],
+        'MinTTL': policy['min_ttl'],
+        'ParametersInCacheKeyAndForwardedToOrigin': {
+            'EnableAcceptEncodingBrotli': policy['brotli'],
+            'EnableAcceptEncodingGzip': policy['gzip'],
+            'CookiesConfig': get_parameters_config(policy['cookies'], 'Cookie'),
+            'HeadersConfig': get_parameters_config(policy['headers'], 'Header'),
+            'QueryStringsConfig': get_parameters_config(
+                policy['query_strings'],
+                'QueryString',
+            ),
+        },
+    }
+    policy_config['Name'] = get_policy_name(policy_config)
+    return policy_config
+
+def get_origin_request_policy_config(policy):
+    """Get AWS origin request policy config from module config of policy"""
+    policy = dict(ORIGIN_REQUEST_POLICY_DEFAULTS, **policy)
+    policy_config = {
+        'Comment': '',
+        'CookiesConfig': get_parameters_config(policy['cookies'], 'Cookie'),
+        'HeadersConfig': get_parameters_config(policy['headers'], 'Header'),
+        'QueryStringsConfig': get_parameters_config(
+            policy['query_strings'],
+            'QueryString',
+        ),
+    }
+    policy_config['Name'] = get_policy_name(policy_config)
+    return policy_config
+
+POLICY_CONFIG_GETTERS = {
+    'cache_policy': get_cache_policy_config,
+    'origin_request_policy': get_origin_request_policy_config,
+}
+
+def get_policy_config(kind, policy):
+    """Get AWS config of policy of given kind"""
+    return POLICY_CONFIG_GETTERS[kind](policy)
+
+def resolve_config_policies(distro_config, get_policy_id):
+    """Get config with Ids of its cache and origin request policies
+
+    `get_policy_id` is called with kind and module config of each policy of
+    the distribution and its cache behaviors. Configs without policies are
+    returned as is.
+    """
+    def resolve(config):
+        ids = {}
+        for kind in POLICY_KINDS:
+            if config.get(kind) and not config.get(kind + '_id'):
+                ids[kind + '_id'] = get_policy_id(kind, config[kind])
+        return dict(config, **ids) if ids else config
+
+    resolved_config = resolve(distro_config)
+    behaviors = resolved_config.get('cache_behaviors') or []
+    resolved_behaviors = [resolve(behavior) for behavior in behaviors]
+    if any(new is not old for new, old in zip(resolved_behaviors, behaviors)):
+        resolved_config = dict(resolved_config, cache_behaviors=resolved_behaviors)
+    return resolved_config
+
+def get_config_policy_kinds(distro_config):
+    """Get kinds of policies used by distribution or its cache behaviors"""
+    kinds = set()
+    resolve_config_policies(distro_config, lambda kind, policy: kinds.add(kind))
+    return kinds
+
+def get_snapshot_policy_id(snapshot, kind, policy):
+    """Get Id of policy from snapshot, without any API call
+
+    Policies missing in snapshot get their name in place of Id, so that
+    configs using them differ from any live config until they are created.
+    """
+    name = get_policy_config(kind, policy)['Name']
+    return snapshot.get('policies', {}).get(kind, {}).get(name, name)
+
+class PolicyCache(object):
+    """Map policy names to their Ids, per policy kind
+
+    Each kind is listed at most once, policies created later are added as
+    they are created. With `path` given the cache is loaded from and saved
+    to a JSON file whenever it changes, so kinds listed by previous runs are
+    not listed again. Delete the file after deleting policies elsewhere.
+    The cache is safe to share between threads.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.clear()
+        if path and os.path.exists(path):
+            self.load_file()
+
+    def load_file(self):
+        """Read policies from file, unreadable or outdated file is ignored"""
+        try:
+            with open(self.path) as fp:
+                data = json.load(fp)
+        except ValueError:
+            return
+        if data.get('version') != POLICY_CACHE_VERSION:
+            return
+        with self.lock:
+            for kind, ids in data['policies'].items():
+                for name, policy_id in ids.items():
+                    self.ids[(kind, name)] = policy_id
+            self.loaded.update(data['loaded'])
+
+    def save(self):
+        """Write policies to file"""
+        if not self.path:
+            return
+        with self.lock:
+            policies = {}
+            for (kind, name), policy_id in self.ids.items():
+                policies.setdefault(kind, {})[name] = policy_id
+            data = {
+                'version': POLICY_CACHE_VERSION,
+                'policies': policies,
+                'loaded': sorted(self.loaded),
+            }
+        save_json(self.path, data)
+
+    def clear(self):
+        """Forget all policies"""
+        with self.lock:
+            self.ids = {}
+            self.loaded = set()
+
+    def is_loaded(self, kind):
+        """Check if policies of kind were listed"""
+        return kind in self.loaded
+
+    def load(self, kind, policies):
+        """Remember listed (name, Id) pairs of policies of kind"""
+        with self.lock:
+            for name, policy_id in policies:
+                self.ids[(kind, name)] = policy_id
+            self.loaded.add(kind)
+            self.save()
+
+    def get(self, kind, name):
+        """Get Id of policy by its name"""
+        return self.ids.get((kind, name))
+
+    def get_ids(self, kind):
+        """Get names of policies of kind mapped to their Ids"""
+        with self.lock:
+            return dict(
+                (name, policy_id)
+                for (policy_kind, name), policy_id in self.ids.items()
+                if policy_kind == kind
+            )
+
+    def add(self, kind, name, policy_id):
+        """Remember created policy"""
+        with self.lock:
+            self.ids[(kind, name)] = policy_id
+            self.save()
@@ -0,0 +1,115 @@
+"""Pool of boto3 sessions and clients shared across accounts and regions
+
+boto3 takes long to import, so it is imported on first session creation.
+"""
+import threading
+from functools import partial
+
+ROLE_SESSION_NAME = 'boto-aws-cloudfront'
+
+def assume_role(session, role_arn):
+    """Get temporary credentials of role as refreshable credentials metadata"""
+    response = session.client('sts').assume_role(
+        RoleArn=role_arn,
+        RoleSessionName=ROLE_SESSION_NAME,
+    )
+    credentials = response['Credentials']
+    return {
+        'access_key': credentials['AccessKeyId'],
+        'secret_key': credentials['SecretAccessKey'],
+        'token': credentials['SessionToken'],
+        'expiry_time': credentials['Expiration'].isoformat(),
+    }
+
+def get_role_credentials(session, role_arn):
+    """Get role credentials refreshed before they expire
+
+    Where botocore supports it, role is not assumed until the credentials
+    are used for the first time.
+    """
+    from botocore import credentials as botocore_credentials
+
+    refresh = partial(assume_role, session, role_arn)
+    deferred = getattr(botocore_credentials, 'DeferredRefreshableCredentials', None)
+    if deferred:
+        return deferred(refresh_using=refresh, method='sts-assume-role')
+    return botocore_credentials.RefreshableCredentials.create_from_metadata(
+        metadata=refresh(),
+        refresh_using=refresh,
+        method='sts-assume-role',
+    )
+
+class RoleCredentialProvider(object):
+    """Botocore credential provider assuming role with source session"""
+    METHOD = 'boto-aws-cloudfront-role'
+    CANONICAL_NAME = None
+
+    def __init__(self, session, role_arn):
+        self.session = session
+        self.role_arn = role_arn
+
+    def load(self):
+        """Get role credentials, see `get_role_credentials`"""
+        return get_role_credentials(self.session, self.role_arn)
+
+class ClientPool(object):
+    """Create sessions and clients once per profile, role and region
+
+    Clients are safe to share between threads, their HTTP connection pools
+    hold up to `max_pool_connections` connections so that parallel batches
+    do not wait for a free connection.
+    """
+    def __init__(self, max_pool_connections=10, **config):
+        self.config = dict(config, max_pool_connections=max_pool_connections)
+        self.sessions = {}
+        self.clients = {}
+        self.lock = threading.RLock()
+
+    def get_session(self, profile=None, role_arn=None, region=None):
+        """Get session of account, assuming the role if given
+
+        Role credentials come first in the credential chain of the session.
+        """
+        import boto3
+        import botocore.session
+
+        key = (profile, role_arn, region)
+        with self.lock:
+            if key not in self.sessions:
+                botocore_session = botocore.session.get_session()
+                session = boto3.session.Session(
+                    profile_name=profile,
+                    region_name=region,
+                    botocore_session=botocore_session,
+                )
+                if role_arn:
+                    botocore_session.get_component('credential_provider').insert_before(
+                        'env',
+                        RoleCredentialProvider(
+                            self.get_session(profile, None, region),
+                            role_arn,
+                        ),
+                    )
+                self.sessions[key] = session
+            return self.sessions[key]
+
+    def get_client(self, service='cloudfront', profile=None, role_arn=None, region=None):
+        """Get shared client of service in account"""
+        from botocore.config import Config
+
+        key = (service, profile, role_arn, region)
+        with self.lock:
+            if key not in self.clients:
+                self.clients[key] = self.get_session(profile, role_arn, region).client(
+                    service,
+                    config=Config(**self.config),
+                )
+            return self.clients[key]
+
+    def clear(self):
+        """Drop all sessions and clients"""
+        with self.lock:
+            self.sessions.clear()
+            self.clients.clear()
+
+DEFAULT_POOL = ClientPool()
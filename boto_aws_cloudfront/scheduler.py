@@ -0,0 +1,135 @@
+"""Rate limiting and retries for CloudFront control-plane calls"""
+import random
+import threading
+import time
+
+THROTTLING_ERRORS = (
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+)
+
+def get_error_code(error):
+    """Get AWS error code from botocore client error"""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code')
+
+class TokenBucket(object):
+    """Token bucket with adjustable refill rate
+
+    Tokens are reserved before waiting, so concurrent callers queue up
+    instead of waking up at the same time. The rate is halved on throttling
+    and grows back linearly with every successful call.
+    """
+    def __init__(
+            self,
+            rate,
+            min_rate=0.5,
+            max_rate=None,
+            capacity=None,
+            clock=time.time,
+            sleep=time.sleep,
+    ):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate or rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        """Add tokens earned since last refill"""
+        now = self.clock()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated_at) * self.rate,
+        )
+        self.updated_at = now
+
+    def acquire(self):
+        """Take one token, wait until it is available, return seconds waited"""
+        with self.lock:
+            self.refill()
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+    def slow_down(self):
+        """Halve request rate after throttling"""
+        with self.lock:
+            self.refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        """Raise request rate after successful call"""
+        with self.lock:
+            self.refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+class Scheduler(object):
+    """Run API calls through token bucket with jittered exponential backoff"""
+    def __init__(
+            self,
+            rate=10,
+            min_rate=0.5,
+            max_retries=8,
+            max_etag_retries=2,
+            base_delay=0.2,
+            max_delay=20,
+            clock=time.time,
+            sleep=time.sleep,
+    ):
+        self.bucket = TokenBucket(rate, min_rate=min_rate, clock=clock, sleep=sleep)
+        self.max_retries = max_retries
+        self.max_etag_retries = max_etag_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'throttled': 0,
+            'retries': 0,
+            'etag_retries': 0,
+            'wait_time': 0.0,
+        }
+
+    def record(self, counter, value=1):
+        """Increase statistics counter"""
+        with self.lock:
+            self.stats[counter] += value
+
+    def get_backoff(self, attempt):
+        """Get randomized delay before retry attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, method, **kwargs):
+        """Call API method, retry when it gets throttled"""
+        attempt = 0
+        while True:
+            self.record('wait_time', self.bucket.acquire())
+            self.record('calls')
+            try:
+                response = method(**kwargs)
+            except Exception as error:
+                if (
+                        get_error_code(error) not in THROTTLING_ERRORS or
+                        attempt >= self.max_retries
+                ):
+                    raise
+                self.bucket.slow_down()
+                delay = self.get_backoff(attempt)
+                self.record('throttled')
+                self.record('retries')
+                self.record('wait_time', delay)
+                self.sleep(delay)
+                attempt += 1
+                continue
+            self.bucket.speed_up()
+            return response
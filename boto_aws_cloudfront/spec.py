@@ -0,0 +1,112 @@
+"""Immutable slotted distribution spec, a compact form of normalized config
+
+Specs hold every config option as a slot instead of a dict entry, unset
+options share the values of DEFAULT_CONFIG. They compare by value and hash
+once, so they can be used as cache keys and compared cheaply when diffing.
+Values must not be mutated after the spec is created.
+"""
+from .config import DEFAULT_CONFIG
+
+REQUIRED_FIELDS = ('name', 'domains', 's3_buckets', 'region')
+
+SPEC_FIELDS = REQUIRED_FIELDS + tuple(sorted(DEFAULT_CONFIG))
+FIELD_SET = frozenset(SPEC_FIELDS)
+
+def freeze(value):
+    """Get hashable copy of config value made of lists and dicts"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+class DistroSpec(object):
+    """Normalized distribution config with a slot per option
+
+    Spec reads like a normalized config dict, so it can be passed directly
+    to `get_aws_config` and `dict(spec)` converts it back.
+    """
+    __slots__ = SPEC_FIELDS + ('_hash',)
+
+    # Specs need no normalization by `normalize_config`
+    normalized = True
+
+    def __init__(self, **values):
+        unknown = set(values) - FIELD_SET
+        if unknown:
+            raise TypeError('Unknown config options: %s' % ', '.join(sorted(unknown)))
+        for field in SPEC_FIELDS:
+            object.__setattr__(self, field, values.get(field, DEFAULT_CONFIG.get(field)))
+        object.__setattr__(self, '_hash', None)
+
+    @classmethod
+    def from_dict(cls, config):
+        """Get spec from flat module config"""
+        return cls(**config)
+
+    def to_dict(self):
+        """Get flat module config with all options"""
+        return dict(self.items())
+
+    def __setattr__(self, name, value):
+        raise AttributeError('DistroSpec is immutable')
+
+    def __getitem__(self, key):
+        if key not in FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        """Get option value like dict.get"""
+        if key not in FIELD_SET:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        """Get names of all options"""
+        return list(SPEC_FIELDS)
+
+    def items(self):
+        """Get option names with their values"""
+        return [(field, getattr(self, field)) for field in SPEC_FIELDS]
+
+    def __contains__(self, key):
+        return key in FIELD_SET
+
+    def __iter__(self):
+        return iter(SPEC_FIELDS)
+
+    def __len__(self):
+        return len(SPEC_FIELDS)
+
+    def values_tuple(self):
+        """Get values of all options in slot order"""
+        return tuple(getattr(self, field) for field in SPEC_FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, DistroSpec):
+            return NotImplemented
+        return self is other or (
+            hash(self) == hash(other) and self.values_tuple() == other.values_tuple()
+        )
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash(freeze(self.values_tuple())))
+        return self._hash
+
+    def __repr__(self):
+        return 'DistroSpec(%s)' % ', '.join(
+            '%s=%r' % (field, getattr(self, field)) for field in SPEC_FIELDS
+            if field in REQUIRED_FIELDS or getattr(self, field) != DEFAULT_CONFIG[field]
+        )
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
@@ -0,0 +1,100 @@
+"""Persisted state of reconciled distributions for incremental sync"""
+import json
+import os
+import threading
+
+STATE_VERSION = 1
+
+def format_timestamp(value):
+    """Get JSON compatible form of listing timestamp"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def save_json(path, data):
+    """Write JSON file, replacing it at once"""
+    partial_path = '%s.%s.tmp' % (path, os.getpid())
+    with open(partial_path, 'w') as fp:
+        json.dump(data, fp, sort_keys=True)
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(partial_path, path)
+
+class StateCache(object):
+    """Remember ETag, LastModifiedTime and config hashes per distribution
+
+    Entries are recorded when a distribution is known to match its desired
+    config. While its listed LastModifiedTime and the hash of its desired
+    config stay the same, it still matches and its config need not be
+    fetched. With `path` given the cache is loaded from and saved to a JSON
+    file, an unreadable or outdated file is treated as empty.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.distros = {}
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        """Read entries from file"""
+        try:
+            with open(self.path) as fp:
+                state = json.load(fp)
+        except ValueError:
+            return
+        if state.get('version') == STATE_VERSION:
+            with self.lock:
+                self.distros = state['distros']
+
+    def save(self):
+        """Write entries to file, replacing it at once"""
+        if not self.path:
+            return
+        with self.lock:
+            state = {'version': STATE_VERSION, 'distros': dict(self.distros)}
+        save_json(self.path, state)
+
+    def get(self, name):
+        """Get entry of distribution"""
+        return self.distros.get(name)
+
+    def record(
+            self,
+            name,
+            distro_id,
+            etag,
+            last_modified_time,
+            config_hash,
+            live_hash=None,
+    ):
+        """Remember that distribution matches config of given hash
+
+        Hash of the live AWS config is kept as well when known.
+        """
+        entry = {
+            'Id': distro_id,
+            'ETag': etag,
+            'LastModifiedTime': format_timestamp(last_modified_time),
+            'ConfigHash': config_hash,
+        }
+        if live_hash is not None:
+            entry['LiveHash'] = live_hash
+        with self.lock:
+            self.distros[name] = entry
+
+    def discard(self, name):
+        """Forget distribution"""
+        with self.lock:
+            self.distros.pop(name, None)
+
+    def is_unchanged(self, name, listed, config_hash):
+        """Check if listed distribution still matches config of given hash"""
+        entry = self.get(name)
+        return bool(
+            entry and
+            listed.get('LastModifiedTime') is not None and
+            entry['Id'] == listed['Id'] and
+            entry['LastModifiedTime'] == format_timestamp(listed['LastModifiedTime']) and
+            entry['ConfigHash'] == config_hash
+        )
@@ -0,0 +1,259 @@
+"""Precompiled template rendering AWS configs from module configs"""
+import threading
+from collections import OrderedDict
+
+from .config import (
+    DEFAULT_CONFIG,
+    get_aws_config,
+    get_cache_behavior,
+    get_cache_behaviors,
+    get_list_config,
+    get_logging,
+    get_origin_groups,
+    get_origin_settings,
+    get_viewer_certificate,
+    map_bucket_to_s3_target,
+    map_s3_target_to_origin,
+)
+
+# Module config keys rendered by template, other configs go to get_aws_config
+TEMPLATE_KEYS = frozenset([
+    'cache_behaviors',
+    'cache_compress',
+    'cache_default_ttl',
+    'cache_forward_cookies_mode',
+    'cache_forward_querystring',
+    'cache_max_ttl',
+    'cache_min_ttl',
+    'cache_policy',
+    'cache_policy_id',
+    'cache_trusted_signers',
+    'certificate_arn',
+    'certificate_iam',
+    'certificate_source',
+    'domains',
+    'enabled',
+    'function_associations',
+    'http_version',
+    'https_behavior',
+    'ipv6',
+    'lambda_function_associations',
+    'logging_bucket',
+    'logging_include_cookies',
+    'logging_prefix',
+    'name',
+    'origin_custom_headers',
+    'origin_failover_status_codes',
+    'origin_keepalive_timeout',
+    'origin_protocol_policy',
+    'origin_read_timeout',
+    'origin_request_policy',
+    'origin_request_policy_id',
+    'origin_settings',
+    'origin_shield_region',
+    'price_class',
+    'realtime_log_config_arn',
+    'region',
+    'root_object',
+    's3_buckets',
+])
+
+TEMPLATE_DEFAULTS = dict(
+    DEFAULT_CONFIG,
+    domains=None,
+    name=None,
+    region=None,
+    s3_buckets=None,
+)
+
+# AWS config fields copied from module config unless they are null
+NULLABLE_FIELDS = (
+    ('Comment', 'name'),
+    ('DefaultRootObject', 'root_object'),
+    ('Enabled', 'enabled'),
+    ('HttpVersion', 'http_version'),
+    ('IsIPV6Enabled', 'ipv6'),
+    ('PriceClass', 'price_class'),
+)
+
+SKELETON_CONFIG = {
+    'domains': [],
+    'name': 'skeleton',
+    'region': 'skeleton',
+    's3_buckets': ['skeleton'],
+}
+
+class BoundedMemo(object):
+    """Memo keeping at most `max_size` values, the oldest ones are evicted
+
+    Lookups take no lock, so hits cost a single dict lookup. The memo is
+    safe to share between threads.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, key):
+        """Get value by key"""
+        return self.values.get(key)
+
+    def set(self, key, value):
+        """Store value, evict the oldest ones above `max_size`"""
+        with self.lock:
+            self.values[key] = value
+            while len(self.values) > self.max_size:
+                self.values.popitem(last=False)
+
+def get_settings_key(settings):
+    """Get hashable memoization key of origin settings"""
+    return (
+        settings['origin_keepalive_timeout'],
+        settings['origin_protocol_policy'],
+        settings['origin_read_timeout'],
+        settings['origin_shield_region'],
+        tuple(sorted((settings['origin_custom_headers'] or {}).items())),
+    )
+
+class ConfigTemplate(object):
+    """AWS config skeleton that only gets its variable fields filled
+
+    The skeleton is rendered once by `get_aws_config`, origins are memoized
+    by bucket, region and origin settings and viewer certificates by their
+    settings, keeping at most `max_origins` and `max_certificates` of the
+    latest ones. Rendered configs equal `get_aws_config` output but
+    share invariant parts with each other, so they must be treated as
+    read-only.
+    """
+    def __init__(self, max_origins=1024, max_certificates=256):
+        skeleton = get_aws_config(SKELETON_CONFIG)
+        self.invariant = dict(
+            (field, value) for field, value in skeleton.items()
+            if field not in dict(NULLABLE_FIELDS)
+        )
+        self.default_cache_behavior = skeleton['DefaultCacheBehavior']
+        self.forwarded_values = skeleton['DefaultCacheBehavior']['ForwardedValues']
+        self.origins = BoundedMemo(max_origins)
+        self.certificates = BoundedMemo(max_certificates)
+
+    def get_origins(self, values):
+        """Get memoized origin configs of all S3 buckets"""
+        region = values['region']
+        overrides = values['origin_settings'] or {}
+        settings = get_origin_settings(values, None)
+        settings_key = get_settings_key(settings)
+        origins = []
+        for bucket in values['s3_buckets']:
+            if bucket in overrides:
+                bucket_settings = get_origin_settings(values, bucket)
+                origins.append(self.get_origin(
+                    bucket,
+                    region,
+                    bucket_settings,
+                    get_settings_key(bucket_settings),
+                ))
+            else:
+                origins.append(self.get_origin(bucket, region, settings, settings_key))
+        return origins
+
+    def get_origin(self, bucket, region, settings, settings_key):
+        """Get memoized origin config of S3 bucket"""
+        key = (bucket, region, settings_key)
+        origin = self.origins.get(key)
+        if origin is None:
+            origin = map_s3_target_to_origin(
+                map_bucket_to_s3_target(bucket, region),
+                settings,
+            )
+            self.origins.set(key, origin)
+        return origin
+
+    def get_viewer_certificate(self, source, arn, iam):
+        """Get memoized viewer certificate config"""
+        key = (source, arn, iam)
+        certificate = self.certificates.get(key)
+        if certificate is None:
+            certificate = get_viewer_certificate({
+                'certificate_source': source,
+                'certificate_arn': arn,
+                'certificate_iam': iam,
+            })
+            self.certificates.set(key, certificate)
+        return certificate
+
+    def get_default_cache_behavior(self, values, default_origin_id):
+        """Get default cache behavior filled into skeleton"""
+        if (
+                values['cache_policy_id'] or
+                values['origin_request_policy_id'] or
+                values['lambda_function_associations'] or
+                values['function_associations'] or
+                values['realtime_log_config_arn']
+        ):
+            return get_cache_behavior(values, default_origin_id)
+
+        signers = values['cache_trusted_signers']
+
+        forwarded_values = dict(self.forwarded_values)
+        forwarded_values['Cookies'] = {'Forward': values['cache_forward_cookies_mode']}
+        forwarded_values['QueryString'] = values['cache_forward_querystring']
+
+        default_cache_behavior = dict(self.default_cache_behavior)
+        default_cache_behavior['ForwardedValues'] = forwarded_values
+        default_cache_behavior['Compress'] = values['cache_compress']
+        default_cache_behavior['DefaultTTL'] = values['cache_default_ttl']
+        default_cache_behavior['MaxTTL'] = values['cache_max_ttl']
+        default_cache_behavior['MinTTL'] = values['cache_min_ttl']
+        default_cache_behavior['ViewerProtocolPolicy'] = values['https_behavior']
+        default_cache_behavior['TargetOriginId'] = default_origin_id
+        default_cache_behavior['TrustedSigners'] = {
+            'Enabled': len(signers) > 0,
+            'Quantity': len(signers),
+            'Items': signers,
+        }
+        return default_cache_behavior
+
+    def render(self, desired_config):
+        """Get AWS config from module config"""
+        if not TEMPLATE_KEYS.issuperset(desired_config):
+            return get_aws_config(desired_config)
+
+        values = dict(TEMPLATE_DEFAULTS)
+        values.update(desired_config)
+        origins = self.get_origins(values)
+        origin_groups = get_origin_groups(values, origins)
+        default_origin_id = origins[0]['Id']
+        if origin_groups:
+            default_origin_id = origin_groups['Items'][0]['Id']
+
+        config = dict(self.invariant)
+        config['Aliases'] = get_list_config(values['domains'])
+        if values['cache_behaviors']:
+            config['CacheBehaviors'] = get_cache_behaviors(values, default_origin_id)
+        config['DefaultCacheBehavior'] = self.get_default_cache_behavior(
+            values,
+            default_origin_id,
+        )
+        config['Origins'] = get_list_config(origins)
+        if origin_groups:
+            config['OriginGroups'] = origin_groups
+        if values['logging_bucket']:
+            config['Logging'] = get_logging(values)
+        config['ViewerCertificate'] = self.get_viewer_certificate(
+            values['certificate_source'],
+            values['certificate_arn'],
+            values['certificate_iam'],
+        )
+        for field, key in NULLABLE_FIELDS:
+            if values[key] is not None:
+                config[field] = values[key]
+        return config
+
+DEFAULT_TEMPLATE = ConfigTemplate()
+
+def render_aws_config(desired_config):
+    """Get AWS config from module config using the default template"""
+    return DEFAULT_TEMPLATE.render(desired_config)
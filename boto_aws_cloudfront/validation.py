@@ -0,0 +1,232 @@
+"""Offline validation of batches of module configs before any API call"""
+import re
+from collections import namedtuple
+
+from .config import DEFAULT_CONFIG, ORIGIN_KEYS
+
+Problem = namedtuple('Problem', ['config', 'field', 'message'])
+
+REQUIRED_KEYS = ('name', 'domains', 's3_buckets', 'region')
+
+TTL_KEYS = ('cache_min_ttl', 'cache_default_ttl', 'cache_max_ttl')
+
+ENUMS = {
+    'cache_forward_cookies_mode': ('none', 'whitelist', 'all'),
+    'certificate_source': ('', 'default', 'acm', 'iam'),
+    'http_version': ('http1.1', 'http2'),
+    'https_behavior': ('allow-all', 'https-only', 'redirect-to-https'),
+    'origin_protocol_policy': ('http-only', 'https-only', 'match-viewer'),
+    'price_class': ('PriceClass_100', 'PriceClass_200', 'PriceClass_All'),
+}
+
+BEHAVIOR_KEYS = frozenset([
+    'cache_compress',
+    'cache_default_ttl',
+    'cache_forward_cookies_mode',
+    'cache_forward_querystring',
+    'cache_max_ttl',
+    'cache_min_ttl',
+    'cache_policy',
+    'cache_policy_id',
+    'cache_trusted_signers',
+    'function_associations',
+    'https_behavior',
+    'lambda_function_associations',
+    'origin_request_policy',
+    'origin_request_policy_id',
+    'path_pattern',
+    'realtime_log_config_arn',
+    's3_bucket',
+])
+
+LAMBDA_EVENT_TYPES = ('viewer-request', 'viewer-response', 'origin-request', 'origin-response')
+FUNCTION_EVENT_TYPES = ('viewer-request', 'viewer-response')
+FAILOVER_STATUS_CODES = frozenset([400, 403, 404, 416, 500, 502, 503, 504])
+
+# Lambda@Edge associations need a numbered function version
+VERSIONED_LAMBDA_ARN = re.compile(r'^arn:aws:lambda:us-east-1:\d+:function:[^:]+:\d+$')
+
+class ConfigError(ValueError):
+    """Configs did not pass validation"""
+    def __init__(self, problems):
+        super(ConfigError, self).__init__('\n'.join(
+            '%s: %s: %s' % problem for problem in problems
+        ))
+        self.problems = problems
+
+def get_config_label(distro_config, index):
+    """Get name identifying config in problems"""
+    name = distro_config.get('name')
+    return name if name else '#%s' % index
+
+def validate_enums(label, config, problems, prefix=''):
+    """Check values of enumerated keys"""
+    for key, values in sorted(ENUMS.items()):
+        if key in config and config[key] not in values:
+            problems.append(Problem(label, prefix + key, 'must be one of %s, got %r' % (
+                ', '.join(repr(value) for value in values),
+                config[key],
+            )))
+
+def validate_ttls(label, config, problems, prefix=''):
+    """Check that TTLs are ordered numbers"""
+    ttls = [config.get(key, DEFAULT_CONFIG[key]) for key in TTL_KEYS]
+    if not all(isinstance(ttl, int) and not isinstance(ttl, bool) for ttl in ttls):
+        problems.append(Problem(label, prefix + 'cache_default_ttl', 'TTLs must be integers'))
+    elif not ttls[0] <= ttls[1] <= ttls[2]:
+        problems.append(Problem(
+            label,
+            prefix + 'cache_default_ttl',
+            'TTLs must satisfy cache_min_ttl <= cache_default_ttl <= cache_max_ttl',
+        ))
+
+def validate_functions(label, config, problems, prefix=''):
+    """Check edge function associations"""
+    for key, event_types in (
+            ('lambda_function_associations', LAMBDA_EVENT_TYPES),
+            ('function_associations', FUNCTION_EVENT_TYPES),
+    ):
+        seen = set()
+        for association in config.get(key) or []:
+            event_type = association.get('event_type')
+            if event_type not in event_types:
+                problems.append(Problem(label, prefix + key, 'invalid event type %r' % (
+                    event_type,
+                )))
+            elif event_type in seen:
+                problems.append(Problem(label, prefix + key, 'duplicate event type %r' % (
+                    event_type,
+                )))
+            seen.add(event_type)
+            if key == 'lambda_function_associations' and not VERSIONED_LAMBDA_ARN.match(
+                    association.get('arn') or ''
+            ):
+                problems.append(Problem(
+                    label,
+                    prefix + key,
+                    'needs versioned function ARN in us-east-1, got %r' % (
+                        association.get('arn'),
+                    ),
+                ))
+
+def validate_certificate(label, config, problems):
+    """Check that certificate source has its certificate"""
+    source = config.get('certificate_source')
+    if source == 'acm':
+        arn = config.get('certificate_arn')
+        if not arn:
+            problems.append(Problem(label, 'certificate_arn', 'required by acm source'))
+        elif ':us-east-1:' not in arn:
+            problems.append(Problem(label, 'certificate_arn', 'must be in us-east-1'))
+    elif source == 'iam' and not config.get('certificate_iam'):
+        problems.append(Problem(label, 'certificate_iam', 'required by iam source'))
+
+def validate_origins(label, config, problems):
+    """Check origin settings and failover of buckets"""
+    buckets = config.get('s3_buckets') or []
+    for bucket, settings in sorted((config.get('origin_settings') or {}).items()):
+        if bucket not in buckets:
+            problems.append(Problem(label, 'origin_settings', 'unknown bucket %r' % bucket))
+        for key in sorted(set(settings) - set(ORIGIN_KEYS)):
+            problems.append(Problem(label, 'origin_settings', 'unknown option %r' % key))
+        validate_enums(label, settings, problems, 'origin_settings.%s.' % bucket)
+    status_codes = config.get('origin_failover_status_codes')
+    if status_codes:
+        if len(buckets) < 2:
+            problems.append(Problem(
+                label,
+                'origin_failover_status_codes',
+                'failover needs at least two s3_buckets',
+            ))
+        for status_code in sorted(set(status_codes) - FAILOVER_STATUS_CODES):
+            problems.append(Problem(
+                label,
+                'origin_failover_status_codes',
+                'status code %r does not fail over' % status_code,
+            ))
+
+def validate_behaviors(label, config, problems):
+    """Check path pattern cache behaviors"""
+    buckets = config.get('s3_buckets') or []
+    patterns = set()
+    for index, behavior in enumerate(config.get('cache_behaviors') or []):
+        prefix = 'cache_behaviors.%s.' % index
+        pattern = behavior.get('path_pattern')
+        if not pattern:
+            problems.append(Problem(label, prefix + 'path_pattern', 'is required'))
+        elif pattern in patterns:
+            problems.append(Problem(label, prefix + 'path_pattern', 'duplicate %r' % pattern))
+        patterns.add(pattern)
+        for key in sorted(set(behavior) - BEHAVIOR_KEYS):
+            problems.append(Problem(label, prefix + key, 'unknown option'))
+        if behavior.get('s3_bucket') and behavior['s3_bucket'] not in buckets:
+            problems.append(Problem(label, prefix + 's3_bucket', 'not one of s3_buckets'))
+        validate_enums(label, behavior, problems, prefix)
+        if any(key in behavior for key in TTL_KEYS):
+            ttls = dict((key, config[key]) for key in TTL_KEYS if key in config)
+            ttls.update((key, behavior[key]) for key in TTL_KEYS if key in behavior)
+            validate_ttls(label, ttls, problems, prefix)
+        validate_functions(label, behavior, problems, prefix)
+
+def validate_config(distro_config, label=None):
+    """Get problems of single config"""
+    label = label or get_config_label(distro_config, 0)
+    problems = []
+    for key in REQUIRED_KEYS:
+        value = distro_config.get(key)
+        if value is None or (not value and key != 'domains'):
+            problems.append(Problem(label, key, 'is required'))
+    for key in ('domains', 's3_buckets'):
+        if key in distro_config and not isinstance(distro_config[key], (list, tuple)):
+            problems.append(Problem(label, key, 'must be a list'))
+    for key in sorted(set(distro_config) - set(DEFAULT_CONFIG) - set(REQUIRED_KEYS)):
+        problems.append(Problem(label, key, 'unknown option'))
+    validate_enums(label, distro_config, problems)
+    validate_ttls(label, distro_config, problems)
+    validate_certificate(label, distro_config, problems)
+    validate_origins(label, distro_config, problems)
+    validate_behaviors(label, distro_config, problems)
+    validate_functions(label, distro_config, problems)
+    return problems
+
+def validate_names(distro_configs):
+    """Get problems of configs whose name is already used in the batch"""
+    problems = []
+    names = {}
+    for index, distro_config in enumerate(distro_configs):
+        name = distro_config.get('name')
+        if not name:
+            continue
+        if name in names:
+            problems.append(Problem(name, 'name', 'duplicate of config #%s' % names[name]))
+        else:
+            names[name] = index
+    return problems
+
+def validate_configs(distro_configs):
+    """Get problems of all configs, including conflicts between them
+
+    Names, which are used as caller references, and aliases must be unique
+    across the batch.
+    """
+    problems = validate_names(distro_configs)
+    aliases = {}
+    for index, distro_config in enumerate(distro_configs):
+        label = get_config_label(distro_config, index)
+        problems.extend(validate_config(distro_config, label))
+        domains = distro_config.get('domains')
+        for domain in domains if isinstance(domains, (list, tuple)) else []:
+            domain = domain.lower()
+            if domain in aliases and aliases[domain] != label:
+                problems.append(Problem(label, 'domains', 'alias %s is used by %s' % (
+                    domain,
+                    aliases[domain],
+                )))
+            aliases.setdefault(domain, label)
+    return problems
+
+def check_configs(distro_configs):
+    """Raise ConfigError listing all problems of configs, if any"""
+    problems = validate_configs(distro_configs)
+    if problems:
+        raise ConfigError(problems)
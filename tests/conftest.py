@@ -0,0 +1,34 @@
+"""Test configuration and helpers shared by test modules"""
+import sys
+
+from mock import Mock
+
+from boto_aws_cloudfront.cloudfront import CloudFront
+from boto_aws_cloudfront.fake import get_site_config
+from boto_aws_cloudfront.scheduler import Scheduler
+
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_aio.py')
+
+def get_cloudfront(client, state_cache=None):
+    """Get CloudFront wrapper using fake client and optional state cache"""
+    cloudfront = CloudFront(
+        scheduler=Scheduler(rate=1000, sleep=Mock()),
+        state_cache=state_cache,
+    )
+    cloudfront.client = client
+    return cloudfront
+
+class FakeTime(object):
+    """Clock advanced only by sleeping"""
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
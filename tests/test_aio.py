@@ -0,0 +1,121 @@
+"""Test asyncio CloudFront client"""
+import asyncio
+
+from boto_aws_cloudfront.aio import AsyncCloudFront
+
+SITE_CONFIG = {
+    'domains': ['example.com'],
+    's3_buckets': ['name-of-your-s3-bucket'],
+    'region': 'eu-west-1',
+}
+
+class StubClient(object):
+    """Local stand-in for asynchronous CloudFront client"""
+    def __init__(self, pages, configs=None):
+        self.pages = pages
+        self.configs = configs or {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def request(self, *call):
+        """Record call and yield to other calls as network round trip would"""
+        self.calls.append(call)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+        finally:
+            self.in_flight -= 1
+
+    async def list_distributions(self, Marker='0'):
+        await self.request('list_distributions', Marker)
+        index = int(Marker)
+        return {
+            'DistributionList': {
+                'Items': self.pages[index],
+                'IsTruncated': index < len(self.pages) - 1,
+                'NextMarker': str(index + 1),
+            },
+        }
+
+    async def get_distribution_config(self, Id):
+        await self.request('get_distribution_config', Id)
+        return dict(self.configs[Id])
+
+    async def create_distribution(self, DistributionConfig):
+        await self.request('create_distribution', DistributionConfig['CallerReference'])
+        if DistributionConfig['CallerReference'] == 'broken':
+            raise ValueError('broken')
+        return {'Distribution': {'Id': 'NEW'}, 'ETag': 'E1'}
+
+    async def update_distribution(self, DistributionConfig, Id, IfMatch):
+        await self.request('update_distribution', Id, IfMatch)
+        return {'Distribution': {'Id': Id}, 'ETag': 'E2'}
+
+def run(coroutine):
+    """Run coroutine in fresh event loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+def test_get_all_distros():
+    """Test that all pages are listed"""
+    client = StubClient([[{'Id': 1}], [{'Id': 2}], [{'Id': 3}]])
+    distros = run(AsyncCloudFront(client).get_all_distros())
+    assert distros == [{'Id': 1}, {'Id': 2}, {'Id': 3}]
+
+def test_find_distro():
+    """Test that distribution is found and its config fetched"""
+    client = StubClient(
+        [
+            [{'Id': 1, 'Comment': 'foo', 'DomainName': 'foo.cloudfront.net'}],
+            [{'Id': 2, 'Comment': 'bar', 'DomainName': 'bar.cloudfront.net'}],
+        ],
+        {2: {'ETag': 'E1', 'DistributionConfig': {'Comment': 'bar'}}},
+    )
+    assert run(AsyncCloudFront(client).find_distro('bar')) == {
+        'Id': 2,
+        'DomainName': 'bar.cloudfront.net',
+        'ETag': 'E1',
+        'DistributionConfig': {'Comment': 'bar'},
+    }
+    assert run(AsyncCloudFront(client).find_distro('baz')) is None
+
+def test_ensure_distros():
+    """Test that batch creates, updates and reports errors"""
+    client = StubClient(
+        [[{'Id': 2, 'Comment': 'bar', 'DomainName': 'bar.cloudfront.net'}]],
+        {2: {'ETag': 'E1', 'DistributionConfig': {
+            'CallerReference': 'bar',
+            'Comment': 'bar',
+            'Enabled': False,
+        }}},
+    )
+    results = run(AsyncCloudFront(client, max_concurrency=2).ensure_distros([
+        dict(SITE_CONFIG, name='foo'),
+        dict(SITE_CONFIG, name='bar'),
+        dict(SITE_CONFIG, name='broken'),
+    ]))
+    assert results['foo'] == {'status': 'created'}
+    assert results['bar'] == {'status': 'updated'}
+    assert results['broken']['status'] == 'error'
+    assert ('update_distribution', 2, 'E1') in client.calls
+    assert [call for call in client.calls if call[0] == 'list_distributions'] == [
+        ('list_distributions', '0'),
+    ]
+
+def test_concurrency_limit_in_each_loop():
+    """Test that limit holds under contention in loops started after client"""
+    client = StubClient([[
+        {'Id': index, 'Comment': 'site-%s' % index, 'DomainName': 'cloudfront.net'}
+        for index in range(6)
+    ]])
+    cloudfront = AsyncCloudFront(client, max_concurrency=2)
+    configs = [dict(SITE_CONFIG, name='site-%s' % index) for index in range(6, 12)]
+    for _ in range(2):
+        results = run(cloudfront.ensure_distros(configs))
+        assert set(result['status'] for result in results.values()) == set(['created'])
+    assert client.max_in_flight == 2
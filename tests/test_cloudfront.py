@@ -1,7 +1,14 @@
 """Test CloudFront module"""
-from mock import patch
+from botocore.exceptions import ClientError
+from mock import Mock, patch
+import pytest
 
-from boto_aws_cloudfront.cloudfront import CloudFront, get_aws_config, read_aws_config
+from boto_aws_cloudfront.cloudfront import (
+    CloudFront,
+    WaitTimeout,
+    get_aws_config,
+    read_aws_config,
+)
 
 def test_get_config():
     """Test that module config generates correct CloudFront config"""
@@ -38,6 +45,7 @@ def test_get_config():
                 'QueryString': False,
                 'QueryStringCacheKeys': {'Quantity': 0},
             },
+            'FunctionAssociations': {'Quantity': 0},
             'LambdaFunctionAssociations': {
                 'Quantity': 0
             },
@@ -83,6 +91,9 @@ def test_get_config():
                     'CustomHeaders': {
                         'Quantity': 0,
                     },
+                    'OriginShield': {
+                        'Enabled': False,
+                    },
                 },
             ]
         },
@@ -190,25 +201,204 @@ def test_read_config():
         'domains': ['example.com', 'www.example.com'],
         'name': 'foo',
         's3_buckets': ['name-of-your-s3-bucket'],
+        'cache_behaviors': [],
+        'cache_compress': False,
+        'cache_default_ttl': 60,
         'cache_forward_cookies_mode': 'none',
         'cache_forward_querystring': False,
+        'cache_max_ttl': 3600,
+        'cache_min_ttl': 0,
+        'cache_policy': None,
+        'cache_policy_id': None,
         'cache_trusted_signers': [],
         'certificate_arn': None,
         'certificate_iam': None,
         'certificate_source': '',
         'enabled': True,
+        'function_associations': [],
         'http_version': 'http2',
         'https_behavior': 'redirect-to-https',
         'ipv6': True,
+        'lambda_function_associations': [],
+        'logging_bucket': None,
+        'logging_include_cookies': False,
+        'logging_prefix': '',
+        'origin_custom_headers': {},
+        'origin_failover_status_codes': [],
+        'origin_keepalive_timeout': 5,
+        'origin_protocol_policy': 'http-only',
+        'origin_read_timeout': 30,
+        'origin_request_policy': None,
+        'origin_request_policy_id': None,
+        'origin_settings': {},
+        'origin_shield_region': None,
         'price_class': 'PriceClass_100',
+        'realtime_log_config_arn': None,
         'root_object': 'index.html',
     }
 
+def test_cache_behaviors():
+    """Test that path pattern behaviors inherit distribution cache settings"""
+    aws_config = get_aws_config({
+        'domains': ['example.com'],
+        'name': 'foo',
+        's3_buckets': ['site-bucket', 'assets-bucket'],
+        'region': 'eu-west-1',
+        'cache_compress': True,
+        'cache_behaviors': [{
+            'path_pattern': '/assets/*',
+            's3_bucket': 'assets-bucket',
+            'cache_default_ttl': 31536000,
+            'cache_max_ttl': 31536000,
+        }],
+    })
+    behavior = aws_config['CacheBehaviors']['Items'][0]
+    assert aws_config['CacheBehaviors']['Quantity'] == 1
+    assert aws_config['DefaultCacheBehavior']['Compress'] is True
+    assert behavior['PathPattern'] == '/assets/*'
+    assert behavior['TargetOriginId'] == (
+        'assets-bucket.s3-website-eu-west-1.amazonaws.com'
+    )
+    assert behavior['Compress'] is True
+    assert behavior['DefaultTTL'] == 31536000
+    assert behavior['MinTTL'] == 0
+
+def test_cache_behaviors_round_trip():
+    """Test that cache behaviors are read back from AWS config"""
+    desired_config = {
+        'domains': ['example.com'],
+        'name': 'foo',
+        's3_buckets': ['site-bucket', 'assets-bucket'],
+        'region': 'eu-west-1',
+        'cache_default_ttl': 300,
+        'cache_behaviors': [
+            {'path_pattern': '/assets/*', 's3_bucket': 'assets-bucket'},
+            {'path_pattern': '/api/*', 'cache_forward_querystring': True},
+        ],
+    }
+    aws_config = get_aws_config(desired_config)
+    config = read_aws_config(aws_config)
+    assert config['cache_default_ttl'] == 300
+    assert [behavior['s3_bucket'] for behavior in config['cache_behaviors']] == [
+        'assets-bucket',
+        'site-bucket',
+    ]
+    assert config['cache_behaviors'][1]['cache_forward_querystring'] is True
+    assert get_aws_config(dict(config, region='eu-west-1')) == aws_config
+
+def test_origin_settings():
+    """Test that origins are tuned per bucket and fail over in a group"""
+    aws_config = get_aws_config({
+        'domains': ['example.com'],
+        'name': 'foo',
+        's3_buckets': ['primary-bucket', 'backup-bucket'],
+        'region': 'eu-west-1',
+        'origin_read_timeout': 60,
+        'origin_custom_headers': {'X-Origin-Token': 'secret'},
+        'origin_shield_region': 'eu-west-1',
+        'origin_failover_status_codes': [503, 500],
+        'origin_settings': {'backup-bucket': {'origin_shield_region': None}},
+    })
+    primary, backup = aws_config['Origins']['Items']
+    origin_group = aws_config['OriginGroups']['Items'][0]
+    assert primary['CustomOriginConfig']['OriginReadTimeout'] == 60
+    assert primary['CustomHeaders'] == {
+        'Quantity': 1,
+        'Items': [{'HeaderName': 'X-Origin-Token', 'HeaderValue': 'secret'}],
+    }
+    assert primary['OriginShield'] == {
+        'Enabled': True,
+        'OriginShieldRegion': 'eu-west-1',
+    }
+    assert backup['OriginShield'] == {'Enabled': False}
+    assert origin_group['FailoverCriteria']['StatusCodes']['Items'] == [500, 503]
+    assert origin_group['Members']['Items'] == [
+        {'OriginId': primary['Id']},
+        {'OriginId': backup['Id']},
+    ]
+    assert aws_config['DefaultCacheBehavior']['TargetOriginId'] == origin_group['Id']
+
+def test_cleared_origin_shield():
+    """Test that clearing Origin Shield region disables the shield"""
+    site_config = {
+        'domains': ['example.com'],
+        'name': 'foo',
+        's3_buckets': ['primary-bucket'],
+        'region': 'eu-west-1',
+    }
+    live_config = get_aws_config(dict(site_config, origin_shield_region='eu-west-1'))
+    assert CloudFront.get_distro_changes(live_config, site_config)[0].path[-2:] == (
+        'OriginShield',
+        'Enabled',
+    )
+
+def test_origin_settings_round_trip():
+    """Test that origin settings are read back from AWS config"""
+    aws_config = get_aws_config({
+        'domains': ['example.com'],
+        'name': 'foo',
+        's3_buckets': ['primary-bucket', 'backup-bucket'],
+        'region': 'eu-west-1',
+        'origin_keepalive_timeout': 30,
+        'origin_failover_status_codes': [500],
+        'origin_settings': {'backup-bucket': {'origin_protocol_policy': 'match-viewer'}},
+        'cache_behaviors': [{'path_pattern': '/api/*'}],
+    })
+    config = read_aws_config(aws_config)
+    assert config['origin_keepalive_timeout'] == 30
+    assert config['origin_settings'] == {
+        'backup-bucket': {'origin_protocol_policy': 'match-viewer'},
+    }
+    assert config['cache_behaviors'][0]['s3_bucket'] is None
+    assert get_aws_config(dict(config, region='eu-west-1')) == aws_config
+
+def test_logging_round_trip():
+    """Test that standard and real-time logging are read back"""
+    aws_config = get_aws_config({
+        'domains': ['example.com'],
+        'name': 'foo',
+        's3_buckets': ['name-of-your-s3-bucket'],
+        'region': 'eu-west-1',
+        'logging_bucket': 'logs-bucket',
+        'logging_prefix': 'cdn/foo/',
+        'realtime_log_config_arn': 'arn:aws:cloudfront::123456789012:realtime-log-config/foo',
+    })
+    assert aws_config['Logging'] == {
+        'Enabled': True,
+        'IncludeCookies': False,
+        'Bucket': 'logs-bucket.s3.amazonaws.com',
+        'Prefix': 'cdn/foo/',
+    }
+    assert aws_config['DefaultCacheBehavior']['RealtimeLogConfigArn'].endswith('/foo')
+    config = read_aws_config(aws_config)
+    assert config['logging_bucket'] == 'logs-bucket'
+    assert get_aws_config(dict(config, region='eu-west-1')) == aws_config
+
+def test_removed_realtime_log_config():
+    """Test that removing real-time log config detaches it"""
+    site_config = {
+        'domains': ['example.com'],
+        'name': 'foo',
+        's3_buckets': ['name-of-your-s3-bucket'],
+        'region': 'eu-west-1',
+        'cache_behaviors': [{'path_pattern': '/api/*'}],
+    }
+    live_config = get_aws_config(dict(
+        site_config,
+        realtime_log_config_arn='arn:aws:cloudfront::123456789012:realtime-log-config/foo',
+    ))
+    assert [
+        change.path for change in CloudFront.get_distro_changes(live_config, site_config)
+    ] == [
+        ('CacheBehaviors', 'Items', 0, 'RealtimeLogConfigArn'),
+        ('DefaultCacheBehavior', 'RealtimeLogConfigArn'),
+    ]
+
 @patch.object(CloudFront, 'get_distro_config')
-@patch.object(CloudFront, 'get_all_distros')
-def test_find_distro(get_all_distros, get_distro_config):
+@patch.object(CloudFront, 'iter_distros')
+def test_find_distro(iter_distros, get_distro_config):
     """Test that distribution can be found"""
-    get_all_distros.return_value = [
+    iter_distros.return_value = [
         {
             'Id': 1,
             'Aliases': {
@@ -240,7 +430,7 @@ def test_find_distro(get_all_distros, get_distro_config):
         },
     }
 
-@patch.object(CloudFront, 'get_all_distros')
+@patch.object(CloudFront, 'iter_distros')
 def test_find_distro_not_found(mock_method):
     """Test that method does not fail when distribution is not found"""
     mock_method.return_value = [
@@ -259,6 +449,50 @@ def test_find_distro_not_found(mock_method):
     ]
     assert CloudFront().find_distro('static-cdn') is None
 
+def get_paged_client(pages):
+    """Get client mock serving distribution list pages"""
+    client = Mock()
+    client.list_distributions.side_effect = [
+        {
+            'DistributionList': {
+                'Items': items,
+                'IsTruncated': index < len(pages) - 1,
+                'NextMarker': 'page-%s' % (index + 1),
+            },
+        }
+        for index, items in enumerate(pages)
+    ]
+    return client
+
+def test_get_all_distros_follows_pages():
+    """Test that all distribution list pages are fetched"""
+    cloudfront = CloudFront()
+    cloudfront.client = get_paged_client([
+        [{'Id': 1}, {'Id': 2}],
+        [{'Id': 3}],
+    ])
+    assert cloudfront.get_all_distros() == [{'Id': 1}, {'Id': 2}, {'Id': 3}]
+    assert cloudfront.client.list_distributions.call_args_list[1][1] == {
+        'Marker': 'page-1',
+    }
+
+@patch.object(CloudFront, 'get_distro_config')
+def test_find_distro_stops_paging(get_distro_config):
+    """Test that pages past the found distribution are not fetched"""
+    cloudfront = CloudFront()
+    cloudfront.client = get_paged_client([
+        [{'Id': 1, 'Comment': 'foo'}],
+        [{'Id': 2, 'Comment': 'bar', 'DomainName': 'ax334.cloudfront.net'}],
+        [{'Id': 3, 'Comment': 'baz'}],
+    ])
+    get_distro_config.return_value = {'ETag': 'E1'}
+    assert cloudfront.find_distro('bar') == {
+        'Id': 2,
+        'DomainName': 'ax334.cloudfront.net',
+        'ETag': 'E1',
+    }
+    assert cloudfront.client.list_distributions.call_count == 2
+
 @patch.object(CloudFront, 'find_distro')
 @patch.object(CloudFront, 'did_distro_change')
 def test_ensure_exists_not_changed(
@@ -348,3 +582,158 @@ def test_ensure_exists_changed(
             'domains': ['foo'],
         },
     )
+
+@patch.object(CloudFront, 'get_distro_config')
+def test_find_distro_uses_index(get_distro_config):
+    """Test that repeated lookups do not list distributions again"""
+    cloudfront = CloudFront()
+    cloudfront.client = get_paged_client([
+        [{'Id': 1, 'Comment': 'foo', 'DomainName': 'foo.cloudfront.net'}],
+        [{'Id': 2, 'Comment': 'bar', 'DomainName': 'bar.cloudfront.net'}],
+    ])
+    get_distro_config.return_value = {'ETag': 'E1'}
+    assert cloudfront.find_distro('bar')['Id'] == 2
+    assert cloudfront.find_distro('foo')['Id'] == 1
+    assert cloudfront.find_distro('baz') is None
+    assert cloudfront.index.lookup('bar')['ETag'] == 'E1'
+    assert cloudfront.client.list_distributions.call_count == 2
+
+def test_create_distro_updates_index():
+    """Test that created distribution is found without listing"""
+    cloudfront = CloudFront()
+    cloudfront.client = Mock()
+    cloudfront.client.create_distribution.return_value = {
+        'Distribution': {'Id': 'E9', 'DomainName': 'ax334.cloudfront.net'},
+        'ETag': 'ETAG1',
+    }
+    cloudfront.create_distro({
+        'domains': ['example.com'],
+        'name': 'foo',
+        's3_buckets': ['name-of-your-s3-bucket'],
+        'region': 'eu-west-1',
+    })
+    assert cloudfront.index.lookup('foo') == {
+        'Id': 'E9',
+        'DomainName': 'ax334.cloudfront.net',
+        'ETag': 'ETAG1',
+        'LastModifiedTime': None,
+    }
+    assert not cloudfront.client.list_distributions.called
+
+@patch.object(CloudFront, 'ensure_distro_existence')
+@patch.object(CloudFront, 'iter_distros')
+def test_ensure_distros(iter_distros, ensure_distro_existence):
+    """Test that batch reports status of each distribution"""
+    iter_distros.return_value = [{'Id': 1, 'Comment': 'foo'}]
+    statuses = {'foo': 3, 'bar': 1}
+    def ensure(config, fresh_index=False):
+        assert fresh_index
+        if config['name'] == 'baz':
+            raise ValueError('broken')
+        return statuses[config['name']]
+    ensure_distro_existence.side_effect = ensure
+
+    results = CloudFront().ensure_distros(
+        [{'name': 'foo'}, {'name': 'bar'}, {'name': 'baz'}],
+        max_workers=2,
+    )
+    assert results['foo'] == {'status': 'unchanged'}
+    assert results['bar'] == {'status': 'created'}
+    assert results['baz']['status'] == 'error'
+    assert isinstance(results['baz']['error'], ValueError)
+    assert iter_distros.call_count == 1
+
+@patch.object(CloudFront, 'ensure_distro_existence')
+@patch.object(CloudFront, 'iter_distros')
+def test_ensure_distros_duplicate_names(iter_distros, ensure_distro_existence):
+    """Test that configs sharing a name are reported, not dropped"""
+    iter_distros.return_value = []
+    ensure_distro_existence.return_value = 1
+    results = CloudFront().ensure_distros([
+        {'name': 'foo', 'root_object': 'a.html'},
+        {'name': 'bar'},
+        {'name': 'foo', 'root_object': 'b.html'},
+    ])
+    assert results['bar'] == {'status': 'created'}
+    assert results['foo']['status'] == 'error'
+    assert 'duplicate of config #0' in str(results['foo']['error'])
+    assert ensure_distro_existence.call_count == 1
+
+@patch.object(CloudFront, 'get_distro_config')
+def test_update_distro_refreshes_etag(get_distro_config):
+    """Test that update with stale ETag is retried with current one"""
+    cloudfront = CloudFront()
+    cloudfront.client = Mock()
+    cloudfront.client.update_distribution.side_effect = [
+        ClientError(
+            {'Error': {'Code': 'PreconditionFailed', 'Message': 'stale'}},
+            'UpdateDistribution',
+        ),
+        {'Distribution': {'Id': 'E9', 'DomainName': 'ax334.cloudfront.net'}, 'ETag': 'E3'},
+    ]
+    get_distro_config.return_value = {
+        'DistributionConfig': {'CallerReference': 'foo'},
+        'ETag': 'E2',
+    }
+    cloudfront.update_distro(
+        {'Id': 'E9', 'ETag': 'E1', 'DistributionConfig': {'CallerReference': 'foo'}},
+        {
+            'domains': ['example.com'],
+            'name': 'foo',
+            's3_buckets': ['name-of-your-s3-bucket'],
+            'region': 'eu-west-1',
+        },
+    )
+    calls = cloudfront.client.update_distribution.call_args_list
+    assert [call[1]['IfMatch'] for call in calls] == ['E1', 'E2']
+    assert cloudfront.index.lookup('foo')['ETag'] == 'E3'
+    assert cloudfront.scheduler.stats['etag_retries'] == 1
+
+@patch('boto_aws_cloudfront.cloudfront.time')
+@patch.object(CloudFront, 'iter_distros')
+def test_iter_deployed(iter_distros, mock_time):
+    """Test that distributions are yielded as they settle"""
+    mock_time.time.return_value = 0
+    iter_distros.side_effect = [
+        iter([
+            {'Id': 'A', 'Status': 'InProgress'},
+            {'Id': 'B', 'Status': 'Deployed'},
+            {'Id': 'C', 'Status': 'Deployed'},
+        ]),
+        iter([
+            {'Id': 'A', 'Status': 'InProgress'},
+            {'Id': 'B', 'Status': 'Deployed'},
+        ]),
+        iter([
+            {'Id': 'A', 'Status': 'Deployed'},
+            {'Id': 'B', 'Status': 'Deployed'},
+        ]),
+    ]
+    settled = []
+    deployed = CloudFront().wait_deployed(
+        ['A', 'B'],
+        callback=lambda distro: settled.append(distro['Id']),
+        interval=10,
+    )
+    assert settled == ['B', 'A']
+    assert [distro['Id'] for distro in deployed] == ['B', 'A']
+    assert [call[0][0] for call in mock_time.sleep.call_args_list] == [10, 15]
+
+@patch('boto_aws_cloudfront.cloudfront.time')
+@patch.object(CloudFront, 'iter_distros')
+def test_iter_deployed_timeout(iter_distros, mock_time):
+    """Test that waiting gives up after timeout"""
+    mock_time.time.side_effect = [0, 30]
+    iter_distros.return_value = [{'Id': 'A', 'Status': 'InProgress'}]
+    with pytest.raises(WaitTimeout) as error:
+        CloudFront().wait_deployed(['A'], timeout=30)
+    assert error.value.pending == set(['A'])
+
+@patch.object(CloudFront, 'iter_distros')
+def test_get_distro_id(iter_distros):
+    """Test that Ids are passed through without listing"""
+    iter_distros.return_value = [{'Id': 'E2QWRUHEXAMPLE', 'Comment': 'example'}]
+    cloudfront = CloudFront()
+    assert cloudfront.get_distro_id('E1EXAMPLE') == 'E1EXAMPLE'
+    assert not iter_distros.called
+    assert cloudfront.get_distro_id('example') == 'E2QWRUHEXAMPLE'
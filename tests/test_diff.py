@@ -0,0 +1,126 @@
+"""Test distribution config comparison"""
+import copy
+
+from boto_aws_cloudfront.cloudfront import CloudFront, get_aws_config
+from boto_aws_cloudfront.diff import MANAGED_FIELDS, Change, diff_distro_config
+
+SITE_CONFIG = {
+    'domains': ['example.com', 'www.example.com'],
+    'name': 'foo',
+    's3_buckets': ['name-of-your-s3-bucket'],
+    'region': 'eu-west-1',
+}
+
+def get_live_config():
+    """Get config as AWS returns it for SITE_CONFIG"""
+    config = copy.deepcopy(get_aws_config(SITE_CONFIG))
+    config['CallerReference'] = 'foo'
+    config['Aliases']['Items'].reverse()
+    config['HttpVersion'] = 'HTTP2'
+    config['OriginGroups'] = {'Quantity': 0}
+    config['ViewerCertificate'] = {
+        'CloudFrontDefaultCertificate': True,
+        'MinimumProtocolVersion': 'TLSv1',
+        'CertificateSource': 'cloudfront',
+    }
+    del config['CacheBehaviors']
+    return config
+
+def test_diff_same_config():
+    """Test that config as returned by AWS does not differ"""
+    assert diff_distro_config(get_aws_config(SITE_CONFIG), get_live_config()) == []
+    assert not CloudFront.did_distro_change(get_live_config(), SITE_CONFIG)
+
+def test_diff_trusted_signers():
+    """Test that trusted signers do not make config differ"""
+    site_config = dict(SITE_CONFIG, cache_trusted_signers=['self', '1234'])
+    live_config = copy.deepcopy(get_aws_config(site_config))
+    live_config['DefaultCacheBehavior']['TrustedSigners']['Items'] = ['1234', 'self']
+    assert not CloudFront.did_distro_change(live_config, site_config)
+
+def test_diff_changed_field():
+    """Test that changed field is reported with its path"""
+    live_config = get_live_config()
+    live_config['DefaultCacheBehavior']['ViewerProtocolPolicy'] = 'allow-all'
+    assert CloudFront.get_distro_changes(live_config, SITE_CONFIG) == [
+        Change(
+            ('DefaultCacheBehavior', 'ViewerProtocolPolicy'),
+            'redirect-to-https',
+            'allow-all',
+        ),
+    ]
+
+def test_diff_origins_by_id():
+    """Test that origins are matched by their Id"""
+    site_config = dict(SITE_CONFIG, s3_buckets=['foo', 'bar'])
+    live_config = copy.deepcopy(get_aws_config(site_config))
+    live_config['Origins']['Items'].reverse()
+    live_config['Origins']['Items'][0]['CustomOriginConfig']['OriginReadTimeout'] = 60
+    assert diff_distro_config(get_aws_config(site_config), live_config) == [
+        Change(
+            (
+                'Origins',
+                'Items',
+                'bar.s3-website-eu-west-1.amazonaws.com',
+                'CustomOriginConfig',
+                'OriginReadTimeout',
+            ),
+            30,
+            60,
+        ),
+    ]
+
+def test_diff_extra_origin():
+    """Test that origin missing in desired config is reported"""
+    live_config = copy.deepcopy(get_aws_config(dict(SITE_CONFIG, s3_buckets=['foo', 'bar'])))
+    changes = diff_distro_config(
+        get_aws_config(dict(SITE_CONFIG, s3_buckets=['foo'])),
+        live_config,
+    )
+    assert [change.path for change in changes] == [
+        ('Origins', 'Items', 'bar.s3-website-eu-west-1.amazonaws.com'),
+    ]
+    assert changes[0].desired is None
+
+def test_diff_ordered_behaviors():
+    """Test that order of cache behaviors matters"""
+    first = {'PathPattern': '/a/*', 'MinTTL': 0}
+    second = {'PathPattern': '/b/*', 'MinTTL': 0}
+    changes = diff_distro_config(
+        {'CacheBehaviors': {'Quantity': 2, 'Items': [first, second]}},
+        {'CacheBehaviors': {'Quantity': 2, 'Items': [second, first]}},
+    )
+    assert [change.path for change in changes] == [
+        ('CacheBehaviors', 'Items', 0, 'PathPattern'),
+        ('CacheBehaviors', 'Items', 1, 'PathPattern'),
+    ]
+
+def test_diff_removed_managed_fields():
+    """Test that features missing in desired config must be off in live one"""
+    site_config = dict(
+        SITE_CONFIG,
+        origin_shield_region='eu-west-1',
+        realtime_log_config_arn='arn:aws:cloudfront::123456789012:realtime-log-config/foo',
+        origin_request_policy_id='P1',
+    )
+    live_config = copy.deepcopy(get_aws_config(site_config))
+    live_config['DefaultCacheBehavior']['FunctionAssociations'] = {
+        'Quantity': 1,
+        'Items': [{'EventType': 'viewer-request', 'FunctionARN': 'arn'}],
+    }
+    changes = CloudFront.get_distro_changes(live_config, SITE_CONFIG)
+    assert sorted(
+        field for change in changes for field in change.path if field in MANAGED_FIELDS
+    ) == [
+        'FunctionAssociations',
+        'OriginRequestPolicyId',
+        'OriginShield',
+        'RealtimeLogConfigArn',
+    ]
+
+def test_diff_disabled_managed_fields():
+    """Test that empty or disabled managed fields equal missing ones"""
+    live_config = get_live_config()
+    live_config['DefaultCacheBehavior']['FunctionAssociations'] = {'Quantity': 0}
+    live_config['Origins']['Items'][0]['OriginShield'] = {'Enabled': False}
+    assert not CloudFront.did_distro_change(live_config, SITE_CONFIG)
@@ -0,0 +1,106 @@
+"""Test client against fake CloudFront backend"""
+import json
+
+from mock import Mock
+import pytest
+
+from boto_aws_cloudfront.cloudfront import get_aws_config
+from boto_aws_cloudfront.fake import FakeClientError, FakeCloudFrontClient
+
+from .conftest import get_cloudfront
+
+SITE_CONFIG = {
+    'domains': ['example.com'],
+    'name': 'foo',
+    's3_buckets': ['name-of-your-s3-bucket'],
+    'region': 'eu-west-1',
+}
+
+def test_fake_pages_listing():
+    """Test that fake lists distributions in pages"""
+    client = FakeCloudFrontClient(page_size=2)
+    for index in range(5):
+        client.add_distro({'CallerReference': str(index), 'Comment': str(index)})
+    cloudfront = get_cloudfront(client)
+    assert [distro['Comment'] for distro in cloudfront.get_all_distros()] == [
+        '0', '1', '2', '3', '4',
+    ]
+    assert client.calls['ListDistributions'] == 3
+
+def test_fake_pages_listing_by_id():
+    """Test that paging does not depend on order distributions were stored in"""
+    client = FakeCloudFrontClient(page_size=2)
+    for index in range(5):
+        client.add_distro({'CallerReference': str(index), 'Comment': str(index)})
+    first_id = list(client.distros)[0]
+    client.distros[first_id] = client.distros.pop(first_id)
+    cloudfront = get_cloudfront(client)
+    assert [distro['Comment'] for distro in cloudfront.get_all_distros()] == [
+        '0', '1', '2', '3', '4',
+    ]
+
+def test_fake_checks_etag():
+    """Test that fake rejects stale ETag"""
+    client = FakeCloudFrontClient()
+    distro = client.add_distro({'CallerReference': 'foo'})
+    with pytest.raises(FakeClientError) as error:
+        client.update_distribution(
+            DistributionConfig={'CallerReference': 'foo'},
+            Id=distro['Id'],
+            IfMatch='stale',
+        )
+    assert error.value.response['Error']['Code'] == 'PreconditionFailed'
+
+def test_ensure_round_trip():
+    """Test that distribution is created, kept and updated"""
+    client = FakeCloudFrontClient()
+    assert get_cloudfront(client).ensure_distro_existence(SITE_CONFIG) == 1
+    assert get_cloudfront(client).ensure_distro_existence(SITE_CONFIG) == 3
+    assert get_cloudfront(client).ensure_distro_existence(
+        dict(SITE_CONFIG, root_object='index.html'),
+    ) == 2
+    assert client.calls['UpdateDistribution'] == 1
+
+def test_throttled_calls_are_retried():
+    """Test that scheduler retries calls throttled by fake"""
+    clock = Mock(return_value=0)
+    client = FakeCloudFrontClient(max_rate=1, clock=clock)
+    cloudfront = get_cloudfront(client)
+    def sleep(seconds):
+        clock.return_value += max(seconds, 0.5)
+    cloudfront.scheduler.sleep = sleep
+    cloudfront.get_all_distros()
+    cloudfront.get_all_distros()
+    assert client.calls['Throttled'] >= 1
+    assert cloudfront.scheduler.stats['retries'] == client.calls['Throttled']
+
+def test_export_configs():
+    """Test that configs of all distributions are written as JSON lines"""
+    client = FakeCloudFrontClient(page_size=4)
+    for index in range(10):
+        client.add_distro(dict(
+            get_aws_config(dict(SITE_CONFIG, name='site-%s' % index)),
+            CallerReference='site-%s' % index,
+        ))
+    cloudfront = get_cloudfront(client)
+    output = Mock()
+    assert cloudfront.export_configs(output, workers=2) == 10
+    lines = [json.loads(call[0][0]) for call in output.write.call_args_list]
+    assert sorted(line['config']['name'] for line in lines) == [
+        'site-%s' % index for index in range(10)
+    ]
+    assert lines[0]['config']['s3_buckets'] == ['name-of-your-s3-bucket']
+    assert client.calls['ListDistributions'] == 3
+    assert client.calls['GetDistributionConfig'] == 10
+
+def test_export_configs_skips_deleted():
+    """Test that distributions deleted during export are skipped"""
+    client = FakeCloudFrontClient()
+    client.add_distro(dict(get_aws_config(SITE_CONFIG), CallerReference='foo'))
+    cloudfront = get_cloudfront(client)
+    cloudfront.get_distro_config = Mock(
+        side_effect=FakeClientError('NoSuchDistribution', 'GetDistributionConfig'),
+    )
+    output = Mock()
+    assert cloudfront.export_configs(output) == 0
+    assert not output.write.called
@@ -0,0 +1,128 @@
+"""Test edge function associations and their rollout"""
+from mock import patch
+
+from boto_aws_cloudfront.cloudfront import (
+    CloudFront,
+    get_aws_config,
+    read_aws_config,
+    set_function_version,
+)
+from boto_aws_cloudfront.fake import FakeCloudFrontClient
+
+from .conftest import FakeTime, get_cloudfront, get_site_config
+
+LAMBDA_ARN = 'arn:aws:lambda:us-east-1:123456789012:function:headers'
+FUNCTION_ARN = 'arn:aws:cloudfront::123456789012:function/redirects'
+
+def test_function_associations_round_trip():
+    """Test that associations are rendered per behavior and read back"""
+    aws_config = get_aws_config(get_site_config(
+        0,
+        lambda_function_associations=[
+            {'event_type': 'origin-response', 'arn': LAMBDA_ARN + ':3'},
+        ],
+        cache_behaviors=[{
+            'path_pattern': '/old/*',
+            'function_associations': [
+                {'event_type': 'viewer-request', 'arn': FUNCTION_ARN},
+            ],
+        }],
+    ))
+    assert aws_config['DefaultCacheBehavior']['LambdaFunctionAssociations'] == {
+        'Quantity': 1,
+        'Items': [{
+            'EventType': 'origin-response',
+            'LambdaFunctionARN': LAMBDA_ARN + ':3',
+            'IncludeBody': False,
+        }],
+    }
+    assert aws_config['DefaultCacheBehavior']['FunctionAssociations'] == {'Quantity': 0}
+    behavior = aws_config['CacheBehaviors']['Items'][0]
+    assert behavior['FunctionAssociations']['Items'] == [
+        {'EventType': 'viewer-request', 'FunctionARN': FUNCTION_ARN},
+    ]
+    assert behavior['LambdaFunctionAssociations']['Quantity'] == 1
+    config = read_aws_config(aws_config)
+    assert get_aws_config(dict(config, region='eu-west-1')) == aws_config
+
+def test_removed_function_association():
+    """Test that removing the last function association changes config"""
+    live_config = get_aws_config(get_site_config(
+        0,
+        function_associations=[{'event_type': 'viewer-request', 'arn': FUNCTION_ARN}],
+    ))
+    assert CloudFront.did_distro_change(live_config, get_site_config(0))
+    assert get_aws_config(get_site_config(0))['DefaultCacheBehavior'][
+        'FunctionAssociations'
+    ] == {'Quantity': 0}
+
+def test_set_function_version():
+    """Test that all associations of function get the new version"""
+    config = get_site_config(
+        0,
+        lambda_function_associations=[
+            {'event_type': 'origin-response', 'arn': LAMBDA_ARN + ':3'},
+            {'event_type': 'viewer-request', 'arn': LAMBDA_ARN + '-other:1'},
+        ],
+        cache_behaviors=[{
+            'path_pattern': '/api/*',
+            'lambda_function_associations': [
+                {'event_type': 'origin-request', 'arn': LAMBDA_ARN + ':2'},
+            ],
+        }],
+    )
+    next_config = set_function_version(config, LAMBDA_ARN + ':4')
+    assert [a['arn'] for a in next_config['lambda_function_associations']] == [
+        LAMBDA_ARN + ':4',
+        LAMBDA_ARN + '-other:1',
+    ]
+    assert next_config['cache_behaviors'][0]['lambda_function_associations'][0]['arn'] == (
+        LAMBDA_ARN + ':4'
+    )
+    assert config['lambda_function_associations'][0]['arn'] == LAMBDA_ARN + ':3'
+
+@patch('boto_aws_cloudfront.cloudfront.time', new_callable=FakeTime)
+def test_roll_out_bounds_deployments(fake_time):
+    """Test that at most max_in_flight distributions deploy at once"""
+    client = FakeCloudFrontClient(deploy_time=20, clock=fake_time.time)
+    cloudfront = get_cloudfront(client)
+    for index in range(5):
+        cloudfront.create_distro(get_site_config(index))
+    fake_time.now = 100
+
+    configs = [
+        get_site_config(index, lambda_function_associations=[
+            {'event_type': 'origin-response', 'arn': LAMBDA_ARN + ':3'},
+        ])
+        for index in range(5)
+    ]
+    progress = []
+    results = cloudfront.roll_out_distros(
+        configs,
+        max_in_flight=2,
+        interval=10,
+        callback=lambda name, result: progress.append((fake_time.now, name)),
+    )
+    assert set(results) == set('site-%s' % index for index in range(5))
+    assert all(
+        result == {'status': 'updated', 'deployed': True} for result in results.values()
+    )
+    started = sorted(distro['DeployedAt'] - 20 for distro in client.distros.values())
+    assert started == [100, 100, 125, 125, 150]
+    assert [now for now, _ in progress] == [125, 125, 150, 150, 175]
+
+@patch('boto_aws_cloudfront.cloudfront.time', new_callable=FakeTime)
+def test_roll_out_timeout(fake_time):
+    """Test that tasks not started before timeout are skipped"""
+    client = FakeCloudFrontClient(deploy_time=1000, clock=fake_time.time)
+    cloudfront = get_cloudfront(client)
+    results = cloudfront.roll_out_distros(
+        [get_site_config(index) for index in range(3)],
+        max_in_flight=2,
+        timeout=30,
+    )
+    assert sorted(results.values(), key=lambda result: result['status']) == [
+        {'status': 'created', 'deployed': False},
+        {'status': 'created', 'deployed': False},
+        {'status': 'skipped'},
+    ]
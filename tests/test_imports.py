@@ -0,0 +1,18 @@
+"""Test that pure modules load without boto3"""
+import subprocess
+import sys
+
+def get_loaded_modules(module):
+    """Import module in fresh interpreter, get names of loaded modules"""
+    output = subprocess.check_output([
+        sys.executable,
+        '-c',
+        'import sys, %s; print(" ".join(sorted(sys.modules)))' % module,
+    ])
+    return set(output.decode('utf-8').split())
+
+def test_cloudfront_does_not_import_boto3():
+    """Test that client module defers boto3 import until first API call"""
+    loaded = get_loaded_modules('boto_aws_cloudfront.cloudfront')
+    assert 'boto3' not in loaded
+    assert 'botocore' not in loaded
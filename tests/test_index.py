@@ -0,0 +1,67 @@
+"""Test distribution index"""
+from mock import Mock
+
+from boto_aws_cloudfront.index import DistroIndex
+
+def get_index(distros, ttl=300):
+    """Get index over static distribution list with controlled clock"""
+    list_distros = Mock(side_effect=lambda: iter(distros))
+    clock = Mock(return_value=0)
+    return DistroIndex(list_distros, ttl=ttl, clock=clock)
+
+def test_lookup_stops_at_found_distro():
+    """Test that lookup does not read listing past the found distribution"""
+    consumed = []
+    def list_distros():
+        for distro in [{'Id': 1, 'Comment': 'foo'}, {'Id': 2, 'Comment': 'bar'}]:
+            consumed.append(distro['Id'])
+            yield distro
+    index = DistroIndex(list_distros)
+    assert index.lookup('foo') == {
+        'Id': 1,
+        'DomainName': None,
+        'ETag': None,
+        'LastModifiedTime': None,
+    }
+    assert consumed == [1]
+    assert index.lookup('bar')['Id'] == 2
+    assert consumed == [1, 2]
+
+def test_lookup_lists_once():
+    """Test that repeated lookups are answered from one listing"""
+    index = get_index([{'Id': 1, 'Comment': 'foo'}, {'Id': 2, 'Comment': 'bar'}])
+    assert index.lookup('bar')['Id'] == 2
+    assert index.lookup('foo')['Id'] == 1
+    assert index.lookup('missing') is None
+    assert index.lookup('missing') is None
+    assert index.list_distros.call_count == 1
+
+def test_lookup_relists_after_ttl():
+    """Test that expired index is listed again"""
+    index = get_index([{'Id': 1, 'Comment': 'foo'}], ttl=60)
+    assert index.lookup('foo')['Id'] == 1
+    index.clock.return_value = 59
+    assert index.lookup('foo')['Id'] == 1
+    assert index.list_distros.call_count == 1
+    index.clock.return_value = 60
+    assert index.lookup('foo')['Id'] == 1
+    assert index.list_distros.call_count == 2
+
+def test_update_replaces_entry():
+    """Test that created or updated distribution is stored without listing"""
+    index = get_index([{'Id': 1, 'Comment': 'foo'}])
+    index.load()
+    index.update('bar', {
+        'Id': 2,
+        'DomainName': 'ax334.cloudfront.net',
+        'LastModifiedTime': '2017-05-01T10:00:00',
+    }, 'E2')
+    assert index.lookup('bar') == {
+        'Id': 2,
+        'DomainName': 'ax334.cloudfront.net',
+        'ETag': 'E2',
+        'LastModifiedTime': '2017-05-01T10:00:00',
+    }
+    index.set_etag('bar', 'E3')
+    assert index.lookup('bar')['ETag'] == 'E3'
+    assert index.list_distros.call_count == 1
@@ -0,0 +1,89 @@
+"""Test cache invalidations"""
+from mock import Mock
+
+from boto_aws_cloudfront.invalidation import Invalidator, chunk_paths, compact_paths
+
+def test_compact_paths():
+    """Test that paths are deduplicated and crowded directories collapsed"""
+    assert compact_paths(
+        ['index.html', '/index.html', '/img/a.png', '/img/b.png', '/css/*', '/css/site.css'],
+        wildcard_threshold=2,
+    ) == ['/css/*', '/img/*', '/index.html']
+
+def test_compact_paths_keeps_sparse_directories():
+    """Test that directories below threshold are not collapsed"""
+    assert compact_paths(['/img/a.png', '/img/b.png'], wildcard_threshold=3) == [
+        '/img/a.png',
+        '/img/b.png',
+    ]
+
+def test_chunk_paths():
+    """Test that batches respect path and wildcard limits"""
+    assert chunk_paths(['/a', '/b', '/c'], max_paths=2) == [['/a', '/b'], ['/c']]
+    assert chunk_paths(['/a/*', '/b/*', '/c'], max_wildcards=1) == [
+        ['/a/*'],
+        ['/b/*', '/c'],
+    ]
+
+def get_cloudfront(statuses):
+    """Get CloudFront mock creating invalidations with given statuses"""
+    cloudfront = Mock()
+    created = []
+    def call(operation, **kwargs):
+        if operation == 'create_invalidation':
+            created.append(kwargs['InvalidationBatch']['Paths']['Items'])
+            return {'Invalidation': {'Id': 'I%s' % len(created)}}
+        return {'Invalidation': {'Status': statuses.pop(0)}}
+    cloudfront.call.side_effect = call
+    cloudfront.created = created
+    return cloudfront
+
+def test_invalidate_merges_queued_paths():
+    """Test that paths requested during invalidation are sent together"""
+    cloudfront = get_cloudfront([
+        'InProgress',
+        'InProgress',
+        'Completed',
+        'Completed',
+    ])
+    sleep = Mock()
+    invalidator = Invalidator(
+        cloudfront,
+        clock=Mock(return_value=0),
+        sleep=sleep,
+        timer=Mock(),
+    )
+
+    first = invalidator.invalidate('E1', ['/a'])
+    assert first.ids == ['I1']
+    second = invalidator.invalidate('E1', ['/b'])
+    third = invalidator.invalidate('E1', ['/c', '/b'])
+    assert second.queued and third.queued
+
+    assert third.wait() == ['I2']
+    assert second.ids == ['I2']
+    assert cloudfront.created == [['/a'], ['/b', '/c']]
+    assert first.wait() == ['I1']
+    assert sleep.call_count == 1
+
+def test_queued_paths_are_flushed_in_background():
+    """Test that queued paths are sent without anyone waiting"""
+    cloudfront = get_cloudfront(['InProgress', 'InProgress', 'InProgress', 'Completed'])
+    timer = Mock()
+    invalidator = Invalidator(cloudfront, flush_interval=30, timer=timer)
+
+    invalidator.invalidate('E1', ['/a'])
+    queued = invalidator.invalidate('E1', ['/b'])
+    assert queued.queued and not queued.ids
+    invalidator.invalidate('E1', ['/c'])
+    assert timer.call_count == 1
+
+    interval, flush_queued, args = timer.call_args[0]
+    assert interval == 30
+    flush_queued(*args)
+    assert timer.call_count == 2
+    flush_queued(*timer.call_args[0][2])
+    assert not queued.queued
+    assert queued.ids == ['I2']
+    assert cloudfront.created == [['/a'], ['/b', '/c']]
+    assert invalidator.timers == {}
@@ -0,0 +1,67 @@
+"""Test access log analysis"""
+import gzip
+
+from boto_aws_cloudfront.logs import (
+    OTHER_PATH,
+    LogStats,
+    analyze_logs,
+    get_path_key,
+    iter_log_records,
+)
+
+FIELDS = '#Fields: date time sc-bytes cs-uri-stem x-edge-result-type time-taken'
+
+def get_line(path, result, time_taken, size=100):
+    """Get tab separated log line"""
+    return '\t'.join([
+        '2017-05-01', '10:00:00', str(size), path, result, str(time_taken),
+    ])
+
+def write_log(path, lines):
+    """Write gzipped log file"""
+    with gzip.open(str(path), 'wb') as log_file:
+        log_file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+
+def test_analyze_logs(tmpdir):
+    """Test that hit ratio, bytes and time taken are counted per path"""
+    write_log(tmpdir.join('a.gz'), ['#Version: 1.0', FIELDS] + [
+        get_line('/index.html', 'Hit', 0.002),
+        get_line('/index.html', 'Miss', 0.2),
+        get_line('/app.js', 'RefreshHit', 0.001, 5000),
+    ])
+    write_log(tmpdir.join('b.gz'), [FIELDS] + [
+        get_line('/index.html', 'Hit', 0.003) for _ in range(7)
+    ])
+    tmpdir.join('ignored.txt').write('not a log')
+    paths = analyze_logs(str(tmpdir)).to_dict()
+    assert sorted(paths) == ['/app.js', '/index.html']
+    index = paths['/index.html']
+    assert index['requests'] == 9
+    assert (index['hits'], index['misses']) == (8, 1)
+    assert index['hit_ratio'] == 8.0 / 9
+    assert index['bytes'] == 900
+    assert 0.003 <= index['time_taken']['p50'] < 0.0036
+    assert 0.2 <= index['time_taken']['p99'] < 0.24
+    assert paths['/app.js']['bytes'] == 5000
+
+def test_records_use_default_fields():
+    """Test that logs without header are parsed by default fields"""
+    line = '\t'.join(['2017-05-01', '10:00:00', 'PRG50', '100', '1.2.3.4', 'GET', 'h', '/a'])
+    assert list(iter_log_records([line + '\n']))[0]['cs-uri-stem'] == '/a'
+
+def test_paths_are_capped():
+    """Test that paths over limit are aggregated together"""
+    stats = LogStats(max_paths=2)
+    for path in ['/a', '/b', '/c', '/d', '/a']:
+        stats.add({'cs-uri-stem': path, 'x-edge-result-type': 'Miss'})
+    paths = stats.to_dict()
+    assert sorted(paths) == [OTHER_PATH, '/a', '/b']
+    assert paths[OTHER_PATH]['requests'] == 2
+    assert paths['/a']['requests'] == 2
+    assert paths['/a']['time_taken']['p50'] is None
+
+def test_path_depth():
+    """Test that paths are grouped by leading segments"""
+    assert get_path_key('/assets/js/app.js', 1) == '/assets'
+    assert get_path_key('/assets/js/app.js', 2) == '/assets/js'
+    assert get_path_key('/index.html', 2) == '/index.html'
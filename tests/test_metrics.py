@@ -0,0 +1,71 @@
+"""Test client instrumentation and metrics"""
+from mock import Mock
+
+from boto_aws_cloudfront.cloudfront import CloudFront
+from boto_aws_cloudfront.fake import FakeCloudFrontClient
+from boto_aws_cloudfront.metrics import MetricsCollector
+from boto_aws_cloudfront.scheduler import Scheduler
+
+SITE_CONFIG = {
+    'domains': ['example.com'],
+    'name': 'foo',
+    's3_buckets': ['name-of-your-s3-bucket'],
+    'region': 'eu-west-1',
+}
+
+def test_collector_to_dict():
+    """Test that events are aggregated per operation"""
+    collector = MetricsCollector(buckets=(0.1, 1))
+    collector('call', operation='list_distributions', duration=0.05, retries=1, bytes=10)
+    collector('call', operation='list_distributions', duration=0.5, error='Throttling')
+    collector('cache', cache='index', hit=True)
+    collector('cache', cache='index', hit=False)
+    assert collector.to_dict() == {
+        'operations': {
+            'list_distributions': {
+                'count': 2,
+                'errors': 1,
+                'retries': 1,
+                'bytes': 10,
+                'duration': 0.55,
+                'latency': {0.1: 1, 1: 1},
+            },
+        },
+        'caches': {'index': {'hits': 1, 'misses': 1, 'hit_rate': 0.5}},
+        'pages': 2,
+    }
+
+def test_collector_to_prometheus():
+    """Test that histogram buckets are exported cumulatively"""
+    collector = MetricsCollector(buckets=(0.1, 1))
+    collector('local', operation='get_aws_config', duration=0.05)
+    collector('local', operation='get_aws_config', duration=0.5)
+    text = collector.to_prometheus()
+    assert '# TYPE cloudfront_operation_duration_seconds histogram' in text
+    assert (
+        'cloudfront_operation_duration_seconds_bucket{operation="get_aws_config",le="0.1"} 1'
+    ) in text
+    assert (
+        'cloudfront_operation_duration_seconds_bucket{operation="get_aws_config",le="1"} 2'
+    ) in text
+    assert (
+        'cloudfront_operation_duration_seconds_count{operation="get_aws_config"} 2'
+    ) in text
+
+def test_client_emits_events():
+    """Test that client reports calls, local work and cache lookups"""
+    collector = MetricsCollector()
+    cloudfront = CloudFront(
+        scheduler=Scheduler(rate=1000, sleep=Mock()),
+        hooks=[collector],
+    )
+    cloudfront.client = FakeCloudFrontClient()
+    cloudfront.ensure_distro_existence(SITE_CONFIG)
+    cloudfront.ensure_distro_existence(SITE_CONFIG)
+    metrics = collector.to_dict()
+    assert metrics['pages'] == 1
+    assert metrics['operations']['create_distribution']['count'] == 1
+    assert metrics['operations']['get_distribution_config']['count'] == 1
+    assert metrics['operations']['get_aws_config']['count'] == 1
+    assert metrics['operations']['did_distro_change']['count'] == 1
+    assert metrics['caches']['index'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
@@ -0,0 +1,127 @@
+"""Test planning and applying distribution changes"""
+import copy
+import json
+
+from mock import Mock, patch
+
+from boto_aws_cloudfront.cloudfront import CloudFront, get_aws_config, make_plan
+from boto_aws_cloudfront.plan import Plan
+from boto_aws_cloudfront.policies import get_cache_policy_config
+
+SITE_CONFIG = {
+    'domains': ['example.com'],
+    's3_buckets': ['name-of-your-s3-bucket'],
+    'region': 'eu-west-1',
+}
+
+def get_snapshot():
+    """Get snapshot with one current and one outdated distribution"""
+    current = get_aws_config(dict(SITE_CONFIG, name='current'))
+    outdated = copy.deepcopy(get_aws_config(dict(SITE_CONFIG, name='outdated')))
+    outdated['Enabled'] = False
+    outdated['CallerReference'] = 'outdated'
+    return {
+        'distros': {
+            'current': {'Id': 'E1', 'ETag': 'T1', 'DistributionConfig': current},
+            'outdated': {'Id': 'E2', 'ETag': 'T2', 'DistributionConfig': outdated},
+            'other': {'Id': 'E3'},
+        },
+    }
+
+def test_make_plan_offline():
+    """Test that plan is computed from snapshot alone"""
+    plan = make_plan(
+        [
+            dict(SITE_CONFIG, name='current'),
+            dict(SITE_CONFIG, name='outdated'),
+            dict(SITE_CONFIG, name='new'),
+        ],
+        get_snapshot(),
+    )
+    assert [config['name'] for config in plan.creates] == ['new']
+    assert [update['config']['name'] for update in plan.updates] == ['outdated']
+    assert [change.path for change in plan.updates[0]['changes']] == [('Enabled',)]
+    assert plan.unchanged == ['current']
+    assert str(plan) == '1 to create, 1 to update, 1 unchanged'
+
+def test_plan_round_trip():
+    """Test that plan survives serialization"""
+    plan = make_plan([dict(SITE_CONFIG, name='outdated')], get_snapshot())
+    restored = Plan.from_dict(json.loads(json.dumps(plan.to_dict())))
+    assert restored.updates == plan.updates
+    assert restored.snapshot == plan.snapshot
+
+@patch.object(CloudFront, 'iter_distros')
+def test_plan_with_snapshot_makes_no_calls(iter_distros):
+    """Test that planning against saved snapshot does not call API"""
+    cloudfront = CloudFront()
+    cloudfront.client = Mock()
+    plan = cloudfront.plan([dict(SITE_CONFIG, name='outdated')], get_snapshot())
+    assert len(plan.updates) == 1
+    assert not iter_distros.called
+    assert not cloudfront.client.method_calls
+
+def test_plan_policies_offline():
+    """Test that policies are looked up in snapshot and never created"""
+    policy = {'default_ttl': 3600}
+    name = get_cache_policy_config(policy)['Name']
+    snapshot = get_snapshot()
+    snapshot['distros']['current']['DistributionConfig'] = get_aws_config(
+        dict(SITE_CONFIG, name='current', cache_policy_id='P1'),
+    )
+    cloudfront = CloudFront()
+    cloudfront.client = Mock()
+    configs = [dict(SITE_CONFIG, name='current', cache_policy=policy)]
+
+    plan = cloudfront.plan(configs, snapshot)
+    assert [change.desired for change in plan.updates[0]['changes']] == [name]
+    assert plan.updates[0]['config'] == configs[0]
+
+    snapshot['policies'] = {'cache_policy': {name: 'P1'}}
+    assert cloudfront.plan(configs, snapshot).unchanged == ['current']
+    assert not cloudfront.client.method_calls
+
+@patch.object(CloudFront, 'iter_distros')
+def test_plan_takes_snapshot(iter_distros):
+    """Test that live plan fetches configs of planned distributions only"""
+    iter_distros.return_value = [
+        {'Id': 'E1', 'Comment': 'current', 'DomainName': 'a.cloudfront.net'},
+        {'Id': 'E3', 'Comment': 'other', 'DomainName': 'b.cloudfront.net'},
+    ]
+    cloudfront = CloudFront()
+    cloudfront.client = Mock()
+    cloudfront.client.get_distribution_config.return_value = {
+        'ETag': 'T1',
+        'DistributionConfig': get_aws_config(dict(SITE_CONFIG, name='current')),
+    }
+    plan = cloudfront.plan([dict(SITE_CONFIG, name='current')])
+    assert plan.unchanged == ['current']
+    cloudfront.client.get_distribution_config.assert_called_once_with(Id='E1')
+    assert plan.snapshot['distros']['other'] == {
+        'Id': 'E3',
+        'DomainName': 'b.cloudfront.net',
+    }
+
+def test_apply_uses_snapshot_etags():
+    """Test that apply writes without fetching configs again"""
+    cloudfront = CloudFront()
+    cloudfront.client = Mock()
+    cloudfront.client.create_distribution.return_value = {
+        'Distribution': {'Id': 'E4'},
+        'ETag': 'T4',
+    }
+    cloudfront.client.update_distribution.return_value = {
+        'Distribution': {'Id': 'E2'},
+        'ETag': 'T5',
+    }
+    plan = make_plan(
+        [dict(SITE_CONFIG, name='outdated'), dict(SITE_CONFIG, name='new')],
+        get_snapshot(),
+    )
+    assert cloudfront.apply(plan) == {
+        'outdated': {'status': 'updated'},
+        'new': {'status': 'created'},
+    }
+    assert cloudfront.client.update_distribution.call_args[1]['IfMatch'] == 'T2'
+    assert not cloudfront.client.get_distribution_config.called
+    assert not cloudfront.client.list_distributions.called
@@ -0,0 +1,115 @@
+"""Test cache and origin request policies"""
+from mock import Mock
+
+from boto_aws_cloudfront.cloudfront import DISTRO_UPDATED, CloudFront
+from boto_aws_cloudfront.fake import FakeClientError, FakeCloudFrontClient
+from boto_aws_cloudfront.policies import PolicyCache, get_cache_policy_config
+
+from .conftest import get_cloudfront, get_site_config
+
+CACHE_POLICY = {'default_ttl': 3600, 'query_strings': ['v', 'lang']}
+
+def test_policy_name_is_content_hash():
+    """Test that equal definitions get equal names regardless of order"""
+    first = get_cache_policy_config(CACHE_POLICY)
+    second = get_cache_policy_config({'query_strings': ['lang', 'v'], 'default_ttl': 3600})
+    third = get_cache_policy_config(dict(CACHE_POLICY, default_ttl=60))
+    assert first == second
+    assert first['Name'] != third['Name']
+
+def test_policies_are_shared():
+    """Test that distributions with identical policies share them"""
+    client = FakeCloudFrontClient()
+    cloudfront = get_cloudfront(client)
+    results = cloudfront.ensure_distros([
+        get_site_config(index, cache_policy=CACHE_POLICY) for index in range(10)
+    ])
+    assert set(result['status'] for result in results.values()) == set(['created'])
+    assert len(client.policies['CachePolicy']) == 1
+    assert client.calls['ListCachePolicies'] == 1
+    policy_id = list(client.policies['CachePolicy'])[0]
+    for distro in client.distros.values():
+        behavior = distro['DistributionConfig']['DefaultCacheBehavior']
+        assert behavior['CachePolicyId'] == policy_id
+        assert 'ForwardedValues' not in behavior
+
+def test_existing_policy_is_reused():
+    """Test that policy created by previous run is found by listing"""
+    client = FakeCloudFrontClient()
+    get_cloudfront(client).ensure_distro_existence(
+        get_site_config(0, cache_policy=CACHE_POLICY),
+    )
+    cloudfront = get_cloudfront(client)
+    config = cloudfront.resolve_policies(get_site_config(1, cache_policy=CACHE_POLICY))
+    assert config['cache_policy_id'] == list(client.policies['CachePolicy'])[0]
+    assert client.calls['CreateCachePolicy'] == 1
+
+def test_resolve_behavior_policies():
+    """Test that behaviors get their own policies"""
+    client = FakeCloudFrontClient()
+    cloudfront = get_cloudfront(client)
+    desired_config = get_site_config(
+        0,
+        origin_request_policy={'headers': ['Origin']},
+        cache_behaviors=[{'path_pattern': '/api/*', 'cache_policy': CACHE_POLICY}],
+    )
+    config = cloudfront.resolve_policies(desired_config)
+    assert config['origin_request_policy_id']
+    assert config['cache_behaviors'][0]['cache_policy_id']
+    assert 'cache_policy_id' not in desired_config['cache_behaviors'][0]
+    assert cloudfront.resolve_policies(get_site_config(0)) == get_site_config(0)
+
+def test_ensure_policy_created_concurrently():
+    """Test that policy created by someone else meanwhile is listed again"""
+    cloudfront = CloudFront()
+    cloudfront.client = Mock()
+    policy_config = get_cache_policy_config(CACHE_POLICY)
+    cloudfront.client.list_cache_policies.side_effect = [
+        {'CachePolicyList': {'Items': []}},
+        {'CachePolicyList': {'Items': [{
+            'CachePolicy': {'Id': 'P1', 'CachePolicyConfig': policy_config},
+        }]}},
+    ]
+    cloudfront.client.create_cache_policy.side_effect = FakeClientError(
+        'CachePolicyAlreadyExists',
+        'CreateCachePolicy',
+    )
+    assert cloudfront.ensure_policy('cache_policy', CACHE_POLICY) == 'P1'
+
+def test_removed_origin_request_policy():
+    """Test that removing origin request policy detaches it"""
+    client = FakeCloudFrontClient()
+    cloudfront = get_cloudfront(client)
+    cloudfront.ensure_distro_existence(
+        get_site_config(0, origin_request_policy={'headers': ['Origin']}),
+    )
+    assert cloudfront.ensure_distro_existence(get_site_config(0)) == DISTRO_UPDATED
+    distro = list(client.distros.values())[0]
+    behavior = distro['DistributionConfig']['DefaultCacheBehavior']
+    assert 'OriginRequestPolicyId' not in behavior
+
+def test_plan_lists_policies_only():
+    """Test that live plan lists policies into snapshot, apply creates them"""
+    client = FakeCloudFrontClient()
+    cloudfront = get_cloudfront(client)
+    plan = cloudfront.plan([get_site_config(0, cache_policy=CACHE_POLICY)])
+    assert plan.snapshot['policies'] == {'cache_policy': {}}
+    assert client.calls['ListCachePolicies'] == 1
+    assert not client.calls['CreateCachePolicy']
+    assert cloudfront.apply(plan) == {'site-0': {'status': 'created'}}
+    assert client.calls['CreateCachePolicy'] == 1
+
+def test_policy_cache_file(tmpdir):
+    """Test that policies listed and created by previous run are not listed"""
+    path = str(tmpdir.join('policies.json'))
+    client = FakeCloudFrontClient()
+    cloudfront = CloudFront(policy_cache=PolicyCache(path))
+    cloudfront.client = client
+    cloudfront.resolve_policies(get_site_config(0, cache_policy=CACHE_POLICY))
+
+    client.calls.clear()
+    cloudfront = CloudFront(policy_cache=PolicyCache(path))
+    cloudfront.client = client
+    config = cloudfront.resolve_policies(get_site_config(1, cache_policy=CACHE_POLICY))
+    assert config['cache_policy_id'] == list(client.policies['CachePolicy'])[0]
+    assert not client.calls
@@ -0,0 +1,61 @@
+"""Test pool of boto3 clients"""
+import datetime
+
+from mock import Mock, patch
+
+from boto_aws_cloudfront.cloudfront import CloudFront
+from boto_aws_cloudfront.pool import ClientPool, assume_role
+
+@patch('boto3.session.Session')
+def test_pool_reuses_clients(session):
+    """Test that clients are created once per account"""
+    session.side_effect = lambda **kwargs: Mock()
+    pool = ClientPool(max_pool_connections=32)
+    first = pool.get_client('cloudfront', profile='a')
+    assert pool.get_client('cloudfront', profile='a') is first
+    assert pool.get_client('cloudfront', profile='b') is not first
+    assert session.call_count == 2
+    config = pool.get_session(profile='a').client.call_args[1]['config']
+    assert config.max_pool_connections == 32
+
+@patch('boto_aws_cloudfront.pool.get_role_credentials')
+def test_pool_assumes_role(get_role_credentials):
+    """Test that role session uses credentials of its source session"""
+    pool = ClientPool()
+    role_session = pool.get_session(
+        role_arn='arn:aws:iam::1:role/deploy',
+        region='us-east-1',
+    )
+    assert not get_role_credentials.called
+    assert role_session.get_credentials() is get_role_credentials.return_value
+    get_role_credentials.assert_called_once_with(
+        pool.get_session(region='us-east-1'),
+        'arn:aws:iam::1:role/deploy',
+    )
+
+def test_assume_role():
+    """Test that STS response is translated to credentials metadata"""
+    session = Mock()
+    session.client.return_value.assume_role.return_value = {
+        'Credentials': {
+            'AccessKeyId': 'AKID',
+            'SecretAccessKey': 'SECRET',
+            'SessionToken': 'TOKEN',
+            'Expiration': datetime.datetime(2030, 1, 1),
+        },
+    }
+    assert assume_role(session, 'arn:aws:iam::1:role/deploy') == {
+        'access_key': 'AKID',
+        'secret_key': 'SECRET',
+        'token': 'TOKEN',
+        'expiry_time': '2030-01-01T00:00:00',
+    }
+
+def test_cloudfront_takes_client_from_pool():
+    """Test that wrappers of one account share client"""
+    pool = Mock()
+    cloudfront = CloudFront(account={'profile': 'a', 'region': 'us-east-1'}, pool=pool)
+    assert not pool.get_client.called
+    assert cloudfront.client is pool.get_client.return_value
+    assert cloudfront.client is pool.get_client.return_value
+    pool.get_client.assert_called_once_with('cloudfront', profile='a', region='us-east-1')
@@ -0,0 +1,55 @@
+"""Test retiring distributions"""
+from mock import patch
+
+from boto_aws_cloudfront.fake import FakeCloudFrontClient
+
+from .conftest import FakeTime, get_cloudfront, get_site_config
+
+def get_account(fake_time, size, deploy_time=20):
+    """Get CloudFront wrapper over fake account with deployed distributions"""
+    client = FakeCloudFrontClient(deploy_time=deploy_time, clock=fake_time.time)
+    cloudfront = get_cloudfront(client)
+    for index in range(size):
+        cloudfront.create_distro(get_site_config(index))
+    fake_time.now = 1000
+    return cloudfront, client
+
+@patch('boto_aws_cloudfront.cloudfront.time', new_callable=FakeTime)
+def test_retire_distros(fake_time):
+    """Test that distributions are disabled, then deleted when deployed"""
+    cloudfront, client = get_account(fake_time, 4)
+    progress = []
+    results = cloudfront.retire_distros(
+        ['site-0', 'site-1', 'site-2', 'gone'],
+        max_in_flight=2,
+        callback=lambda name, result: progress.append(name),
+    )
+    assert results == {
+        'site-0': {'status': 'deleted'},
+        'site-1': {'status': 'deleted'},
+        'site-2': {'status': 'deleted'},
+        'gone': {'status': 'missing'},
+    }
+    assert sorted(progress) == ['gone', 'site-0', 'site-1', 'site-2']
+    assert [
+        distro['DistributionConfig']['Comment'] for distro in client.distros.values()
+    ] == ['site-3']
+    assert cloudfront.index.lookup('site-0') is None
+
+@patch('boto_aws_cloudfront.cloudfront.time', new_callable=FakeTime)
+def test_retire_distros_resumes(fake_time):
+    """Test that retiring continues with distributions disabled before"""
+    cloudfront, client = get_account(fake_time, 2, deploy_time=100)
+    results = cloudfront.retire_distros(['site-0', 'site-1'], timeout=30)
+    assert results == {
+        'site-0': {'status': 'disabled', 'deployed': False},
+        'site-1': {'status': 'disabled', 'deployed': False},
+    }
+    assert client.calls['UpdateDistribution'] == 2
+
+    fake_time.now += 100
+    cloudfront = get_cloudfront(client)
+    results = cloudfront.retire_distros(['site-0', 'site-1'])
+    assert results == {'site-0': {'status': 'deleted'}, 'site-1': {'status': 'deleted'}}
+    assert client.calls['UpdateDistribution'] == 2
+    assert not client.distros
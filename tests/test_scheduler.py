@@ -0,0 +1,68 @@
+"""Test rate limiting scheduler"""
+from botocore.exceptions import ClientError
+from mock import Mock
+import pytest
+
+from boto_aws_cloudfront.scheduler import Scheduler, TokenBucket
+
+def get_client_error(code):
+    """Get botocore client error with given code"""
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'ListDistributions')
+
+def test_bucket_waits_for_token():
+    """Test that bucket makes caller wait once tokens are spent"""
+    sleep = Mock()
+    bucket = TokenBucket(2, clock=Mock(return_value=0), sleep=sleep)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0.5
+    assert bucket.acquire() == 1
+    assert sleep.call_count == 2
+
+def test_bucket_adapts_rate():
+    """Test that throttling halves the rate and success raises it back"""
+    bucket = TokenBucket(10, min_rate=1, clock=Mock(return_value=0), sleep=Mock())
+    bucket.slow_down()
+    bucket.slow_down()
+    assert bucket.rate == 2.5
+    bucket.speed_up()
+    assert bucket.rate == 3
+    for _ in range(20):
+        bucket.speed_up()
+    assert bucket.rate == 10
+
+def test_call_retries_throttling():
+    """Test that throttled calls are retried with backoff"""
+    sleep = Mock()
+    scheduler = Scheduler(clock=Mock(return_value=0), sleep=sleep)
+    method = Mock(side_effect=[
+        get_client_error('Throttling'),
+        get_client_error('Throttling'),
+        {'DistributionList': {}},
+    ])
+    assert scheduler.call(method, Marker='x') == {'DistributionList': {}}
+    method.assert_called_with(Marker='x')
+    assert scheduler.stats['calls'] == 3
+    assert scheduler.stats['retries'] == 2
+    assert scheduler.stats['throttled'] == 2
+    assert sleep.call_count == 2
+    assert scheduler.stats['wait_time'] == sum(
+        call[0][0] for call in sleep.call_args_list
+    )
+
+def test_call_gives_up():
+    """Test that throttling error is raised after last retry"""
+    scheduler = Scheduler(max_retries=1, clock=Mock(return_value=0), sleep=Mock())
+    method = Mock(side_effect=get_client_error('Throttling'))
+    with pytest.raises(ClientError):
+        scheduler.call(method)
+    assert method.call_count == 2
+
+def test_call_does_not_retry_other_errors():
+    """Test that other errors are raised right away"""
+    scheduler = Scheduler(clock=Mock(return_value=0), sleep=Mock())
+    method = Mock(side_effect=get_client_error('AccessDenied'))
+    with pytest.raises(ClientError):
+        scheduler.call(method)
+    assert method.call_count == 1
+    assert scheduler.stats['retries'] == 0
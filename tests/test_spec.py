@@ -0,0 +1,70 @@
+"""Test slotted distribution specs"""
+import pickle
+
+import pytest
+
+from boto_aws_cloudfront.config import (
+    DEFAULT_CONFIG,
+    get_aws_config,
+    normalize_config,
+    read_aws_config,
+)
+from boto_aws_cloudfront.spec import DistroSpec
+
+CONFIG = {
+    'domains': ['example.com'],
+    'name': 'example',
+    's3_buckets': ['example-bucket'],
+    'region': 'eu-west-1',
+    'cache_behaviors': [{'path_pattern': '/api/*', 'cache_default_ttl': 0}],
+    'origin_custom_headers': {'X-Origin': 'cdn'},
+}
+
+def test_spec_dict_conversion():
+    """Test that spec converts to normalized config and back"""
+    spec = DistroSpec.from_dict(CONFIG)
+    assert spec.to_dict() == normalize_config(CONFIG)
+    assert dict(spec) == normalize_config(CONFIG)
+    assert DistroSpec.from_dict(spec.to_dict()) == spec
+    assert spec['name'] == 'example'
+    assert spec.get('price_class') == DEFAULT_CONFIG['price_class']
+    assert spec.get('unknown') is None
+    with pytest.raises(KeyError):
+        spec['unknown']
+
+def test_spec_rejects_unknown_options():
+    """Test that unknown options are not silently dropped"""
+    with pytest.raises(TypeError):
+        DistroSpec(name='example', price='cheap')
+
+def test_spec_is_immutable():
+    """Test that options can not be reassigned"""
+    spec = DistroSpec.from_dict(CONFIG)
+    with pytest.raises(AttributeError):
+        spec.name = 'other'
+
+def test_spec_equality_and_hash():
+    """Test that specs compare and hash by value"""
+    spec = DistroSpec.from_dict(CONFIG)
+    same = DistroSpec.from_dict(dict(CONFIG, origin_custom_headers={'X-Origin': 'cdn'}))
+    other = DistroSpec.from_dict(dict(CONFIG, name='other'))
+    assert spec == same
+    assert not spec != same
+    assert hash(spec) == hash(same)
+    assert spec != other
+    assert spec != normalize_config(CONFIG)
+    assert len(set([spec, same, other])) == 2
+
+def test_spec_pickle():
+    """Test that specs survive pickling for worker processes"""
+    spec = DistroSpec.from_dict(CONFIG)
+    assert pickle.loads(pickle.dumps(spec, 2)) == spec
+
+def test_aws_config_of_spec():
+    """Test that AWS config is rendered from and read into specs"""
+    spec = DistroSpec.from_dict(CONFIG)
+    aws_config = get_aws_config(spec)
+    assert aws_config == get_aws_config(CONFIG)
+    read_spec = read_aws_config(aws_config, DistroSpec.from_dict)
+    assert isinstance(read_spec, DistroSpec)
+    assert read_spec.to_dict() == dict(read_aws_config(aws_config), region=None)
@@ -0,0 +1,149 @@
+"""Test incremental sync with persisted state cache"""
+import os
+
+from mock import Mock
+
+from boto_aws_cloudfront.cloudfront import DISTRO_UPDATED
+from boto_aws_cloudfront.fake import FakeCloudFrontClient
+from boto_aws_cloudfront.statecache import StateCache
+
+from .conftest import get_cloudfront, get_site_config
+
+def test_unchanged_run_only_lists(tmpdir):
+    """Test that no-op run makes no calls besides listing"""
+    path = str(tmpdir.join('state.json'))
+    configs = [get_site_config(index) for index in range(5)]
+    client = FakeCloudFrontClient(page_size=2)
+    get_cloudfront(client, StateCache(path)).ensure_distros(configs)
+    assert os.path.exists(path)
+
+    client.calls.clear()
+    results = get_cloudfront(client, StateCache(path)).ensure_distros(configs)
+    assert set(result['status'] for result in results.values()) == set(['unchanged'])
+    assert dict(client.calls) == {'ListDistributions': 3}
+
+def test_changed_config_is_fetched():
+    """Test that changed desired config is reconciled again"""
+    state_cache = StateCache()
+    client = FakeCloudFrontClient()
+    get_cloudfront(client, state_cache).ensure_distros([get_site_config(0)])
+
+    client.calls.clear()
+    cloudfront = get_cloudfront(client, state_cache)
+    results = cloudfront.ensure_distros([get_site_config(0, root_object='index.html')])
+    assert results['site-0']['status'] == 'updated'
+    assert client.calls['GetDistributionConfig'] == 1
+
+    client.calls.clear()
+    cloudfront = get_cloudfront(client, state_cache)
+    results = cloudfront.ensure_distros([get_site_config(0, root_object='index.html')])
+    assert results['site-0']['status'] == 'unchanged'
+    assert 'GetDistributionConfig' not in client.calls
+
+def test_modified_distro_is_fetched():
+    """Test that distribution modified elsewhere is fetched and reverted"""
+    clock = Mock(return_value=1000)
+    state_cache = StateCache()
+    client = FakeCloudFrontClient(clock=clock)
+    get_cloudfront(client, state_cache).ensure_distros([get_site_config(0)])
+
+    distro = list(client.distros.values())[0]
+    clock.return_value = 2000
+    client.change(distro, dict(distro['DistributionConfig'], Enabled=False))
+    results = get_cloudfront(client, state_cache).ensure_distros([get_site_config(0)])
+    assert results['site-0']['status'] == 'updated'
+    assert distro['DistributionConfig']['Enabled'] is True
+
+def test_outdated_state_file_is_ignored(tmpdir):
+    """Test that state file of other version is treated as empty"""
+    path = tmpdir.join('state.json')
+    path.write('{"version": 0, "distros": {"foo": {}}}')
+    assert StateCache(str(path)).get('foo') is None
+
+def test_drift_report():
+    """Test that only drifted distributions are reported and fetched"""
+    clock = Mock(return_value=1000)
+    state_cache = StateCache()
+    client = FakeCloudFrontClient(clock=clock, page_size=2)
+    configs = [get_site_config(index) for index in range(4)]
+    get_cloudfront(client, state_cache).ensure_distros(configs[:3])
+
+    client.calls.clear()
+    report = get_cloudfront(client, state_cache).drift_report(configs)
+    assert report == {'site-3': None}
+    assert dict(client.calls) == {'ListDistributions': 2}
+
+    distro = list(client.distros.values())[1]
+    clock.return_value = 2000
+    client.change(distro, dict(distro['DistributionConfig'], DefaultRootObject='a.html'))
+    client.calls.clear()
+    report = get_cloudfront(client, state_cache).drift_report(configs[:3])
+    name = distro['DistributionConfig']['Comment']
+    assert list(report) == [name]
+    assert [change.path for change in report[name]] == [('DefaultRootObject',)]
+    assert client.calls['GetDistributionConfig'] == 1
+
+def test_drift_report_without_state():
+    """Test that all configs are fetched and cache filled on first report"""
+    state_cache = StateCache()
+    client = FakeCloudFrontClient()
+    configs = [get_site_config(index) for index in range(3)]
+    get_cloudfront(client, None).ensure_distros(configs)
+
+    client.calls.clear()
+    changed = [configs[0], get_site_config(1, root_object='index.html'), configs[2]]
+    report = get_cloudfront(client, state_cache).drift_report(changed)
+    assert list(report) == ['site-1']
+    assert client.calls['GetDistributionConfig'] == 3
+    assert state_cache.get('site-0')['LiveHash']
+    assert state_cache.get('site-1') is None
+
+    client.calls.clear()
+    report = get_cloudfront(client, state_cache).drift_report(changed)
+    assert list(report) == ['site-1']
+    assert client.calls['GetDistributionConfig'] == 1
+
+def test_drift_report_lists_fresh():
+    """Test that report of long-lived client sees changes made elsewhere"""
+    clock = Mock(return_value=1000)
+    client = FakeCloudFrontClient(clock=clock)
+    cloudfront = get_cloudfront(client, StateCache())
+    cloudfront.ensure_distros([get_site_config(0)])
+    assert cloudfront.drift_report([get_site_config(0)]) == {}
+
+    distro = list(client.distros.values())[0]
+    clock.return_value = 2000
+    client.change(distro, dict(distro['DistributionConfig'], Enabled=False))
+    report = cloudfront.drift_report([get_site_config(0)])
+    assert [change.path for change in report['site-0']] == [('Enabled',)]
+
+def test_drift_report_creates_no_policies():
+    """Test that report only lists policies and reports missing ones"""
+    client = FakeCloudFrontClient()
+    get_cloudfront(client, None).ensure_distros([get_site_config(0)])
+    report = get_cloudfront(client, StateCache()).drift_report([
+        get_site_config(0, cache_policy={'default_ttl': 3600}),
+    ])
+    assert ('DefaultCacheBehavior', 'CachePolicyId') in [
+        change.path for change in report['site-0']
+    ]
+    assert client.calls['ListCachePolicies'] == 1
+    assert not client.calls['CreateCachePolicy']
+
+def test_long_lived_client_reverts_edits():
+    """Test that edits made elsewhere within index TTL are reverted"""
+    clock = Mock(return_value=1000)
+    client = FakeCloudFrontClient(clock=clock)
+    cloudfront = get_cloudfront(client, StateCache())
+    cloudfront.ensure_distros([get_site_config(0)])
+
+    distro = list(client.distros.values())[0]
+    clock.return_value = 2000
+    client.change(distro, dict(distro['DistributionConfig'], Enabled=False))
+    results = cloudfront.ensure_distros([get_site_config(0)])
+    assert results['site-0']['status'] == 'updated'
+    assert distro['DistributionConfig']['Enabled'] is True
+
+    clock.return_value = 3000
+    client.change(distro, dict(distro['DistributionConfig'], Enabled=False))
+    assert cloudfront.ensure_distro_existence(get_site_config(0)) == DISTRO_UPDATED
@@ -0,0 +1,61 @@
+"""Test precompiled config template"""
+import itertools
+
+from boto_aws_cloudfront.config import get_aws_config
+from boto_aws_cloudfront.templates import ConfigTemplate, render_aws_config
+
+SITE_CONFIG = {
+    'domains': ['example.com', 'www.example.com'],
+    'name': 'foo',
+    's3_buckets': ['name-of-your-s3-bucket', 'backup-bucket'],
+    'region': 'eu-west-1',
+}
+
+VARIANTS = [
+    {},
+    {'certificate_source': 'acm', 'certificate_arn': 'arn:aws:acm::cert'},
+    {'certificate_source': 'iam', 'certificate_iam': 'ASCACERT'},
+    {'cache_trusted_signers': ['self'], 'cache_forward_querystring': True},
+    {'cache_forward_cookies_mode': 'all', 'https_behavior': 'allow-all'},
+    {'enabled': False, 'ipv6': False, 'http_version': 'http1.1'},
+    {'root_object': 'index.html', 'price_class': 'PriceClass_All'},
+    {'root_object': None},
+    {'cache_compress': True, 'cache_default_ttl': 86400, 'cache_max_ttl': 31536000},
+    {'cache_behaviors': [{'path_pattern': '/static/*', 'cache_min_ttl': 3600}]},
+    {'origin_read_timeout': 60, 'origin_custom_headers': {'X-Origin': 'cdn'}},
+    {'origin_shield_region': 'eu-west-1', 'origin_failover_status_codes': [500, 503]},
+    {'origin_settings': {'backup-bucket': {'origin_keepalive_timeout': 60}}},
+    {'cache_policy_id': 'P1', 'origin_request_policy_id': 'P2'},
+    {'logging_bucket': 'logs', 'logging_prefix': 'foo/', 'realtime_log_config_arn': 'arn'},
+]
+
+def test_render_equals_get_aws_config():
+    """Test that template renders the same configs as get_aws_config"""
+    template = ConfigTemplate()
+    for first, second in itertools.product(VARIANTS, VARIANTS):
+        desired_config = dict(SITE_CONFIG, **first)
+        desired_config.update(second)
+        assert template.render(desired_config) == get_aws_config(desired_config)
+
+def test_render_memoizes_origins():
+    """Test that origin configs are shared between renders"""
+    template = ConfigTemplate()
+    first = template.render(SITE_CONFIG)
+    second = template.render(dict(SITE_CONFIG, name='bar'))
+    assert first['Origins']['Items'][0] is second['Origins']['Items'][0]
+    assert len(template.origins) == 2
+
+def test_render_falls_back():
+    """Test that configs with keys unknown to template are still rendered"""
+    desired_config = dict(SITE_CONFIG, unknown_option=True)
+    assert render_aws_config(desired_config) == get_aws_config(desired_config)
+
+def test_render_bounds_memos():
+    """Test that the oldest memoized origins are evicted"""
+    template = ConfigTemplate(max_origins=2)
+    for bucket in ('a', 'b', 'c'):
+        template.render(dict(SITE_CONFIG, s3_buckets=[bucket]))
+    assert [key[0] for key in template.origins.values] == ['b', 'c']
+    assert template.render(dict(SITE_CONFIG, s3_buckets=['a'])) == get_aws_config(
+        dict(SITE_CONFIG, s3_buckets=['a']),
+    )
@@ -0,0 +1,108 @@
+"""Test offline validation of configs"""
+from mock import Mock
+import pytest
+
+from boto_aws_cloudfront.cloudfront import CloudFront
+from boto_aws_cloudfront.validation import ConfigError, check_configs, validate_configs
+
+SITE_CONFIG = {
+    'domains': ['example.com'],
+    'name': 'foo',
+    's3_buckets': ['name-of-your-s3-bucket'],
+    'region': 'eu-west-1',
+}
+
+def get_fields(problems):
+    """Get labels and fields of problems"""
+    return sorted((problem.config, problem.field) for problem in problems)
+
+def test_valid_config():
+    """Test that complete config has no problems"""
+    assert validate_configs([dict(
+        SITE_CONFIG,
+        certificate_source='acm',
+        certificate_arn='arn:aws:acm:us-east-1:123456789012:certificate/abc',
+        cache_behaviors=[{'path_pattern': '/assets/*', 'cache_max_ttl': 31536000}],
+    )]) == []
+
+def test_required_and_unknown_keys():
+    """Test that missing, empty and misspelled keys are reported"""
+    assert get_fields(validate_configs([
+        {'domains': ['a.example.com'], 's3_buckets': []},
+        dict(SITE_CONFIG, root_objet='index.html'),
+    ])) == [
+        ('#0', 'name'),
+        ('#0', 'region'),
+        ('#0', 's3_buckets'),
+        ('foo', 'root_objet'),
+    ]
+
+def test_enums_and_certificates():
+    """Test that invalid values and inconsistent certificates are reported"""
+    problems = validate_configs([
+        dict(SITE_CONFIG, name='a', certificate_source='acm', https_behavior='always'),
+        dict(
+            SITE_CONFIG,
+            name='b',
+            domains=['b.example.com'],
+            certificate_source='acm',
+            certificate_arn='arn:aws:acm:eu-west-1:123456789012:certificate/abc',
+        ),
+        dict(SITE_CONFIG, name='c', domains=['c.example.com'], certificate_source='iam'),
+    ])
+    assert get_fields(problems) == [
+        ('a', 'certificate_arn'),
+        ('a', 'https_behavior'),
+        ('b', 'certificate_arn'),
+        ('c', 'certificate_iam'),
+    ]
+
+def test_batch_conflicts():
+    """Test that duplicate names and aliases across batch are reported"""
+    problems = validate_configs([
+        SITE_CONFIG,
+        dict(SITE_CONFIG, domains=['other.example.com']),
+        dict(SITE_CONFIG, name='bar', domains=['EXAMPLE.com']),
+    ])
+    assert get_fields(problems) == [('bar', 'domains'), ('foo', 'name')]
+
+def test_behaviors_origins_and_functions():
+    """Test that nested options are checked"""
+    problems = validate_configs([dict(
+        SITE_CONFIG,
+        cache_default_ttl=7200,
+        origin_settings={'missing-bucket': {'origin_read_timeout': 60}},
+        origin_failover_status_codes=[500],
+        cache_behaviors=[
+            {'path_pattern': '/a/*', 's3_bucket': 'missing-bucket'},
+            {'path_pattern': '/a/*', 'cache_max_ttl': 60},
+        ],
+        lambda_function_associations=[
+            {'event_type': 'origin-request', 'arn': 'arn:aws:lambda:us-east-1:1:function:f'},
+        ],
+    )])
+    assert get_fields(problems) == [
+        ('foo', 'cache_behaviors.0.s3_bucket'),
+        ('foo', 'cache_behaviors.1.cache_default_ttl'),
+        ('foo', 'cache_behaviors.1.path_pattern'),
+        ('foo', 'cache_default_ttl'),
+        ('foo', 'lambda_function_associations'),
+        ('foo', 'origin_failover_status_codes'),
+        ('foo', 'origin_settings'),
+    ]
+
+def test_check_configs():
+    """Test that all problems are raised at once"""
+    with pytest.raises(ConfigError) as error:
+        check_configs([{'name': 'foo'}])
+    assert len(error.value.problems) == 3
+    assert 'foo: region: is required' in str(error.value)
+
+def test_ensure_distros_validates():
+    """Test that invalid configs are reported without API calls"""
+    cloudfront = CloudFront()
+    cloudfront.client = Mock()
+    results = cloudfront.ensure_distros([{'name': 'foo'}], validate=True)
+    assert results['foo']['status'] == 'error'
+    assert isinstance(results['foo']['error'], ConfigError)
+    assert not cloudfront.client.method_calls